@@ -1,7 +1,6 @@
 import streamlit as st
-import subprocess
-import os
-from pathlib import Path
+
+from ml_core import supervisor
 
 st.set_page_config(
     page_title="🚀 MLアプリランチャー",
@@ -12,17 +11,29 @@ st.set_page_config(
 st.title("🚀 機械学習アプリランチャー")
 st.markdown("作成したアプリを選択して起動できます")
 
-# 利用可能なアプリを検索
-apps = []
-app_files = Path(".").glob("*.py")
+# 利用可能なアプリを検索（自分自身は除外）
+apps = supervisor.discover_apps(".")
+
+# 全セッションで共有するプロセス管理（起動したアプリの監視と自動再起動）
+@st.cache_resource
+def get_supervisor():
+    return supervisor.Supervisor([])
+
+# アプリが増えたり減ったりしても、同じプロセス管理の一覧を更新する（2つ目を作らない）
+app_supervisor = get_supervisor()
+app_supervisor.update_apps(apps)
 
-for app_file in app_files:
-    if app_file.name != "app_launcher.py":  # 自分自身は除外
-        apps.append({
-            "name": app_file.stem,
-            "file": app_file.name,
-            "description": f"{app_file.stem}アプリ"
-        })
+def toggle_prewarm():
+    # 切り替えたときだけ共有の設定を変える（他のセッションの再実行で元に戻らないように）
+    app_supervisor.prewarm = st.session_state["prewarm"]
+
+st.toggle(
+    "🔥 事前ウォームアップして起動",
+    value=app_supervisor.prewarm,
+    key="prewarm",
+    on_change=toggle_prewarm,
+    help="重いモジュールのimportとモデルの読み込みを済ませてからアプリを公開します（次に起動するアプリから有効）"
+)
 
 # アプリの説明を追加
 app_descriptions = {
@@ -41,14 +52,26 @@ for i, app in enumerate(apps):
     with col:
         with st.container():
             st.markdown(f"### {app['name']}")
-            description = app_descriptions.get(app['name'], app['description'])
+            description = app_descriptions.get(app['name'], f"{app['name']}アプリ")
             st.markdown(description)
             
-            # 起動ボタン
-            if st.button(f"🚀 起動", key=f"launch_{app['name']}"):
-                st.info(f"'{app['name']}'を起動しています...")
-                st.markdown(f"**コマンド**: `streamlit run {app['file']}`")
-                st.markdown("ターミナルで上記コマンドを実行してください")
+            # 起動・停止・再起動ボタン
+            button_cols = st.columns(3)
+            try:
+                if button_cols[0].button("🚀 起動", key=f"launch_{app['name']}"):
+                    app_supervisor.start(app['name'])
+                if button_cols[1].button("⏹️ 停止", key=f"stop_{app['name']}"):
+                    app_supervisor.stop(app['name'])
+                if button_cols[2].button("🔄 再起動", key=f"restart_{app['name']}"):
+                    app_supervisor.restart(app['name'])
+            except Exception as e:
+                st.error(f"❌ 操作に失敗しました: {e}")
+            
+            managed = app_supervisor.apps[app['name']]
+            if managed.running:
+                st.markdown(f"**{managed.status}**: [{managed.url()}]({managed.url()})")
+            else:
+                st.markdown(f"**{managed.status}**")
 
 st.markdown("---")
 
@@ -82,13 +105,30 @@ with st.expander("📝 新しいアプリ作成の手順"):
 
 # 現在実行中のアプリ情報
 st.subheader("🔍 実行中のアプリ確認")
-st.markdown("""
-**現在実行中のアプリを確認する方法:**
-- ブラウザのタブをチェック
-- `http://localhost:8501`, `http://localhost:8502` などにアクセス
 
-**アプリを停止する方法:**
-- ターミナルで `Ctrl + C`
+if st.button("🔄 状態を更新"):
+    st.rerun()
+
+status_rows = []
+for app_status in app_supervisor.snapshot():
+    status_rows.append({
+        "アプリ": app_status["name"],
+        "状態": app_status["status"],
+        "ヘルスチェック": "✅" if app_status["healthy"] else "－",
+        "PID": app_status["pid"],
+        "URL": app_status["url"],
+        "メモリ (MB)": round(app_status["rss_mb"], 1) if app_status["rss_mb"] else None,
+        "CPU (%)": round(app_status["cpu_percent"], 1) if app_status["cpu_percent"] is not None else None,
+        "自動再起動の回数": app_status["restarts"],
+    })
+st.dataframe(status_rows, use_container_width=True, hide_index=True)
+
+st.markdown("""
+**ランチャーで管理する仕組み:**
+- 起動したアプリには 8502 番以降の空いているポートを自動で割り当てます
+- 数秒ごとにヘルスチェックを行い、アプリが落ちたり応答しなくなったりしたら自動で再起動します
+- 停止ボタンで止めたアプリは再起動しません
+- ランチャーを終了すると、起動したアプリもまとめて停止します
 """)
 
 # アプリ管理のコツ
@@ -0,0 +1,3 @@
+"""
+推論まわりのベンチマークと負荷試験
+"""
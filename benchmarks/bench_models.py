@@ -0,0 +1,266 @@
+"""
+モデル推論のベンチマーク
+
+multi_model_app.py と同じ方法（ml_core.registry）で見つけたモデルごとに、次を計測してJSONで出力します。
+
+- 読み込み時間（元の形式と、メモリマップ用の .joblib に変換した場合）。
+  毎回ファイルのページキャッシュを捨ててから読み込みます（posix_fadvise が使える環境のみ。
+  使えない環境ではキャッシュに載った状態の時間になり、結果に "page_cache": "warm" と記録します）
+- 1行予測のレイテンシ（p50 / p90 / p99）
+- バッチサイズごとのスループット（1〜100万行）
+- メモリ使用量の推定値
+- コンパイル済み推論（ml_core.compiled）に対応していれば、その1行予測レイテンシ
+
+実行例:
+    python -m benchmarks.bench_models --output bench.json
+    python -m benchmarks.bench_models --baseline bench.json --output bench_new.json
+
+--baseline を指定すると前回の結果と比較し、許容範囲を超えて遅くなった項目があれば終了コード1で終了します。
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ml_core import loading, model_cache, registry
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+# 比較時に「遅くなった」とみなす割合（1.2 = 20%以上悪化）
+DEFAULT_REGRESSION_RATIO = 1.2
+
+
+def make_inputs(model, n_rows, seed=0):
+    """
+    ベンチマーク用の入力を作ります。4特徴量ならアイリスのスライダーの範囲を使います
+    """
+    from ml_core import iris
+
+    n_features = getattr(model, "n_features_in_", 4)
+    rng = np.random.default_rng(seed)
+    if n_features == len(iris.IRIS_FEATURES):
+        return rng.uniform(iris.IRIS_LOWS, iris.IRIS_HIGHS, size=(n_rows, n_features))
+    return rng.normal(size=(n_rows, n_features))
+
+
+def drop_page_cache(path):
+    """
+    ファイルのページキャッシュを捨てるようOSに伝えます。できなければ False を返します
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        return False
+    return True
+
+
+def time_load(model_path, repeats):
+    timings = []
+    cold = True
+    for _ in range(repeats):
+        cold = drop_page_cache(model_path) and cold
+        started = time.perf_counter()
+        loading.load_model_file(model_path)
+        timings.append(time.perf_counter() - started)
+    return {
+        "min_ms": min(timings) * 1000,
+        "median_ms": float(np.median(timings)) * 1000,
+        "page_cache": "dropped" if cold else "warm",
+    }
+
+
+def bench_load(model_path, model, repeats):
+    result = {Path(model_path).suffix.lstrip("."): time_load(model_path, repeats)}
+
+    if Path(model_path).suffix.lower() not in loading.MMAP_SUFFIXES:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mmap_path = Path(tmp_dir) / "model.joblib"
+            try:
+                loading.save_mmap_model(model, mmap_path)
+                result["joblib_mmap"] = time_load(mmap_path, repeats)
+            except Exception as e:
+                result["joblib_mmap"] = {"error": str(e)}
+    return result
+
+
+def bench_latency(predict, X, n_calls):
+    """
+    1行ずつ predict を呼んだときのレイテンシのパーセンタイル（マイクロ秒）
+    """
+    rows = [X[i % len(X)].reshape(1, -1) for i in range(n_calls)]
+    # ウォームアップ
+    for row in rows[:min(50, n_calls)]:
+        predict(row)
+
+    timings = np.empty(n_calls)
+    for i, row in enumerate(rows):
+        started = time.perf_counter()
+        predict(row)
+        timings[i] = time.perf_counter() - started
+
+    timings *= 1e6
+    return {
+        "calls": n_calls,
+        "p50_us": float(np.percentile(timings, 50)),
+        "p90_us": float(np.percentile(timings, 90)),
+        "p99_us": float(np.percentile(timings, 99)),
+        "mean_us": float(timings.mean()),
+    }
+
+
+def bench_throughput(predict, model, batch_sizes, min_seconds):
+    results = []
+    for batch_size in batch_sizes:
+        X = make_inputs(model, batch_size)
+        n_calls = 0
+        started = time.perf_counter()
+        while True:
+            predict(X)
+            n_calls += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_seconds:
+                break
+        results.append({
+            "batch_size": batch_size,
+            "calls": n_calls,
+            "seconds_per_call": elapsed / n_calls,
+            "rows_per_second": batch_size * n_calls / elapsed,
+        })
+    return results
+
+
+def bench_model(model_path, args):
+    model = loading.load_model_file(model_path)
+    predict = model.predict_proba if hasattr(model, "predict_proba") else model.predict
+    X = make_inputs(model, 1_000)
+
+    result = {
+        "path": str(model_path),
+        "model_type": type(model).__name__,
+        "file_bytes": os.path.getsize(model_path),
+        "memory_bytes": model_cache.estimate_model_bytes(model),
+        "load": bench_load(model_path, model, args.load_repeats),
+        "single_row": bench_latency(predict, X, args.latency_calls),
+        "throughput": bench_throughput(predict, model, args.batch_sizes, args.min_seconds),
+    }
+
+    from ml_core import compiled
+    compiled_model = compiled.compile_model(model, probe_X=make_inputs(model, compiled.N_PROBE_ROWS, seed=1))
+    if compiled_model is not None:
+        compiled_predict = getattr(compiled_model, "predict_proba", compiled_model.predict)
+        result["compiled_single_row"] = bench_latency(compiled_predict, X, args.latency_calls)
+
+    return result
+
+
+def environment():
+    import sklearn
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(baseline, current, ratio):
+    """
+    前回の結果と比較し、悪化した項目のリストを返します
+    """
+    regressions = []
+    baseline_models = {m["path"]: m for m in baseline.get("models", []) if "error" not in m}
+
+    for model in current["models"]:
+        old = baseline_models.get(model["path"])
+        if old is None or "error" in model:
+            continue
+
+        checks = [("single_row.p50_us", old["single_row"]["p50_us"], model["single_row"]["p50_us"]),
+                  ("single_row.p99_us", old["single_row"]["p99_us"], model["single_row"]["p99_us"])]
+        for fmt, timing in model["load"].items():
+            if "median_ms" in timing and "median_ms" in old["load"].get(fmt, {}):
+                checks.append((f"load.{fmt}.median_ms", old["load"][fmt]["median_ms"], timing["median_ms"]))
+        old_throughput = {t["batch_size"]: t for t in old["throughput"]}
+        for t in model["throughput"]:
+            if t["batch_size"] in old_throughput:
+                # スループットは大きいほど良いので、1行あたりの時間に直して比較する
+                checks.append((f"throughput.{t['batch_size']}.seconds_per_row",
+                               1 / old_throughput[t["batch_size"]]["rows_per_second"],
+                               1 / t["rows_per_second"]))
+
+        for name, old_value, new_value in checks:
+            if old_value > 0 and new_value / old_value > ratio:
+                regressions.append({
+                    "model": model["path"],
+                    "metric": name,
+                    "baseline": old_value,
+                    "current": new_value,
+                    "ratio": new_value / old_value,
+                })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="モデル推論のベンチマーク")
+    parser.add_argument("--root", default="../", help="プロジェクトを探すフォルダ")
+    parser.add_argument("--model", action="append", help="計測するモデル（指定しない場合は root 以下を全て）")
+    parser.add_argument("--output", help="結果を書き出すJSONファイル（省略時は標準出力）")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--latency-calls", type=int, default=1_000, help="1行予測を計測する回数")
+    parser.add_argument("--load-repeats", type=int, default=3, help="読み込み時間を計測する回数")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="各バッチサイズを計測する最短時間（秒）")
+    parser.add_argument("--baseline", help="比較する前回の結果（JSON）")
+    parser.add_argument("--regression-ratio", type=float, default=DEFAULT_REGRESSION_RATIO)
+    args = parser.parse_args(argv)
+
+    if args.model:
+        model_paths = [Path(p) for p in args.model]
+    else:
+        index = registry.ModelRegistry(args.root, index_path=None)
+        model_paths = [m for project in index.projects() for m in project["models"]]
+
+    results = {"environment": environment(), "models": []}
+    for model_path in model_paths:
+        print(f"⏱️ {model_path}", file=sys.stderr)
+        try:
+            results["models"].append(bench_model(model_path, args))
+        except Exception as e:
+            results["models"].append({"path": str(model_path), "error": str(e)})
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        results["regressions"] = compare(baseline, results, args.regression_ratio)
+        for r in results["regressions"]:
+            print(f"⚠️ {r['model']} {r['metric']}: {r['baseline']:.4g} → {r['current']:.4g} ({r['ratio']:.2f}倍)",
+                  file=sys.stderr)
+        exit_code = 1 if results["regressions"] else 0
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""
+Streamlitアプリの負荷試験（同時セッションのシミュレーション）
+
+Streamlit の AppTest でアプリのスクリプトをヘッドレスに実行し、多数のセッションが
+スライダーを動かして予測ボタンを押す操作を同時に行います。Streamlit サーバーと同じく
+全セッションが1つのプロセス内のスレッドで動き、st.cache_resource なども共有されます。
+
+計測する項目:
+- 再実行（rerun）ごとのレイテンシ（p50 / p90 / p99 / 最大）
+- スループット（1秒あたりの再実行数）
+- プロセスのメモリ使用量（RSS）の推移
+
+ネットワークにも ../ 以下の本物のモデルにも依存しないように、一時フォルダに
+ダミーのモデル（アイリスと、スキーマ付きの汎用プロジェクト）を作り、そこをカレントディレクトリにして実行します。
+
+実行例:
+    python -m benchmarks.load_test --app iris_streamlit_app.py --sessions 50 --concurrency 16
+    python -m benchmarks.load_test --app multi_model_app.py --sessions 500 --concurrency 64 --output load.json
+"""
+import argparse
+import json
+import os
+import pickle
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.bench_models import environment
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# RSS を記録する間隔（秒）
+RSS_INTERVAL = 0.5
+
+# 1回の再実行のタイムアウト（秒）
+RERUN_TIMEOUT = 60.0
+
+IRIS_SLIDERS = ["がく片の長さ (cm)", "がく片の幅 (cm)", "花びらの長さ (cm)", "花びらの幅 (cm)"]
+
+PREDICT_BUTTONS = {
+    "iris_streamlit_app.py": "🔮 アイリスの種類を予測",
+    "multi_model_app.py": "🎯 予測実行",
+}
+
+DEMO_FEATURES = 6
+
+
+def make_dummy_models(root):
+    """
+    root/iris/models と root/demo/models にダミーのモデルを作ります
+
+    アイリスは sklearn に同梱されたデータで学習するので、ネットワークは使いません。
+    """
+    from sklearn.datasets import load_iris, make_classification
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    iris_dir = Path(root) / "iris" / "models"
+    iris_dir.mkdir(parents=True, exist_ok=True)
+    X, y = load_iris(return_X_y=True)
+    models = {
+        "model_iris.pkl": LogisticRegression(max_iter=1_000).fit(X, y),
+        "model_iris_rf.pkl": RandomForestClassifier(n_estimators=50, random_state=0).fit(X, y),
+    }
+    for name, model in models.items():
+        with open(iris_dir / name, "wb") as f:
+            pickle.dump(model, f)
+
+    demo_dir = Path(root) / "demo" / "models"
+    demo_dir.mkdir(parents=True, exist_ok=True)
+    X, y = make_classification(n_samples=2_000, n_features=DEMO_FEATURES, n_informative=4,
+                               n_classes=3, random_state=0)
+    with open(demo_dir / "model_demo.pkl", "wb") as f:
+        pickle.dump(RandomForestClassifier(n_estimators=100, random_state=0).fit(X, y), f)
+    spec = {
+        "features": [
+            {"name": f"x{i + 1}", "min": float(X[:, i].min()), "max": float(X[:, i].max()), "default": 0.0}
+            for i in range(DEMO_FEATURES)
+        ],
+        "class_names": ["A", "B", "C"],
+    }
+    with open(demo_dir / "model_demo.schema.json", "w", encoding="utf-8") as f:
+        json.dump(spec, f, ensure_ascii=False)
+
+
+def rss_bytes():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class RssSampler:
+    """
+    バックグラウンドで一定間隔ごとに RSS を記録します
+    """
+
+    def __init__(self, interval=RSS_INTERVAL):
+        self.interval = interval
+        self.samples = []  # (経過秒, RSSのMB)
+        self._stopped = threading.Event()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            rss = rss_bytes()
+            if rss is not None:
+                self.samples.append((round(time.perf_counter() - self._started, 3), rss / 1024**2))
+            if self._stopped.wait(self.interval):
+                break
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.samples
+
+
+def _by_label(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+
+def _feature_bounds(project):
+    """
+    プロジェクトのスキーマのJSON（make_dummy_models が書いたもの）から {特徴量名: (最小, 最大)} を返します
+
+    AppTest の数値入力からは min_value / max_value を読めないので、範囲はスキーマから取ります。
+    """
+    bounds = {}
+    for path in (Path("..") / project / "models").glob("*.schema.json"):
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+        for feature in spec["features"]:
+            bounds[feature["name"]] = (feature.get("min", -3.0), feature.get("max", 3.0))
+    return bounds
+
+
+def _set_inputs(at, app_name, rng):
+    """
+    スライダー（または数値入力）をランダムな値に動かします
+    """
+    project = at.sidebar.selectbox[0].value if app_name == "multi_model_app.py" else "iris"
+    if project != "iris":
+        bounds = _feature_bounds(project)
+        for number_input in at.number_input:
+            low, high = bounds.get(number_input.label, (-3.0, 3.0))
+            number_input.set_value(round(rng.uniform(low, high), 1))
+        return
+    for label in IRIS_SLIDERS:
+        slider = _by_label(at.slider, label)
+        slider.set_value(round(rng.uniform(slider.min, slider.max), 1))
+
+
+def run_session(app_path, session_id, steps, project, seed, started_at, timeout=RERUN_TIMEOUT):
+    """
+    1つのセッション: ページを開き、入力を変えて予測ボタンを押す操作を steps 回行います
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    app_name = Path(app_path).name
+    records = []
+
+    def rerun(kind, action):
+        t0 = time.perf_counter()
+        error = None
+        try:
+            action()
+            if at.exception:
+                error = str(at.exception[0].message)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finished = time.perf_counter()
+        records.append({
+            "session": session_id,
+            "kind": kind,
+            "start_s": t0 - started_at,
+            "latency_ms": (finished - t0) * 1000,
+            "error": error,
+        })
+        return error is None
+
+    at = AppTest.from_file(str(app_path), default_timeout=timeout)
+    if not rerun("open", at.run):
+        return records
+
+    if app_name == "multi_model_app.py" and project:
+        if not rerun("select_project", lambda: at.sidebar.selectbox[0].set_value(project).run()):
+            return records
+
+    for _ in range(steps):
+        if not rerun("input", lambda: (_set_inputs(at, app_name, rng), at.run())):
+            break
+        if not rerun("predict", lambda: _by_label(at.button, PREDICT_BUTTONS[app_name]).click().run()):
+            break
+    return records
+
+
+def summarize(records, elapsed):
+    latencies = np.array([r["latency_ms"] for r in records if r["error"] is None])
+    summary = {
+        "reruns": len(records),
+        "errors": sum(r["error"] is not None for r in records),
+        "elapsed_s": elapsed,
+        "reruns_per_second": len(latencies) / elapsed if elapsed > 0 else None,
+    }
+    if len(latencies):
+        summary.update({
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p90_ms": float(np.percentile(latencies, 90)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max()),
+            "mean_ms": float(latencies.mean()),
+        })
+    by_kind = {}
+    for kind in sorted({r["kind"] for r in records}):
+        values = [r["latency_ms"] for r in records if r["kind"] == kind and r["error"] is None]
+        if values:
+            by_kind[kind] = {"count": len(values), "p50_ms": float(np.percentile(values, 50)),
+                             "p99_ms": float(np.percentile(values, 99))}
+    summary["by_kind"] = by_kind
+    return summary
+
+
+def run_load_test(app_path, sessions, concurrency, steps, project=None, ramp_seconds=0.0, seed=0):
+    """
+    sessions 個のセッションを最大 concurrency 個同時に実行し、計測結果を返します
+    """
+    sampler = RssSampler()
+    started_at = time.perf_counter()
+
+    def _session(session_id):
+        # セッションの開始を ramp_seconds の間に散らす
+        if ramp_seconds > 0:
+            delay = ramp_seconds * session_id / sessions - (time.perf_counter() - started_at)
+            if delay > 0:
+                time.sleep(delay)
+        return run_session(app_path, session_id, steps, project, seed + session_id, started_at)
+
+    records = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for session_records in pool.map(_session, range(sessions)):
+            records.extend(session_records)
+
+    elapsed = time.perf_counter() - started_at
+    rss_samples = sampler.stop()
+    errors = sorted({r["error"] for r in records if r["error"] is not None})
+    return {
+        "summary": summarize(records, elapsed),
+        "peak_rss_mb": max((mb for _, mb in rss_samples), default=None),
+        "rss_mb": rss_samples,
+        "errors": errors[:20],
+        "reruns": records,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streamlitアプリの負荷試験")
+    parser.add_argument("--app", default="iris_streamlit_app.py", choices=sorted(PREDICT_BUTTONS))
+    parser.add_argument("--sessions", type=int, default=50, help="シミュレーションするセッション数")
+    parser.add_argument("--concurrency", type=int, default=16, help="同時に動かすセッション数")
+    parser.add_argument("--steps", type=int, default=5, help="1セッションで入力を変えて予測する回数")
+    parser.add_argument("--project", default="iris", help="multi_model_app.py で選ぶプロジェクト（iris / demo）")
+    parser.add_argument("--ramp-seconds", type=float, default=0.0, help="全セッションを開始し終えるまでの秒数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-reruns", action="store_true", help="再実行ごとの記録もJSONに含める")
+    parser.add_argument("--output", help="結果を書き出すJSONファイル（省略時は標準出力）")
+    args = parser.parse_args(argv)
+
+    app_path = REPO_DIR / args.app
+    sys.path.insert(0, str(REPO_DIR))
+    # 予測ログやプロファイルの書き出しは計測に含めない
+    os.environ.setdefault("PREDICTION_LOG", "0")
+    os.environ.pop("ML_PROFILE", None)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        make_dummy_models(tmp_dir)
+        # アプリの相対パス（../iris/models/... や ../ 以下の走査）がダミーのモデルを指すようにする
+        work_dir = Path(tmp_dir) / "app"
+        work_dir.mkdir()
+        previous_dir = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            result = run_load_test(
+                app_path, args.sessions, args.concurrency, args.steps,
+                project=args.project, ramp_seconds=args.ramp_seconds, seed=args.seed,
+            )
+        finally:
+            os.chdir(previous_dir)
+
+    if not args.keep_reruns:
+        result.pop("reruns")
+    result = {
+        "environment": environment(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        **result,
+    }
+
+    summary = result["summary"]
+    print(
+        f"🚦 {args.app}: {summary['reruns']:,}回の再実行（エラー {summary['errors']}）"
+        f" / {summary['reruns_per_second'] or 0:.1f} 回/秒"
+        f" / p50 {summary.get('p50_ms', 0):.0f} ms / p99 {summary.get('p99_ms', 0):.0f} ms"
+        f" / 最大RSS {result['peak_rss_mb'] or 0:.0f} MB",
+        file=sys.stderr,
+    )
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import streamlit as st
+import numpy as np
+import os
+from pathlib import Path
+
+from ml_core import drift, iris, lazy, loading, prediction_log, schema
+
+# 表や図のライブラリは使う時点で import する（最初の表示を速くするため）
+pd = lazy.lazy_import("pandas")
+go = lazy.lazy_import("plotly.graph_objects")
+
+st.set_page_config(
+    page_title="📉 ドリフト監視ダッシュボード",
+    page_icon="📉",
+    layout="wide"
+)
+
+st.title("📉 ドリフト・データ品質ダッシュボード")
+st.markdown("予測ログの入力分布が、最初の期間（基準）から変わっていないかを確認します")
+
+# 1. 集計の設定
+st.sidebar.header("⚙️ 集計の設定")
+log_dir = st.sidebar.text_input(
+    "予測ログのフォルダ",
+    value=os.environ.get("PREDICTION_LOG_DIR", prediction_log.DEFAULT_LOG_DIR)
+)
+reference_rows = st.sidebar.number_input("基準期間の件数", min_value=100, value=drift.DEFAULT_REFERENCE_ROWS, step=1000)
+window_rows = st.sidebar.number_input("直近ウィンドウ1つの件数", min_value=100, value=drift.DEFAULT_WINDOW_ROWS, step=100)
+n_windows = st.sidebar.number_input("直近として使うウィンドウ数", min_value=1, max_value=100, value=drift.DEFAULT_N_WINDOWS)
+
+
+def is_iris_model(model_path):
+    """
+    アイリス予測アプリのモデル（または iris プロジェクトのモデル）なら True を返します
+    """
+    path = Path(model_path)
+    return path.resolve() == Path(loading.DEFAULT_MODEL_PATH).resolve() or path.parent.parent.name == "iris"
+
+
+def make_monitor(model_path, n_features, reference_rows, window_rows, n_windows):
+    """
+    モデルごとの特徴量の範囲を決めて DriftMonitor を作ります（範囲が分からないモデルは None）
+
+    スキーマのJSONに範囲があればそれを使い、無ければアイリスのモデルに限ってスライダーの範囲を使います。
+    """
+    try:
+        model_schema = schema.load_schema(model_path, None) if schema.sidecar_path(model_path).exists() else None
+    except (ValueError, KeyError, TypeError):
+        # 壊れたサイドカーJSONは無いものとして扱う
+        model_schema = None
+    if (model_schema is not None and model_schema.n_features == n_features
+            and np.isfinite(model_schema.lows).all() and np.isfinite(model_schema.highs).all()):
+        lows, highs, names = model_schema.lows, model_schema.highs, model_schema.names
+    elif n_features == len(iris.IRIS_FEATURES) and is_iris_model(model_path):
+        # アイリスはスライダーの範囲が期待する分布の範囲
+        lows, highs, names = iris.IRIS_LOWS, iris.IRIS_HIGHS, iris.IRIS_FEATURE_NAMES
+    else:
+        return None
+    return drift.DriftMonitor(
+        lows, highs, feature_names=list(names),
+        reference_rows=reference_rows, window_rows=window_rows, n_windows=n_windows
+    )
+
+
+# 全セッションで共有（前回読んだ位置から続きだけを読む）
+@st.cache_resource
+def get_log_monitor(log_dir, reference_rows, window_rows, n_windows):
+    return drift.LogMonitor(
+        log_dir,
+        lambda model_path, n_features: make_monitor(model_path, n_features, reference_rows, window_rows, n_windows)
+    )
+
+log_monitor = get_log_monitor(log_dir, int(reference_rows), int(window_rows), int(n_windows))
+
+if st.sidebar.button("🔄 新しいログを読み込む") or not log_monitor.monitors:
+    with st.spinner("予測ログを集計しています..."):
+        n_read = log_monitor.refresh()
+    st.sidebar.success(f"{n_read:,}件を追加しました")
+
+monitors = log_monitor.monitors
+if not monitors:
+    st.info("集計できる予測ログがありません。予測アプリで予測を実行するとログが記録されます")
+    st.stop()
+
+# 2. モデルの選択
+model_path = st.selectbox("モデル", list(monitors))
+report = monitors[model_path].report()
+
+col1, col2, col3 = st.columns(3)
+col1.metric("総件数", f"{report['total_rows']:,}")
+col2.metric("基準期間", f"{report['reference_rows']:,}件")
+col3.metric("直近ウィンドウ", f"{report['current_rows']:,}件")
+
+if report["current_rows"] == 0:
+    st.info("基準期間のログしかありません。件数が増えると直近との比較が表示されます")
+    st.stop()
+
+# 3. 特徴量ごとのドリフト
+st.subheader("📊 特徴量ごとのドリフト")
+
+
+def psi_status(value):
+    if value is None:
+        return "－"
+    if value >= drift.PSI_ALERT:
+        return "🔴 大きな変化"
+    if value >= drift.PSI_WARNING:
+        return "🟡 やや変化"
+    return "🟢 安定"
+
+
+summary = pd.DataFrame([
+    {
+        "特徴量": f["name"],
+        "PSI": round(f["psi"], 4) if f["psi"] is not None else None,
+        "KS": round(f["ks"], 4) if f["ks"] is not None else None,
+        "範囲外の割合": f"{f['out_of_range_rate']:.1%}",
+        "欠損": f["missing"],
+        "判定": psi_status(f["psi"]),
+    }
+    for f in report["features"]
+])
+st.dataframe(summary, use_container_width=True, hide_index=True)
+
+feature_name = st.selectbox("分布を比較する特徴量", [f["name"] for f in report["features"]])
+feature = next(f for f in report["features"] if f["name"] == feature_name)
+
+edges = feature["bin_edges"]
+centers = [(a + b) / 2 for a, b in zip(edges[:-1], edges[1:])]
+reference_total = max(sum(feature["reference_counts"]), 1)
+current_total = max(sum(feature["current_counts"]), 1)
+
+fig = go.Figure()
+fig.add_trace(go.Bar(x=centers, y=[c / reference_total for c in feature["reference_counts"]], name="基準期間"))
+fig.add_trace(go.Bar(x=centers, y=[c / current_total for c in feature["current_counts"]], name="直近"))
+fig.update_layout(barmode="group", title=f"{feature_name} の分布", xaxis_title=feature_name, yaxis_title="割合")
+st.plotly_chart(fig, use_container_width=True)
+
+# 4. 予測クラスの構成比
+st.subheader("🏷️ 予測クラスの構成比")
+classes = sorted(set(report["reference_classes"]) | set(report["current_classes"]))
+class_fig = go.Figure()
+class_fig.add_trace(go.Bar(x=classes, y=[report["reference_classes"].get(c, 0) for c in classes], name="基準期間"))
+class_fig.add_trace(go.Bar(x=classes, y=[report["current_classes"].get(c, 0) for c in classes], name="直近"))
+class_fig.update_layout(barmode="group", yaxis_title="割合", yaxis_tickformat=".0%")
+st.plotly_chart(class_fig, use_container_width=True)
+
+with st.expander("📚 指標の見方"):
+    st.markdown(f"""
+    - **PSI**: 分布の変化の大きさ。{drift.PSI_WARNING}未満は安定、{drift.PSI_ALERT}以上は大きな変化
+    - **KS**: 累積分布の最大の差（0〜1）。ビン単位で近似しています
+    - **範囲外の割合**: スライダー（または入力スキーマ）の範囲から外れた入力の割合
+    - 統計は固定サイズのヒストグラムで集計しているので、ログが増えてもメモリ使用量は変わりません
+    """)
+
+st.markdown("---")
+st.markdown("📉 **ドリフト監視ダッシュボード** - 予測ログから入力分布の変化を検知")
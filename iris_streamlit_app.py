@@ -1,8 +1,19 @@
 import streamlit as st
-import pickle
 import numpy as np
-import pandas as pd
 import os
+import tempfile
+import time
+
+from ml_core import (
+    compiled, decision_surface, hot_reload, iris, lazy, loading, model_cache, prediction_cache, prediction_log,
+    profiling
+)
+
+# numpy は ml_core のモジュールが使うので最初に import する。
+# pandas は入力データの表を作るときまで、一括予測と学習はファイルが来たときやモデルが無いときまで import しない
+pd = lazy.lazy_import("pandas")
+batch = lazy.lazy_import("ml_core.batch")
+training = lazy.lazy_import("ml_core.training")
 
 # ページ設定
 st.set_page_config(
@@ -11,45 +22,119 @@ st.set_page_config(
     layout="wide"
 )
 
+# 処理時間の計測（環境変数 ML_PROFILE=1 のときだけ有効）
+prof = profiling.start_rerun("iris_streamlit_app")
+
 st.title("🌸 アイリス（あやめ）予測アプリ")
 st.markdown("あなたが作った機械学習モデルを使って、花の種類を予測します！")
 
+# スライダーの範囲（がく片の長さ、がく片の幅、花びらの長さ、花びらの幅）の検証用データ
+PROBE = compiled.make_probe(4, low=iris.IRIS_LOWS, high=iris.IRIS_HIGHS)
+
+
+def compile_for_iris(model):
+    """
+    モデルをコンパイルします。未対応のモデルや結果が一致しない場合は None を返します
+    """
+    return compiled.compile_model(model, probe_X=PROBE)
+
+
+def on_model_swap(old, new):
+    """
+    モデルが差し替わったら、共有キャッシュを新しいモデルにして古い予測結果を捨てます
+    """
+    model_cache.shared_cache().put(loading.DEFAULT_MODEL_PATH, new.model)
+    prediction_cache.shared_iris_cache().discard(prediction_cache.model_key(loading.DEFAULT_MODEL_PATH, old.model))
+
+
 # 1. モデルを読み込む関数
 @st.cache_resource
 def load_model():
     """
     保存されたpickleファイルからモデルを読み込みます
+
+    ファイルが更新されたら、バックグラウンドで読み込み・検証してから差し替えます（ホットリロード）
     """
     # モデルファイルのパス
-    model_path = "../iris/models/model_iris.pkl"
+    model_path = loading.DEFAULT_MODEL_PATH
     
-    # ファイルが存在するかチェック
-    if os.path.exists(model_path):
-        try:
-            # pickleファイルを開いて読み込み
-            with open(model_path, 'rb') as f:
-                model = pickle.load(f)
-            
-            st.success("✅ モデルの読み込みが完了しました！")
-            return model
-            
-        except Exception as e:
-            st.error(f"❌ モデルの読み込みでエラーが発生: {e}")
-            return None
-    else:
+    try:
+        # pickleファイルを開いて読み込み（事前ウォームアップで読み込み済みならそれを使う）
+        model = hot_reload.HotReloadingModel(
+            model_path,
+            initial_model=model_cache.shared_cache().get(model_path),
+            validate=lambda m: hot_reload.validate_model(m, PROBE),
+            prepare=compile_for_iris,
+            on_swap=on_model_swap
+        )
+        
+        st.success("✅ モデルの読み込みが完了しました！")
+        return model
+        
+    except FileNotFoundError:
         st.error("❌ モデルファイルが見つかりません")
         st.info(f"探しているパス: {model_path}")
-        st.info("irisプロジェクトでモデルを学習してから実行してください")
+        st.info("irisプロジェクトでモデルを学習するか、下のボタン（または python -m ml_core.training）でモデルを作成してください")
+        return None
+        
+    except Exception as e:
+        st.error(f"❌ モデルの読み込みでエラーが発生: {e}")
         return None
 
 # 2. モデルを読み込み
 st.subheader("🤖 モデル読み込み状況")
-model = load_model()
+with prof.stage("load_model"):
+    reloading_model = load_model()
 
 # モデルが読み込めない場合は処理を停止
-if model is None:
+if reloading_model is None:
+    if st.button("🏋️ 同梱のアイリスデータでモデルを学習して書き出す"):
+        with st.spinner("モデルを学習しています..."):
+            trained_model, training_info = training.train()
+            training.export(trained_model, training_info)
+        load_model.clear()
+        st.rerun()
     st.stop()
 
+# この再実行の間は同じバージョンを使う（途中で差し替わっても混ざらない）
+model_version = reloading_model.current
+model = model_version.model
+
+reload_stats = reloading_model.stats()
+if reload_stats["version"] > 0:
+    loaded_at = time.strftime("%H:%M:%S", time.localtime(reload_stats["loaded_at"]))
+    st.caption(f"🔄 モデルファイルの更新を反映しました（{reload_stats['reloads']}回目、{loaded_at}）")
+if reload_stats["last_error"]:
+    st.warning(f"⚠️ 新しいモデルファイルを読み込めなかったため、前のモデルを使っています: {reload_stats['last_error']}")
+
+# 高速推論モード（NumPyだけで計算するコンパイル済みモデル。モデルと一緒にバックグラウンドで準備済み）
+
+use_compiled = st.toggle(
+    "⚡ 高速推論モード",
+    value=True,
+    help="対応しているモデルはNumPyだけで予測します（結果は元のモデルと一致することを確認済み）"
+)
+predictor = model
+if use_compiled:
+    compiled_model = model_version.prepared
+    if compiled_model is not None:
+        predictor = compiled_model
+    else:
+        st.caption("このモデルは高速推論モードに対応していないため、通常の予測を使います")
+
+# 予測結果キャッシュ（スライダーは0.1cm刻みなので、同じ入力の結果を使い回す）
+prediction_results = prediction_cache.shared_iris_cache()
+predictor_key = prediction_cache.model_key(loading.DEFAULT_MODEL_PATH, model)
+
+if st.toggle(
+    "🧮 全入力パターンを事前計算",
+    value=prediction_results.is_precomputed(predictor_key),
+    help="スライダーで選べる全ての組み合わせを一度にまとめて予測し、以降はモデルを呼ばずに結果を返します"
+):
+    if not prediction_results.is_precomputed(predictor_key):
+        with st.spinner("全入力パターンを予測しています..."):
+            prediction_results.precompute(predictor_key, predictor)
+
 # 3. アイリスの種類情報
 iris_types = {
     0: "🌼 セトサ (Setosa)",
@@ -105,10 +190,11 @@ with col2:
 
 # 5. 入力データの表示
 st.subheader("📋 入力データ")
-input_df = pd.DataFrame({
-    '特徴量': ['がく片の長さ', 'がく片の幅', '花びらの長さ', '花びらの幅'],
-    '値 (cm)': [sepal_length, sepal_width, petal_length, petal_width]
-})
+with prof.stage("input_df"):
+    input_df = pd.DataFrame({
+        '特徴量': ['がく片の長さ', 'がく片の幅', '花びらの長さ', '花びらの幅'],
+        '値 (cm)': [sepal_length, sepal_width, petal_length, petal_width]
+    })
 st.dataframe(input_df, use_container_width=True)
 
 # 6. 予測実行
@@ -120,9 +206,17 @@ if st.button("🔮 アイリスの種類を予測", type="primary", use_containe
         # 入力データを配列に変換（モデルが期待する形式）
         input_data = np.array([[sepal_length, sepal_width, petal_length, petal_width]])
         
-        # 予測実行
-        prediction = model.predict(input_data)[0]  # [0]で最初の要素を取得
-        prediction_proba = model.predict_proba(input_data)[0]  # 各クラスの確率
+        # 予測実行（キャッシュにあればモデルを呼ばない。予測クラスは確率が最大のクラス）
+        with prof.stage("predict"):
+            predict_started = time.perf_counter()
+            prediction, prediction_proba = prediction_results.predict(predictor_key, predictor, input_data[0])
+            predict_latency_ms = (time.perf_counter() - predict_started) * 1000
+        
+        # 予測ログ（キューに入れるだけで、ディスクへの書き込みは待たない）
+        prediction_log.log_prediction(
+            "iris_streamlit_app", loading.DEFAULT_MODEL_PATH,
+            input_data[0], prediction, prediction_proba, predict_latency_ms
+        )
         
         # 結果表示
         predicted_type = iris_types[prediction]
@@ -151,7 +245,119 @@ if st.button("🔮 アイリスの種類を予測", type="primary", use_containe
     except Exception as e:
         st.error(f"❌ 予測中にエラーが発生しました: {e}")
 
-# 7. 使い方の説明
+# 7. 決定境界マップ
+st.subheader("🗺️ 決定境界マップ")
+st.markdown("2つの特徴量を動かしたときに予測がどう変わるかを地図のように表示します（他の特徴量は今の値で固定）")
+
+if st.toggle("マップを表示", value=False):
+    map_col1, map_col2, map_col3 = st.columns(3)
+    with map_col1:
+        x_index = st.selectbox("横軸", range(4), index=2, format_func=lambda i: iris.IRIS_FEATURE_NAMES[i])
+    with map_col2:
+        y_index = st.selectbox("縦軸", range(4), index=3, format_func=lambda i: iris.IRIS_FEATURE_NAMES[i])
+    with map_col3:
+        show_class = st.selectbox(
+            "色で表す値",
+            [None, 0, 1, 2],
+            format_func=lambda c: "予測クラス" if c is None else f"{iris_types[c]} の確率"
+        )
+
+    if x_index == y_index:
+        st.warning("横軸と縦軸には別々の特徴量を選んでください")
+    else:
+        current_values = [sepal_length, sepal_width, petal_length, petal_width]
+        # 固定する特徴量の値だけをキーにするので、軸にした特徴量のスライダーを動かしても再計算しない
+        fixed_values = tuple(v if i not in (x_index, y_index) else None for i, v in enumerate(current_values))
+
+        @st.cache_data(max_entries=64)
+        def get_surface(_model, model_key, x_index, y_index, fixed_values):
+            values = [0.0 if v is None else v for v in fixed_values]
+            return decision_surface.compute_surface(_model, x_index, y_index, values, iris.IRIS_LOWS, iris.IRIS_HIGHS)
+
+        with prof.stage("decision_surface"):
+            xs, ys, surface = get_surface(predictor, predictor_key, x_index, y_index, fixed_values)
+        with prof.stage("plot"):
+            fig = decision_surface.build_figure(
+                xs, ys, surface,
+                class_names=[iris_types[i] for i in range(3)],
+                x_label=f"{iris.IRIS_FEATURE_NAMES[x_index]} (cm)",
+                y_label=f"{iris.IRIS_FEATURE_NAMES[y_index]} (cm)",
+                point=(current_values[x_index], current_values[y_index]),
+                show_class=show_class
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+# 8. バッチ予測（CSV/Parquetファイル）
+st.subheader("📂 ファイルから一括予測")
+st.markdown("測定データのCSV/Parquetファイルをアップロードすると、全行をまとめて予測します")
+
+uploaded_batch = st.file_uploader(
+    "測定データファイル",
+    type=["csv", "parquet"],
+    help="1行が1つの花の測定値です。大きなファイルは分割して順番に処理します"
+)
+
+if uploaded_batch is not None:
+    try:
+        columns = batch.read_columns(uploaded_batch, uploaded_batch.name)
+    except Exception as e:
+        st.error(f"❌ ファイルを読み込めませんでした: {e}")
+        columns = []
+
+    if columns:
+        # モデルが期待する順番で列を選択（がく片の長さ→がく片の幅→花びらの長さ→花びらの幅）
+        feature_labels = ['がく片の長さ', 'がく片の幅', '花びらの長さ', '花びらの幅']
+        batch_cols = st.columns(4)
+        feature_columns = []
+        for i, (col, label) in enumerate(zip(batch_cols, feature_labels)):
+            with col:
+                feature_columns.append(st.selectbox(
+                    label,
+                    columns,
+                    index=min(i, len(columns) - 1),
+                    key=f"batch_feature_{i}"
+                ))
+
+        chunk_rows = st.number_input(
+            "1回に処理する行数",
+            min_value=1_000,
+            max_value=1_000_000,
+            value=batch.DEFAULT_CHUNK_ROWS,
+            step=10_000
+        )
+
+        if st.button("📦 一括予測を実行", use_container_width=True):
+            output_format = batch.detect_format(uploaded_batch.name)
+            progress_text = st.empty()
+
+            try:
+                with tempfile.NamedTemporaryFile(suffix=f".{output_format}", delete=False) as output:
+                    total_rows = batch.score_file(
+                        model,
+                        uploaded_batch,
+                        uploaded_batch.name,
+                        feature_columns,
+                        output,
+                        label_names=iris_types,
+                        chunk_rows=int(chunk_rows),
+                        progress=lambda n: progress_text.write(f"⏳ {n:,}行を処理しました")
+                    )
+                    output_path = output.name
+
+                st.success(f"✅ {total_rows:,}行の予測が完了しました")
+                with open(output_path, "rb") as f:
+                    st.download_button(
+                        "💾 予測結果をダウンロード",
+                        data=f,
+                        file_name=f"predictions_{os.path.splitext(uploaded_batch.name)[0]}.{output_format}",
+                        use_container_width=True
+                    )
+                os.remove(output_path)
+
+            except Exception as e:
+                st.error(f"❌ 一括予測中にエラーが発生しました: {e}")
+
+# 9. 使い方の説明
 with st.expander("📚 使い方とコツ"):
     st.markdown("""
     ### 🌸 アイリスの特徴
@@ -178,7 +384,11 @@ with st.expander("📚 使い方とコツ"):
     - **幅**: 最も広い部分
     """)
 
-# 8. フッター
+# 10. フッター
 st.markdown("---")
 st.markdown("🤖 **あなたが作った機械学習モデル**を使用しています")
-st.markdown(f"📁 モデルファイル: `../iris/models/model_iris.pkl`")
\ No newline at end of file
+st.markdown(f"📁 モデルファイル: `{loading.DEFAULT_MODEL_PATH}`")
+
+# 処理時間（デバッグ）
+profiling.sidebar_panel(prof)
+prof.finish()
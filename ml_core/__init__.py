@@ -0,0 +1,3 @@
+"""
+Streamlitアプリ群で共有する推論まわりの部品
+"""
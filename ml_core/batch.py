@@ -0,0 +1,133 @@
+"""
+CSV/Parquetファイルの一括予測（バッチスコアリング）
+
+ファイルをチャンク単位で読み込み、チャンクごとに1回だけ predict_proba を呼び出します。
+予測クラスは確率の argmax から求めるので、predict を別に呼ぶ必要はありません。
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 1チャンクあたりの行数（メモリ使用量と速度のバランス）
+DEFAULT_CHUNK_ROWS = 100_000
+
+CSV_SUFFIXES = (".csv",)
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+
+def detect_format(file_name):
+    """
+    ファイル名の拡張子から "csv" か "parquet" を返します
+    """
+    suffix = Path(file_name).suffix.lower()
+    if suffix in CSV_SUFFIXES:
+        return "csv"
+    if suffix in PARQUET_SUFFIXES:
+        return "parquet"
+    raise ValueError(f"対応していないファイル形式です: {suffix}")
+
+
+def read_columns(source, file_name):
+    """
+    データ本体を読まずに列名だけを取得します
+    """
+    fmt = detect_format(file_name)
+    if fmt == "csv":
+        columns = list(pd.read_csv(source, nrows=0).columns)
+    else:
+        import pyarrow.parquet as pq
+        columns = list(pq.ParquetFile(source).schema_arrow.names)
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return columns
+
+
+def iter_chunks(source, file_name, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    ファイルを chunk_rows 行ずつの DataFrame として順番に返します
+    """
+    if detect_format(file_name) == "csv":
+        yield from pd.read_csv(source, usecols=columns, chunksize=chunk_rows)
+    else:
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(source)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+
+
+def score_chunk(model, chunk, feature_columns, label_names=None):
+    """
+    1チャンク分をまとめて予測し、元の列に予測結果と確率の列を追加して返します
+    """
+    X = chunk[feature_columns].to_numpy(dtype=np.float64, copy=False)
+
+    # predict_proba を1回だけ呼び、予測クラスは argmax から求める
+    proba = model.predict_proba(X)
+    classes = np.asarray(getattr(model, "classes_", np.arange(proba.shape[1])))
+    predictions = classes[proba.argmax(axis=1)]
+
+    result = chunk.copy()
+    result["prediction"] = predictions
+    if label_names is not None:
+        result["prediction_label"] = pd.Series(predictions, index=chunk.index).map(label_names)
+    for i, class_value in enumerate(classes):
+        result[f"proba_{class_value}"] = proba[:, i]
+    return result
+
+
+def _parquet_schema(table, feature_columns):
+    """
+    最初のチャンクから出力の Parquet スキーマを決めます（特徴量の列は float64 に固定する）
+
+    チャンクごとに型を推測すると、あるチャンクでは整数、別のチャンクでは欠損値を含む小数に
+    なった列でスキーマが変わり、書き込みに失敗するためです。
+    """
+    import pyarrow as pa
+
+    return pa.schema([
+        pa.field(field.name, pa.float64()) if field.name in feature_columns else field
+        for field in table.schema
+    ])
+
+
+def score_file(model, source, file_name, feature_columns, output,
+               output_format=None, label_names=None,
+               chunk_rows=DEFAULT_CHUNK_ROWS, progress=None, keep_columns=()):
+    """
+    ファイル全体をチャンク単位で予測し、結果を output（バイナリのファイルオブジェクト）に書き出します
+
+    読み込むのは特徴量の列と keep_columns（IDなど、結果に残したい列）だけです。
+    progress を渡すと、チャンクごとに処理済みの行数で呼び出されます。
+    戻り値は処理した行数です。
+    """
+    output_format = output_format or detect_format(file_name)
+    columns = list(feature_columns) + [c for c in keep_columns if c not in feature_columns]
+    total_rows = 0
+    parquet_writer = None
+
+    try:
+        for chunk in iter_chunks(source, file_name, columns=columns, chunk_rows=chunk_rows):
+            scored = score_chunk(model, chunk, feature_columns, label_names)
+
+            if output_format == "csv":
+                scored.to_csv(output, header=(total_rows == 0), index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                if parquet_writer is None:
+                    schema = _parquet_schema(pa.Table.from_pandas(scored, preserve_index=False), feature_columns)
+                    parquet_writer = pq.ParquetWriter(output, schema)
+                # 2つ目以降のチャンクも最初のチャンクのスキーマに揃える（欠損値は null になる）
+                table = pa.Table.from_pandas(scored, schema=parquet_writer.schema, preserve_index=False)
+                parquet_writer.write_table(table)
+
+            total_rows += len(scored)
+            if progress is not None:
+                progress(total_rows)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    return total_rows
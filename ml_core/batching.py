@@ -0,0 +1,241 @@
+"""
+プロセス全体で共有するマイクロバッチ予測
+
+複数のセッションから同時に届いた1行ずつの予測リクエストを、モデルごとのキューに集めて
+1回の predict_proba でまとめて処理します。予測クラスは確率の argmax から求めます。
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 直近何バッチ分の統計を保持するか
+METRICS_WINDOW = 1000
+
+
+class _Request:
+    def __init__(self, rows):
+        self.rows = rows
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchMetrics:
+    """
+    バッチサイズとキュー待ち時間の統計
+    """
+
+    def __init__(self, window=METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self.batch_sizes = deque(maxlen=window)
+        self.queue_waits_ms = deque(maxlen=window)
+        self.total_batches = 0
+        self.total_rows = 0
+
+    def record(self, batch_size, waits_ms):
+        with self._lock:
+            self.batch_sizes.append(batch_size)
+            self.queue_waits_ms.extend(waits_ms)
+            self.total_batches += 1
+            self.total_rows += batch_size
+
+    def summary(self):
+        with self._lock:
+            sizes = np.asarray(self.batch_sizes, dtype=float)
+            waits = np.asarray(self.queue_waits_ms, dtype=float)
+            return {
+                "total_batches": self.total_batches,
+                "total_rows": self.total_rows,
+                "mean_batch_size": float(sizes.mean()) if sizes.size else 0.0,
+                "max_batch_size": int(sizes.max()) if sizes.size else 0,
+                "mean_queue_wait_ms": float(waits.mean()) if waits.size else 0.0,
+                "p95_queue_wait_ms": float(np.percentile(waits, 95)) if waits.size else 0.0,
+            }
+
+
+class MicroBatcher:
+    """
+    1つのモデルに対する予測リクエストをまとめて処理するキュー
+
+    最初のリクエストから max_wait_ms だけ待つか、max_batch_rows 行に達した時点で
+    バッチを確定し、専用スレッドで predict_proba を1回呼び出します。
+    列数の違うリクエストは別々に予測するので、1件の不正な入力がバッチ全体を失敗させることはありません。
+    """
+
+    def __init__(self, model, max_batch_rows=64, max_wait_ms=5.0):
+        self.model = model
+        self.classes = np.asarray(getattr(model, "classes_", []))
+        self.n_features = getattr(model, "n_features_in_", None)
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = BatchMetrics()
+        self.in_flight = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closing = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._worker, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def closed(self):
+        return self._closing
+
+    def predict_proba(self, rows, timeout=None):
+        """
+        rows をキューに入れ、(予測クラス, 確率) が返るまで待ちます
+
+        特徴量の数が合わない入力は ValueError になります。閉じた後に呼ばれた場合は
+        キューに入れずに、呼び出したスレッドでそのまま予測します。
+        """
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, np.shape(rows)[-1])
+        if self.n_features is not None and rows.shape[1] != self.n_features:
+            raise ValueError(f"特徴量の数が違います（{rows.shape[1]}列、モデルは{self.n_features}列）")
+
+        request = _Request(rows)
+        with self._lock:
+            closing = self._closing
+            if not closing:
+                self.in_flight += 1
+                self._queue.put(request)
+        if closing:
+            return self._predict(rows)
+
+        try:
+            if not request.done.wait(timeout):
+                raise TimeoutError("予測がタイムアウトしました")
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def close(self):
+        """
+        新しいリクエストの受け付けをやめ、キューに残ったリクエストを処理してからスレッドを終了させます
+        """
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+            # 受け付けを止めてから終了の目印を入れるので、目印より後にリクエストが入ることはない
+            self._queue.put(None)
+
+    def _predict(self, X):
+        proba = self.model.predict_proba(X)
+        best = proba.argmax(axis=1)
+        labels = self.classes[best] if len(self.classes) else best
+        return labels, proba
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            self._closed = True
+            return []
+        pending = [first]
+        n_rows = len(first.rows)
+        deadline = time.perf_counter() + self.max_wait
+
+        while n_rows < self.max_batch_rows:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self._closed = True
+                break
+            pending.append(request)
+            n_rows += len(request.rows)
+        return pending
+
+    def _worker(self):
+        while not self._closed:
+            pending = self._collect()
+            if not pending:
+                continue
+            started = time.perf_counter()
+
+            groups = {}
+            for request in pending:
+                groups.setdefault(request.rows.shape[1], []).append(request)
+            for group in groups.values():
+                waits_ms = [(started - r.enqueued_at) * 1000 for r in group]
+                if self._run_batch(group):
+                    self.metrics.record(sum(len(r.rows) for r in group), waits_ms)
+
+        # 念のため、残っているリクエストがあればエラーで終わらせる（待ち続けるスレッドを残さない）
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request.error = RuntimeError("マイクロバッチは終了しています")
+                request.done.set()
+
+    def _run_batch(self, pending):
+        try:
+            labels, proba = self._predict(np.vstack([r.rows for r in pending]))
+        except Exception as e:
+            for request in pending:
+                request.error = e
+                request.done.set()
+            return False
+
+        start = 0
+        for request in pending:
+            end = start + len(request.rows)
+            request.result = (labels[start:end], proba[start:end])
+            request.done.set()
+            start = end
+        return True
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model_path, model, **kwargs):
+    """
+    モデルのパスごとにプロセス内で1つだけの MicroBatcher を返します
+
+    同じパスでもモデルのオブジェクトが入れ替わっていれば（再読み込みなど）新しく作り直します。
+    """
+    key = str(model_path)
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None or batcher.model is not model:
+            if batcher is not None:
+                batcher.close()
+            batcher = MicroBatcher(model, **kwargs)
+            _batchers[key] = batcher
+        return batcher
+
+
+def discard_batcher(model_path):
+    """
+    モデルのパスに対応する MicroBatcher を閉じて一覧から外します
+
+    処理中のリクエストには結果を返してから終了し、閉じた後に届いたリクエストは
+    呼び出したスレッドでそのまま予測するので、使用中のセッションを止めることはありません。
+    """
+    with _batchers_lock:
+        batcher = _batchers.pop(str(model_path), None)
+    if batcher is not None:
+        batcher.close()
+
+
+def all_metrics():
+    """
+    全モデルのバッチ統計を {モデルのパス: 統計} の形で返します
+    """
+    with _batchers_lock:
+        return {key: batcher.metrics.summary() for key, batcher in _batchers.items()}
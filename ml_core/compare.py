@@ -0,0 +1,156 @@
+"""
+複数モデルの比較（並列の読み込みと推論）
+
+同じ入力を選んだ全モデルで予測し、予測の一致率・確率の差・モデルごとのレイテンシを求めます。
+モデルの読み込みと推論はスレッドプールで同時に行うので、10個のモデルを比べても
+かかる時間は合計ではなく最も遅いモデルとほぼ同じです
+（読み込みのファイルI/Oや NumPy / sklearn の計算中は GIL が解放されるため）。
+
+クラスの並び（classes_）がモデルごとに違っても、確率は全モデルのクラスの和集合に揃えて比べます。
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# 同時に読み込み・推論するモデルの最大数
+DEFAULT_MAX_WORKERS = 8
+
+# ファイルで比較するときに使う最大行数（先頭から）
+MAX_FILE_ROWS = 100_000
+
+
+class ModelResult:
+    """
+    1つのモデルの読み込み・予測の結果
+    """
+
+    def __init__(self, model_path):
+        self.path = Path(model_path)
+        self.name = self.path.name
+        self.model = None
+        self.classes = None
+        self.labels = None
+        self.proba = None  # 和集合のクラス順に揃えた確率（predict_proba が無いモデルは None）
+        self.load_ms = None
+        self.predict_ms = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.labels is not None
+
+
+def _model_classes(model, n_columns=None):
+    classes = getattr(model, "classes_", None)
+    if classes is None and n_columns is not None:
+        classes = np.arange(n_columns)
+    return classes
+
+
+def _load(result, loader):
+    started = time.perf_counter()
+    try:
+        result.model = loader(result.path)
+    except Exception as e:
+        result.error = f"読み込みエラー: {e}"
+    result.load_ms = (time.perf_counter() - started) * 1000
+
+
+def _score(result, X):
+    """
+    predict_proba を持つモデルは1回だけ呼び、予測クラスは確率の argmax から求めます
+    """
+    started = time.perf_counter()
+    try:
+        if hasattr(result.model, "predict_proba"):
+            proba = np.asarray(result.model.predict_proba(X))
+            result.classes = np.asarray(_model_classes(result.model, proba.shape[1]))
+            result.labels = result.classes[proba.argmax(axis=1)]
+            result.proba = proba
+        else:
+            result.labels = np.asarray(result.model.predict(X))
+            result.classes = _model_classes(result.model)
+    except Exception as e:
+        result.error = f"予測エラー: {e}"
+    result.predict_ms = (time.perf_counter() - started) * 1000
+
+
+def _align_probabilities(results):
+    """
+    確率の列を全モデルのクラスの和集合の順に並べ直します
+    """
+    with_proba = [r for r in results if r.ok and r.proba is not None]
+    if not with_proba:
+        return
+    all_classes = np.unique(np.concatenate([np.asarray(r.classes).astype(str) for r in with_proba]))
+    for r in with_proba:
+        aligned = np.zeros((len(r.proba), len(all_classes)))
+        columns = np.searchsorted(all_classes, np.asarray(r.classes).astype(str))
+        aligned[:, columns] = r.proba
+        r.proba = aligned
+        r.classes = all_classes
+
+
+def agreement_matrix(results):
+    """
+    モデルの組ごとに、予測クラスが一致した行の割合を返します（対角は1）
+    """
+    ok = [r for r in results if r.ok]
+    labels = [np.asarray(r.labels).astype(str) for r in ok]
+    matrix = np.ones((len(ok), len(ok)))
+    for i in range(len(ok)):
+        for j in range(i + 1, len(ok)):
+            matrix[i, j] = matrix[j, i] = float((labels[i] == labels[j]).mean())
+    return [r.name for r in ok], matrix
+
+
+def all_agree_rate(results):
+    """
+    全モデルの予測クラスが一致した行の割合
+    """
+    labels = [np.asarray(r.labels).astype(str) for r in results if r.ok]
+    if not labels:
+        return None
+    stacked = np.stack(labels)
+    return float((stacked == stacked[0]).all(axis=0).mean())
+
+
+def probability_gaps(results):
+    """
+    モデルの組ごとの確率の差（行ごとの最大の絶対差の平均）を返します
+    """
+    with_proba = [r for r in results if r.ok and r.proba is not None]
+    matrix = np.zeros((len(with_proba), len(with_proba)))
+    for i in range(len(with_proba)):
+        for j in range(i + 1, len(with_proba)):
+            gap = np.abs(with_proba[i].proba - with_proba[j].proba).max(axis=1).mean()
+            matrix[i, j] = matrix[j, i] = float(gap)
+    return [r.name for r in with_proba], matrix
+
+
+def compare_models(model_paths, X, loader, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    読み込みから予測までをまとめて行い、(results, 全体の秒数) を返します
+
+    モデルごとに「読み込み→予測」を1つのタスクとして並列に実行するので、読み込みの速いモデルは
+    遅いモデルの読み込みを待たずに予測を始めます。loader には共有キャッシュの get など、
+    スレッドから呼んでも安全な関数を渡します。
+    """
+    started = time.perf_counter()
+    X = np.asarray(X, dtype=np.float64)
+    results = [ModelResult(path) for path in model_paths]
+
+    def _run(result):
+        _load(result, loader)
+        if result.error is None:
+            _score(result, X)
+        # 比較が終わったらモデルへの参照は持たない（キャッシュからの破棄を妨げない）
+        result.model = None
+
+    if results:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(results))) as pool:
+            list(pool.map(_run, results))
+    _align_probabilities(results)
+    return results, time.perf_counter() - started
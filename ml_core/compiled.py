@@ -0,0 +1,289 @@
+"""
+学習済みsklearnモデルを素のNumPyで評価する「コンパイル済み」推論
+
+1行だけの予測では、predict_proba の時間のほとんどが入力チェックなどsklearn側の
+前処理に使われます。対応しているモデルはパラメータを平坦なNumPy配列に取り出し、
+ベクトル化した計算だけで予測します。
+
+対応モデル:
+    - LogisticRegression / LinearSVC（LinearSVC は predict のみ）
+    - DecisionTreeClassifier / RandomForestClassifier / ExtraTreesClassifier
+    - 上記の前に StandardScaler を挟んだ Pipeline
+
+コンパイル後は元のモデルと出力を比較し、許容誤差を超えた場合や未対応のモデルでは
+None を返します（呼び出し側は元のモデルをそのまま使います）。
+
+KNeighborsClassifier は対応しません。距離が同じ近傍の選び方が sklearn の近傍探索
+（brute / kd_tree / ball_tree で異なる）と一致せず、スライダーのような刻みのある入力では
+同じ距離がよく出るため、検証用の乱数の入力では見つからない食い違いが起きるためです。
+"""
+import numpy as np
+
+# 元のモデルとの比較に使う許容誤差
+DEFAULT_TOLERANCE = 1e-6
+
+# 検証用の入力を何行作るか
+N_PROBE_ROWS = 512
+
+# 決定木の1回の計算で使う一時配列の上限（バイト）。超える入力は行を分けて計算する
+CHUNK_BYTES = 64 * 1024 * 1024
+
+
+class CompiledModel:
+    """
+    NumPyだけで予測するモデル
+
+    元のモデルと同じく predict と（確率を出せるモデルなら）predict_proba を持ちます。
+    """
+
+    def __init__(self, original, classes, scores, proba=None, transform=None):
+        self.original = original
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = getattr(original, "n_features_in_", None)
+        self._scores = scores
+        self._transform = transform
+        if proba is not None:
+            self._proba = proba
+            self.predict_proba = self._predict_proba
+
+    def _prepare(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self._transform is not None:
+            X = self._transform(X)
+        return X
+
+    def _predict_proba(self, X):
+        return self._proba(self._prepare(X))
+
+    def predict(self, X):
+        return self.classes_[self._scores(self._prepare(X)).argmax(axis=1)]
+
+    def __repr__(self):
+        return f"CompiledModel({type(self.original).__name__})"
+
+
+def _chunked(func, bytes_per_row, max_bytes=None):
+    """
+    入力の行を、一時配列が max_bytes（省略時は CHUNK_BYTES）に収まる行数ずつに分けて func を呼ぶ関数を返します
+    """
+    max_bytes = CHUNK_BYTES if max_bytes is None else max_bytes
+    rows_per_chunk = max(1, int(max_bytes // max(bytes_per_row, 1)))
+
+    def run(X):
+        if len(X) <= rows_per_chunk:
+            return func(X)
+        return np.concatenate([func(X[i:i + rows_per_chunk]) for i in range(0, len(X), rows_per_chunk)])
+
+    return run
+
+
+# ---- 線形モデル ----
+
+def _softmax(z):
+    z = z - z.max(axis=1, keepdims=True)
+    np.exp(z, out=z)
+    z /= z.sum(axis=1, keepdims=True)
+    return z
+
+
+def _linear_candidates(coef, intercept):
+    """
+    線形モデルの確率の出し方の候補（multinomial と one-vs-rest）を返します
+
+    sklearnのバージョンや multi_class の設定でどちらになるかが変わるため、
+    両方を用意して元のモデルと一致した方を採用します。
+    """
+    coef_t = np.ascontiguousarray(coef.T)
+
+    def decision(X):
+        return X @ coef_t + intercept
+
+    if coef.shape[0] == 1:
+        # 2クラス分類: 決定関数は1列
+        def scores(X):
+            d = decision(X)
+            return np.hstack([-d, d])
+
+        def proba(X):
+            p = 1.0 / (1.0 + np.exp(-decision(X)))
+            return np.hstack([1.0 - p, p])
+
+        return scores, [proba]
+
+    def proba_multinomial(X):
+        return _softmax(decision(X))
+
+    def proba_ovr(X):
+        p = 1.0 / (1.0 + np.exp(-decision(X)))
+        p /= p.sum(axis=1, keepdims=True)
+        return p
+
+    return decision, [proba_multinomial, proba_ovr]
+
+
+def _compile_linear(model, with_proba):
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    intercept = np.asarray(model.intercept_, dtype=np.float64)
+    scores, probas = _linear_candidates(coef, intercept)
+    return scores, (probas if with_proba else [None])
+
+
+# ---- 決定木・ランダムフォレスト ----
+
+def _flatten_trees(trees):
+    """
+    複数の決定木のノードを1つの配列にまとめ、木ごとの根ノードの位置を返します
+    """
+    lefts, rights, features, thresholds, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree in trees:
+        t = tree.tree_
+        is_leaf = t.children_left == -1
+        # 葉は自分自身を指すようにして、深さ分だけ回せば全サンプルが葉で止まるようにする
+        node_ids = np.arange(t.node_count)
+        lefts.append(np.where(is_leaf, node_ids, t.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, t.children_right) + offset)
+        features.append(np.where(is_leaf, 0, t.feature))
+        thresholds.append(np.where(is_leaf, np.inf, t.threshold))
+
+        value = t.value[:, 0, :].astype(np.float64)
+        value /= np.maximum(value.sum(axis=1, keepdims=True), np.finfo(np.float64).tiny)
+        values.append(value)
+
+        roots.append(offset)
+        offset += t.node_count
+        max_depth = max(max_depth, t.max_depth)
+
+    return (
+        np.concatenate(lefts), np.concatenate(rights), np.concatenate(features),
+        np.concatenate(thresholds), np.vstack(values), np.asarray(roots), max_depth,
+    )
+
+
+def _compile_trees(trees):
+    left, right, feature, threshold, value, roots, max_depth = _flatten_trees(trees)
+    n_trees = len(roots)
+
+    def proba_chunk(X):
+        # sklearnの決定木と同じく float32 に丸めてから閾値と比較する
+        X = X.astype(np.float32)
+        # nodes[木, サンプル] を全木・全サンプル同時に1段ずつ進める
+        nodes = np.repeat(roots[:, None], len(X), axis=1)
+        rows = np.arange(len(X))[None, :]
+        for _ in range(max_depth):
+            go_left = X[rows, feature[nodes]] <= threshold[nodes]
+            nodes = np.where(go_left, left[nodes], right[nodes])
+        return value[nodes].sum(axis=0) / n_trees
+
+    # 1行あたり、木の数 × (ノード番号・分岐の判定などの一時配列 + 葉のクラス割合)
+    proba = _chunked(proba_chunk, n_trees * (5 * 8 + value.shape[1] * 8))
+    return proba, [proba]
+
+
+# ---- 前処理（Pipeline） ----
+
+def _split_pipeline(model):
+    """
+    StandardScaler だけを前処理に持つ Pipeline を (変換関数, 最終モデル) に分解します
+    """
+    steps = getattr(model, "steps", None)
+    if steps is None:
+        return None, model
+
+    from sklearn.preprocessing import StandardScaler
+
+    scalers = []
+    for _, step in steps[:-1]:
+        if step is None or step == "passthrough":
+            continue
+        if not isinstance(step, StandardScaler):
+            return False, None
+        mean = step.mean_ if step.with_mean else 0.0
+        scale = step.scale_ if step.with_std else 1.0
+        scalers.append((np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)))
+
+    def transform(X):
+        for mean, scale in scalers:
+            X = (X - mean) / scale
+        return X
+
+    return (transform if scalers else None), steps[-1][1]
+
+
+def _compile_estimator(estimator):
+    """
+    (scores, proba候補のリスト) を返します。未対応なら None
+    """
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.svm import LinearSVC
+    from sklearn.tree import DecisionTreeClassifier
+
+    if isinstance(estimator, LogisticRegression):
+        return _compile_linear(estimator, with_proba=True)
+    if isinstance(estimator, LinearSVC):
+        return _compile_linear(estimator, with_proba=False)
+    if isinstance(estimator, DecisionTreeClassifier) and estimator.n_outputs_ == 1:
+        return _compile_trees([estimator])
+    if isinstance(estimator, (RandomForestClassifier, ExtraTreesClassifier)) and estimator.n_outputs_ == 1:
+        return _compile_trees(estimator.estimators_)
+    return None
+
+
+def make_probe(n_features, low=None, high=None, n_rows=N_PROBE_ROWS, seed=0):
+    """
+    検証用の入力を作ります。範囲が分かっていれば low〜high の一様乱数を使います
+    """
+    rng = np.random.default_rng(seed)
+    if low is None or high is None:
+        return rng.normal(0.0, 3.0, size=(n_rows, n_features))
+    return rng.uniform(low, high, size=(n_rows, n_features))
+
+
+def compile_model(model, probe_X=None, tolerance=DEFAULT_TOLERANCE):
+    """
+    モデルをコンパイルして CompiledModel を返します
+
+    未対応のモデル、または probe_X に対する出力が元のモデルと一致しない場合は None を返します。
+    """
+    try:
+        transform, estimator = _split_pipeline(model)
+        if transform is False:
+            return None
+        compiled = _compile_estimator(estimator)
+    except Exception:
+        return None
+    if compiled is None:
+        return None
+
+    scores, proba_candidates = compiled
+    classes = getattr(model, "classes_", None)
+    if classes is None:
+        return None
+
+    if probe_X is None:
+        n_features = getattr(model, "n_features_in_", None)
+        if n_features is None:
+            return None
+        probe_X = make_probe(n_features)
+    probe_X = np.asarray(probe_X, dtype=np.float64)
+
+    expected_labels = model.predict(probe_X)
+    expected_proba = model.predict_proba(probe_X) if proba_candidates[0] is not None else None
+
+    for proba in proba_candidates:
+        candidate = CompiledModel(model, classes, scores, proba, transform)
+        try:
+            if not np.array_equal(candidate.predict(probe_X), expected_labels):
+                continue
+            if proba is not None and not np.allclose(
+                    candidate.predict_proba(probe_X), expected_proba, rtol=0, atol=tolerance):
+                continue
+        except Exception:
+            continue
+        return candidate
+
+    return None
@@ -0,0 +1,92 @@
+"""
+決定境界マップ
+
+2つの特徴量を格子状に動かし、残りの特徴量は現在の値に固定して predict_proba を
+1回でまとめて計算します。結果はPlotlyのヒートマップとして描画します。
+"""
+import numpy as np
+
+from ml_core import lazy
+
+# 図を作るときまで import しない
+go = lazy.lazy_import("plotly.graph_objects")
+
+# 格子の1辺の点数
+DEFAULT_RESOLUTION = 120
+
+# 予測クラスごとの色（セトサ、バーシクラー、バージニカの順）
+CLASS_COLORS = ["#f9d84a", "#8e6cc9", "#d6336c", "#2f9e44", "#1c7ed6", "#f08c00"]
+
+
+def compute_surface(model, x_index, y_index, values, lows, highs, resolution=DEFAULT_RESOLUTION):
+    """
+    x_index, y_index の特徴量を格子状に動かしたときの確率を返します
+
+    戻り値は (x軸の値, y軸の値, 確率[y, x, クラス]) です。
+    values のうち x_index, y_index 以外の値が固定値として使われます。
+    """
+    xs = np.linspace(lows[x_index], highs[x_index], resolution)
+    ys = np.linspace(lows[y_index], highs[y_index], resolution)
+    grid_x, grid_y = np.meshgrid(xs, ys)
+
+    X = np.tile(np.asarray(values, dtype=np.float64), (grid_x.size, 1))
+    X[:, x_index] = grid_x.ravel()
+    X[:, y_index] = grid_y.ravel()
+
+    proba = model.predict_proba(X)
+    return xs, ys, proba.reshape(resolution, resolution, -1)
+
+
+def build_figure(xs, ys, proba, class_names, x_label, y_label, point, show_class=None):
+    """
+    確率の格子をヒートマップにし、現在の入力を点で重ねた図を作ります
+
+    show_class が None なら予測クラス（確率が最大のクラス）を、
+    クラス番号なら そのクラスの確率を色で表します。
+    """
+    n_classes = proba.shape[2]
+    names = [class_names[i] if i < len(class_names) else f"クラス{i}" for i in range(n_classes)]
+    hover = np.array(names, dtype=object)[proba.argmax(axis=2)]
+
+    if show_class is None:
+        colors = CLASS_COLORS[:n_classes]
+        # クラス番号ごとに一定の色になる段階的なカラースケール
+        colorscale = []
+        for i, color in enumerate(colors):
+            colorscale.append([i / n_classes, color])
+            colorscale.append([(i + 1) / n_classes, color])
+        heatmap = go.Heatmap(
+            x=xs, y=ys, z=proba.argmax(axis=2),
+            zmin=-0.5, zmax=n_classes - 0.5,
+            colorscale=colorscale,
+            customdata=hover,
+            hovertemplate=f"{x_label}: %{{x:.2f}}<br>{y_label}: %{{y:.2f}}<br>予測: %{{customdata}}<extra></extra>",
+            colorbar=dict(tickvals=list(range(n_classes)), ticktext=names),
+        )
+        title = "予測クラスの分布"
+    else:
+        heatmap = go.Heatmap(
+            x=xs, y=ys, z=proba[:, :, show_class],
+            zmin=0.0, zmax=1.0,
+            colorscale="Viridis",
+            customdata=hover,
+            hovertemplate=f"{x_label}: %{{x:.2f}}<br>{y_label}: %{{y:.2f}}<br>確率: %{{z:.1%}}<br>予測: %{{customdata}}<extra></extra>",
+        )
+        title = f"{names[show_class]} の確率"
+
+    fig = go.Figure(heatmap)
+    fig.add_trace(go.Scatter(
+        x=[point[0]], y=[point[1]],
+        mode="markers",
+        marker=dict(size=14, color="white", line=dict(width=3, color="black"), symbol="x"),
+        name="現在の入力",
+        hovertemplate=f"現在の入力<br>{x_label}: %{{x:.2f}}<br>{y_label}: %{{y:.2f}}<extra></extra>",
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis_title=x_label,
+        yaxis_title=y_label,
+        showlegend=False,
+        height=500,
+    )
+    return fig
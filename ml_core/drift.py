@@ -0,0 +1,324 @@
+"""
+予測ログのドリフト・データ品質モニタリング
+
+予測ログ（ml_core.prediction_log）を読み、特徴量ごとのヒストグラム、
+基準期間と直近のウィンドウとの PSI / KS、予測クラスの構成比を計算します。
+
+統計はすべて固定サイズのスケッチ（ビン数が決まったヒストグラムとクラスごとの件数）で
+増分的に更新するので、数千万件のログでもメモリ使用量は一定です。
+ログは前回読んだ位置から続きだけを読みます。
+
+- 基準期間: 最初の reference_rows 件
+- 直近ウィンドウ: window_rows 件ずつのサブウィンドウを n_windows 個まで保持（古いものから捨てる）
+"""
+import json
+import threading
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_BINS = 20
+DEFAULT_REFERENCE_ROWS = 10_000
+DEFAULT_WINDOW_ROWS = 1_000
+DEFAULT_N_WINDOWS = 10
+
+# ログを何行ずつまとめて集計するか
+READ_CHUNK_ROWS = 50_000
+
+# 範囲が分からず集計できなかったモデルの記録を、次の refresh のために何件まで残すか（モデルごと）
+MAX_PENDING_ROWS = 100_000
+
+# PSIの計算で0割りを避けるための値
+PSI_EPSILON = 1e-4
+
+# PSIの目安（0.1未満: 安定、0.25以上: 大きな変化）
+PSI_WARNING = 0.1
+PSI_ALERT = 0.25
+
+
+class HistogramSketch:
+    """
+    特徴量ごとの固定ビンのヒストグラム
+
+    範囲外の値は両端の「範囲外」ビンに数えます（データ品質のチェックに使います）。
+    """
+
+    def __init__(self, lows, highs, n_bins=DEFAULT_BINS):
+        self.lows = np.asarray(lows, dtype=np.float64)
+        self.highs = np.asarray(highs, dtype=np.float64)
+        self.n_bins = n_bins
+        # [範囲未満, ビン0..n_bins-1, 範囲超え]
+        self.counts = np.zeros((len(self.lows), n_bins + 2), dtype=np.int64)
+        self.missing = np.zeros(len(self.lows), dtype=np.int64)
+
+    def update(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        finite = np.isfinite(X)
+        self.missing += (~finite).sum(axis=0)
+
+        scaled = (X - self.lows) / (self.highs - self.lows) * self.n_bins
+        bins = np.floor(np.where(finite, scaled, 0)).astype(np.int64) + 1
+        bins = np.clip(bins, 0, self.n_bins + 1)
+        # 上限ちょうどの値は最後のビンに入れる
+        bins[(X == self.highs) & finite] = self.n_bins
+
+        n_features = X.shape[1]
+        flat = (bins + np.arange(n_features) * (self.n_bins + 2))[finite]
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.missing += other.missing
+
+    def empty_like(self):
+        return HistogramSketch(self.lows, self.highs, self.n_bins)
+
+    @property
+    def total(self):
+        return self.counts.sum(axis=1)
+
+    def bin_edges(self, feature):
+        return np.linspace(self.lows[feature], self.highs[feature], self.n_bins + 1)
+
+
+class ClassCounts:
+    def __init__(self):
+        self.counts = {}
+
+    def update(self, labels):
+        values, counts = np.unique(np.asarray(labels, dtype=str), return_counts=True)
+        for value, count in zip(values, counts):
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+
+    def merge(self, other):
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+
+    def proportions(self):
+        total = sum(self.counts.values())
+        return {k: v / total for k, v in sorted(self.counts.items())} if total else {}
+
+
+def psi(expected, actual, epsilon=PSI_EPSILON):
+    """
+    Population Stability Index（ヒストグラムの件数から計算）
+    """
+    p = expected / max(expected.sum(), 1)
+    q = actual / max(actual.sum(), 1)
+    p = np.maximum(p, epsilon)
+    q = np.maximum(q, epsilon)
+    return float(((q - p) * np.log(q / p)).sum())
+
+
+def ks_statistic(expected, actual):
+    """
+    2つのヒストグラムの累積分布の最大の差（ビン単位で近似したKS統計量）
+    """
+    p = np.cumsum(expected) / max(expected.sum(), 1)
+    q = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.abs(p - q).max())
+
+
+class DriftMonitor:
+    """
+    1つのモデルの予測ログに対するドリフトの集計
+    """
+
+    def __init__(self, lows, highs, feature_names=None, n_bins=DEFAULT_BINS,
+                 reference_rows=DEFAULT_REFERENCE_ROWS, window_rows=DEFAULT_WINDOW_ROWS,
+                 n_windows=DEFAULT_N_WINDOWS):
+        self.feature_names = feature_names or [f"特徴量{i + 1}" for i in range(len(lows))]
+        self.reference_rows = reference_rows
+        self.window_rows = window_rows
+
+        self.reference = HistogramSketch(lows, highs, n_bins)
+        self.reference_classes = ClassCounts()
+        self.windows = deque(maxlen=n_windows)  # (HistogramSketch, ClassCounts, 件数)
+        self.total_rows = 0
+
+    def update(self, X, labels):
+        """
+        ログの行をまとめて追加します
+        """
+        X = np.asarray(X, dtype=np.float64)
+        labels = np.asarray(labels)
+        start = 0
+
+        # 基準期間がまだ埋まっていなければ、先にそちらへ入れる
+        n_reference = max(0, min(self.reference_rows - self.total_rows, len(X)))
+        if n_reference:
+            self.reference.update(X[:n_reference])
+            self.reference_classes.update(labels[:n_reference])
+            start = n_reference
+
+        while start < len(X):
+            if not self.windows or self.windows[-1][2] >= self.window_rows:
+                self.windows.append((self.reference.empty_like(), ClassCounts(), 0))
+            sketch, classes, n = self.windows[-1]
+            stop = min(start + self.window_rows - n, len(X))
+            sketch.update(X[start:stop])
+            classes.update(labels[start:stop])
+            self.windows[-1] = (sketch, classes, n + stop - start)
+            start = stop
+
+        self.total_rows += len(X)
+
+    def current(self):
+        """
+        直近のウィンドウをまとめたスケッチとクラス件数
+        """
+        sketch = self.reference.empty_like()
+        classes = ClassCounts()
+        for window_sketch, window_classes, _ in self.windows:
+            sketch.merge(window_sketch)
+            classes.merge(window_classes)
+        return sketch, classes
+
+    def report(self):
+        """
+        特徴量ごとの PSI / KS / 範囲外率と、予測クラスの構成比を返します
+        """
+        current, current_classes = self.current()
+        features = []
+        for i, name in enumerate(self.feature_names):
+            expected = self.reference.counts[i]
+            actual = current.counts[i]
+            total = max(actual.sum(), 1)
+            features.append({
+                "name": name,
+                "psi": psi(expected, actual) if actual.sum() and expected.sum() else None,
+                "ks": ks_statistic(expected, actual) if actual.sum() and expected.sum() else None,
+                "out_of_range_rate": float((actual[0] + actual[-1]) / total),
+                "missing": int(current.missing[i]),
+                "reference_counts": expected[1:-1].tolist(),
+                "current_counts": actual[1:-1].tolist(),
+                "bin_edges": current.bin_edges(i).tolist(),
+            })
+        return {
+            "total_rows": self.total_rows,
+            "reference_rows": int(min(self.total_rows, self.reference_rows)),
+            "current_rows": int(sum(n for _, _, n in self.windows)),
+            "features": features,
+            "reference_classes": self.reference_classes.proportions(),
+            "current_classes": current_classes.proportions(),
+        }
+
+
+class LogReader:
+    """
+    予測ログのフォルダを、前回読んだ位置の続きから読みます
+    """
+
+    def __init__(self, log_dir):
+        self.log_dir = Path(log_dir)
+        self.offsets = {}  # JSONL: 読んだバイト数 / Parquet: 読んだ行グループ数
+
+    def read_new(self, chunk_rows=READ_CHUNK_ROWS):
+        """
+        新しい記録を chunk_rows 件ずつのリストで返します
+        """
+        if not self.log_dir.exists():
+            return
+        paths = sorted(self.log_dir.glob("predictions-*"))
+        # 削除された（保存期間を過ぎた）ファイルの読んだ位置は忘れる
+        names = {path.name for path in paths}
+        self.offsets = {name: offset for name, offset in self.offsets.items() if name in names}
+        for path in paths:
+            if path.suffix == ".jsonl":
+                yield from self._read_jsonl(path, chunk_rows)
+            elif path.suffix == ".parquet":
+                yield from self._read_parquet(path)
+
+    def _read_jsonl(self, path, chunk_rows):
+        offset = self.offsets.get(path.name, 0)
+        if path.stat().st_size <= offset:
+            return
+        records = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # 書き込み途中の行は次回に読む
+                    break
+                offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+                if len(records) >= chunk_rows:
+                    self.offsets[path.name] = offset
+                    yield records
+                    records = []
+        self.offsets[path.name] = offset
+        if records:
+            yield records
+
+    def _read_parquet(self, path):
+        import pyarrow.parquet as pq
+
+        done = self.offsets.get(path.name, 0)
+        try:
+            parquet_file = pq.ParquetFile(path)
+        except Exception:
+            # 書き込み中（フッターがまだ無い）のファイル
+            return
+        for i in range(done, parquet_file.num_row_groups):
+            self.offsets[path.name] = i + 1
+            yield parquet_file.read_row_group(i).to_pylist()
+
+
+class LogMonitor:
+    """
+    予測ログをモデルごとの DriftMonitor に振り分けて集計します
+    """
+
+    def __init__(self, log_dir, monitor_factory, max_pending_rows=MAX_PENDING_ROWS):
+        self.reader = LogReader(log_dir)
+        self.monitor_factory = monitor_factory  # (model_path, 特徴量数) -> DriftMonitor または None
+        self.monitors = {}
+        self.max_pending_rows = max_pending_rows
+        self.pending = {}  # 集計できなかったモデル -> 記録（古いものから捨てる）
+        # st.cache_resource で全セッションから共有されるので、読む位置と集計の更新は1つずつ行う
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        新しいログを読んで集計に追加し、読んだ件数を返します
+
+        範囲が分からず集計できなかったモデルの記録は取っておき、次の refresh で
+        もう一度試します（スキーマのJSONが後から置かれた場合など）。
+        """
+        with self._lock:
+            n_read = 0
+            # 前回集計できなかったモデルの記録を先に入れ直す
+            pending, self.pending = self.pending, {}
+            for model_path, records in pending.items():
+                self._add(model_path, list(records), set())
+            for records in self.reader.read_new():
+                groups = {}
+                for r in records:
+                    groups.setdefault(r["model_path"], []).append(r)
+                unresolved = set(self.pending)
+                for model_path, group in groups.items():
+                    self._add(model_path, group, unresolved)
+                n_read += len(records)
+            return n_read
+
+    def _add(self, model_path, group, unresolved):
+        if model_path not in self.monitors and model_path not in unresolved:
+            monitor = self.monitor_factory(model_path, len(group[0]["inputs"]))
+            if monitor is None:
+                unresolved.add(model_path)
+            else:
+                self.monitors[model_path] = monitor
+        monitor = self.monitors.get(model_path)
+        if monitor is None:
+            self.pending.setdefault(model_path, deque(maxlen=self.max_pending_rows)).extend(group)
+            return
+        # 特徴量の数が合わない記録（入力フォームの変更前など）は除く
+        n_features = len(monitor.feature_names)
+        group = [r for r in group if len(r["inputs"]) == n_features]
+        if group:
+            X = np.array([r["inputs"] for r in group], dtype=np.float64)
+            monitor.update(X, [r["prediction"] for r in group])
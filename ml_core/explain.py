@@ -0,0 +1,136 @@
+"""
+予測の説明（特徴量ごとの寄与）
+
+モデルの種類に応じて、1件の予測に対する特徴量ごとの寄与を計算します。
+
+- 線形モデル（LogisticRegression など）: 係数 × 入力値。決定関数（対数オッズ）を正確に分解します
+- 決定木・ランダムフォレスト: 予測が通った経路で、分岐ごとのクラス割合の変化を
+  分岐に使った特徴量に足し上げます（全ての木をまとめて計算し、合計は予測確率と一致します）
+- それ以外: 1つずつ特徴量を基準値に置き換えた入力を全部まとめて作り、
+  predict_proba を1回だけ呼んで確率の変化を寄与とします（オクルージョン）
+
+StandardScaler だけを前処理に持つ Pipeline は、前処理後の値で線形モデル・決定木の計算を行います。
+"""
+import numpy as np
+
+from ml_core import compiled
+
+# オクルージョンで基準値として使う行数（多いほど安定、少ないほど速い）
+DEFAULT_BACKGROUND_ROWS = 32
+
+
+class Explanation:
+    """
+    特徴量ごとの寄与（contributions[特徴量, クラス]）と、寄与がすべて0のときの値（base[クラス]）
+    """
+
+    def __init__(self, method, contributions, base, unit):
+        self.method = method
+        self.contributions = contributions
+        self.base = base
+        self.unit = unit
+
+    def for_class(self, class_index):
+        return self.contributions[:, class_index]
+
+
+def _linear(estimator, z):
+    coef = np.atleast_2d(np.asarray(estimator.coef_, dtype=np.float64))
+    intercept = np.atleast_1d(np.asarray(estimator.intercept_, dtype=np.float64))
+    contributions = (coef * z[None, :]).T  # [特徴量, クラス]
+    if coef.shape[0] == 1:
+        # 2クラスの場合、決定関数は正のクラスの対数オッズなので負のクラスは符号を反転する
+        contributions = np.hstack([-contributions, contributions])
+        intercept = np.array([-intercept[0], intercept[0]])
+    return Explanation("線形モデルの係数 × 入力値", contributions, intercept, "対数オッズ")
+
+
+def _tree_contributions(trees, z, n_classes):
+    """
+    全ての木の経路上の分岐をまとめて処理し、寄与を木の数で平均します
+    """
+    contributions = np.zeros((len(z), n_classes))
+    base = np.zeros(n_classes)
+    z32 = z.astype(np.float32)[None, :]
+    for tree in trees:
+        t = tree.tree_
+        value = t.value[:, 0, :].astype(np.float64)
+        value /= np.maximum(value.sum(axis=1, keepdims=True), np.finfo(np.float64).tiny)
+
+        parent = np.full(t.node_count, -1)
+        parent[t.children_left[t.children_left >= 0]] = np.flatnonzero(t.children_left >= 0)
+        parent[t.children_right[t.children_right >= 0]] = np.flatnonzero(t.children_right >= 0)
+
+        path = tree.decision_path(z32).indices
+        path = path[parent[path] >= 0]  # 根ノードは除く
+        # 子ノードに進んだことによるクラス割合の変化を、親ノードの分岐に使った特徴量に足す
+        np.add.at(contributions, t.feature[parent[path]], value[path] - value[parent[path]])
+        base += value[0]
+    return contributions / len(trees), base / len(trees)
+
+
+def _trees(estimator):
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    if isinstance(estimator, DecisionTreeClassifier) and estimator.n_outputs_ == 1:
+        return [estimator]
+    if isinstance(estimator, (RandomForestClassifier, ExtraTreesClassifier)) and estimator.n_outputs_ == 1:
+        return estimator.estimators_
+    return None
+
+
+def occlusion(model, x, background):
+    """
+    特徴量を1つずつ基準値（background の各行）に置き換えたときの確率の変化を寄与とします
+
+    置き換えた入力は [特徴量 × 基準値の行] 件をまとめて作り、元の入力と一緒に
+    1回の predict_proba で予測します。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    background = np.atleast_2d(np.asarray(background, dtype=np.float64))
+    n_features = len(x)
+    n_background = len(background)
+
+    # perturbed[j, b] = x の特徴量 j だけを background[b, j] に置き換えたもの
+    perturbed = np.broadcast_to(x, (n_features, n_background, n_features)).copy()
+    feature_index = np.arange(n_features)
+    perturbed[feature_index, :, feature_index] = background.T
+
+    proba = np.asarray(model.predict_proba(np.vstack([x[None, :], perturbed.reshape(-1, n_features)])))
+    original = proba[0]
+    occluded = proba[1:].reshape(n_features, n_background, -1).mean(axis=1)
+    return Explanation(
+        "特徴量を基準値に置き換えたときの確率の変化",
+        original[None, :] - occluded,
+        occluded.mean(axis=0),
+        "確率",
+    )
+
+
+def explain(model, x, background=None):
+    """
+    1件の入力 x に対する特徴量ごとの寄与を返します（説明できない場合は None）
+
+    background はオクルージョンで使う基準値の行です（省略時は0に置き換えます）。
+    """
+    x = np.asarray(x, dtype=np.float64).ravel()
+    transform, estimator = compiled._split_pipeline(model)
+
+    if transform is not False:
+        z = transform(x[None, :])[0] if transform is not None else x
+        try:
+            if hasattr(estimator, "coef_") and hasattr(estimator, "intercept_"):
+                return _linear(estimator, z)
+            trees = _trees(estimator)
+            if trees is not None:
+                contributions, base = _tree_contributions(trees, z, len(estimator.classes_))
+                return Explanation("決定木の経路上の分岐ごとの寄与", contributions, base, "確率")
+        except Exception:
+            pass
+
+    if not hasattr(model, "predict_proba"):
+        return None
+    if background is None:
+        background = np.zeros((1, len(x)))
+    return occlusion(model, x, background)
@@ -0,0 +1,148 @@
+"""
+モデルファイルのホットリロード
+
+モデルファイルの更新時刻とサイズをバックグラウンドのスレッドで監視し、
+新しいファイルが置かれたら次の順で差し替えます。
+
+1. 書き込みが終わるのを待つ（更新時刻とサイズが2回続けて同じになるまで）
+2. バックグラウンドで読み込み、検証し、必要なら準備処理（コンパイルなど）を行う
+3. 参照を1回の代入で新しいバージョンに切り替える
+
+切り替えが終わるまでは古いモデルがそのまま使われ、読み込みや検証に失敗した場合も
+古いモデルを使い続けます。利用側は current を読むだけなので、再実行がリロードを
+待つことも、モデルが None になる瞬間もありません。
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from ml_core import loading
+
+# ファイルの更新を確認する間隔（秒）
+DEFAULT_POLL_INTERVAL = 2.0
+
+
+class ModelVersion:
+    """
+    差し替えの単位（モデルと、そのモデルから作った準備済みのオブジェクト）
+    """
+
+    def __init__(self, model, version, prepared=None):
+        self.model = model
+        self.version = version
+        self.prepared = prepared
+        self.loaded_at = time.time()
+
+
+def validate_model(model, probe_X):
+    """
+    probe_X で予測してみて、結果の形と値がおかしくないかを確認します（問題があれば ValueError）
+    """
+    predictions = np.asarray(model.predict(probe_X))
+    if len(predictions) != len(probe_X):
+        raise ValueError("予測結果の件数が入力と一致しません")
+    if hasattr(model, "predict_proba"):
+        proba = np.asarray(model.predict_proba(probe_X), dtype=np.float64)
+        if proba.shape[0] != len(probe_X) or not np.isfinite(proba).all():
+            raise ValueError("予測確率の形または値が不正です")
+        if not np.allclose(proba.sum(axis=1), 1.0, atol=1e-6):
+            raise ValueError("予測確率の合計が1になりません")
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class HotReloadingModel:
+    """
+    ファイルが更新されたら自動で読み込み直すモデル
+
+    validate(model) は問題があれば例外を送出します。prepare(model) の戻り値は
+    ModelVersion.prepared として新しいモデルと一緒に差し替わります。
+    on_swap(old, new) は差し替えの直後に呼ばれます（キャッシュの入れ替えなどに使います）。
+    """
+
+    def __init__(self, model_path, loader=loading.load_model_file, initial_model=None,
+                 validate=None, prepare=None, on_swap=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.model_path = model_path
+        self.loader = loader
+        self.validate = validate
+        self.prepare = prepare
+        self.on_swap = on_swap
+        self.poll_interval = poll_interval
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+
+        # 読み込みより先にファイルの状態を取っておき、その間の更新を見逃さない
+        self._signature = _signature(model_path)
+        model = initial_model if initial_model is not None else loader(model_path)
+        self.current = ModelVersion(model, 0, prepare(model) if prepare is not None else None)
+
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._watch_loop, name="model-hot-reload", daemon=True)
+        self._thread.start()
+
+    @property
+    def model(self):
+        return self.current.model
+
+    def stop(self):
+        self._stopped.set()
+
+    def _watch_loop(self):
+        pending = None
+        while not self._stopped.wait(self.poll_interval):
+            signature = _signature(self.model_path)
+            if signature is None or signature == self._signature:
+                pending = None
+                continue
+            if signature != pending:
+                # まだ書き込み中かもしれないので、次の確認まで変化が止まるのを待つ
+                pending = signature
+                continue
+            pending = None
+            self._signature = signature
+            self.reload()
+
+    def reload(self):
+        """
+        ファイルを読み込み直して差し替えます。成功したら True を返します
+        """
+        try:
+            model = self.loader(self.model_path)
+            if self.validate is not None:
+                self.validate(model)
+            prepared = self.prepare(model) if self.prepare is not None else None
+        except Exception as e:
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+
+        old = self.current
+        self.current = ModelVersion(model, old.version + 1, prepared)
+        self.reloads += 1
+        self.last_error = None
+        if self.on_swap is not None:
+            try:
+                self.on_swap(old, self.current)
+            except Exception:
+                pass
+        return True
+
+    def stats(self):
+        current = self.current
+        return {
+            "version": current.version,
+            "loaded_at": current.loaded_at,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,162 @@
+"""
+アップロード画像のプレビューと統計（メモリ使用量を抑えた処理）
+
+大きな写真（例えば 40MP）を np.array に変換すると、それだけで数百MBになります。
+ここでは次のようにして、メモリ使用量と時間を画像の大きさに比例させないようにします。
+
+- プレビュー: JPEG は draft() でデコード時点から縮小し（1/2〜1/8）、残りは reduce() と
+  thumbnail() で表示サイズまで縮める
+- 統計: 画素数が STATS_MAX_PIXELS を超える JPEG は draft() で縮小してデコードし、
+  ヒストグラムから平均・標準偏差・最小・最大を求める。np.array で画素の配列全体を作ることはありません
+- デコードは analyze() につき1回で、プレビューは統計に使ったデコード済みの画像から作る
+
+デコードの大きさを抑えられるのは JPEG の draft() だけです。PNG などは画像全体を
+元の大きさでデコードします（横長のタイルに分けるのは、モード変換のコピーをタイル分に抑えるためで、
+デコード自体を分けるものではありません）。
+
+結果は画像の内容のハッシュをキーにしてキャッシュする想定です（content_hash）。
+"""
+import hashlib
+import io
+
+import numpy as np
+from PIL import Image
+
+# プレビューの長辺（ピクセル）
+PREVIEW_MAX_SIDE = 800
+
+# 統計を計算する最大画素数（これを超える JPEG は縮小してデコードする）
+STATS_MAX_PIXELS = 4_000_000
+
+# 1タイルの行数
+TILE_ROWS = 256
+
+# 統計を計算するときに変換するモード（それ以外のモードはタイルごとに RGB へ変換）
+STATS_MODES = ("L", "RGB", "RGBA")
+
+# 16ビットのグレースケール（PNG など）。convert() では255で頭打ちになるので、上位8ビットで "L" にする
+WIDE_MODES = ("I;16", "I;16B", "I;16L", "I")
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _open(data):
+    return Image.open(io.BytesIO(data))
+
+
+def _draft_to(img, max_pixels):
+    """
+    JPEG なら、画素数が max_pixels 以下になるまで縮小してデコードするよう指定します
+
+    戻り値は元の画像に対する縮小率（1なら縮小なし）です。
+    """
+    width, height = img.size
+    if img.format != "JPEG" or width * height <= max_pixels:
+        return 1
+    scale = (width * height / max_pixels) ** 0.5
+    img.draft(img.mode, (int(width / scale), int(height / scale)))
+    return width / img.size[0]
+
+
+def _to_8bit(img):
+    """
+    16ビットのグレースケールを8ビットの "L" にします（それ以外のモードはそのまま返します）
+    """
+    if img.mode not in WIDE_MODES:
+        return img
+    values = np.clip(np.asarray(img), 0, 65535).astype(np.uint16)
+    return Image.fromarray((values >> 8).astype(np.uint8))
+
+
+def make_preview(data, max_side=PREVIEW_MAX_SIDE):
+    """
+    表示用に縮小した画像のバイト列（JPEG、透過がある場合は PNG）を返します
+
+    data は画像のバイト列か、デコード済みの PIL の画像です（画像は変更しません）。
+    """
+    if isinstance(data, Image.Image):
+        source = data
+    else:
+        source = _open(data)
+        if source.format == "JPEG":
+            source.draft("RGB", (max_side, max_side))
+    factor = max(1, min(source.size) // max_side)
+    img = source.reduce(factor) if factor > 1 else source
+    img = _to_8bit(img)
+    if img is source:
+        # thumbnail() は画像をその場で縮めるので、渡された画像は残す（縮小の必要が無い小さい画像だけ）
+        img = img.copy()
+    img.thumbnail((max_side, max_side))
+
+    buffer = io.BytesIO()
+    if img.mode in ("RGBA", "LA") or "transparency" in img.info:
+        img.convert("RGBA").save(buffer, format="PNG")
+    else:
+        img.convert("RGB").save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def tile_histograms(img, tile_rows=TILE_ROWS):
+    """
+    画像を tile_rows 行ずつのタイルに分け、チャンネルごとの256段階のヒストグラムを足し合わせます
+
+    最初の crop() で画像全体がデコードされます。タイルに分けるのは、モードの変換
+    （16ビットから8ビットへの変換を含む）で作るコピーをタイルの大きさに抑えるためです。
+    """
+    if img.mode in WIDE_MODES:
+        mode = "L"
+    else:
+        mode = img.mode if img.mode in STATS_MODES else "RGB"
+    n_channels = len(mode)
+    histogram = np.zeros((n_channels, 256), dtype=np.int64)
+    width, height = img.size
+    for top in range(0, height, tile_rows):
+        tile = _to_8bit(img.crop((0, top, width, min(top + tile_rows, height))))
+        if tile.mode != mode:
+            tile = tile.convert(mode)
+        histogram += np.asarray(tile.histogram(), dtype=np.int64).reshape(n_channels, 256)
+    return mode, histogram
+
+
+def histogram_stats(histogram):
+    """
+    ヒストグラムからチャンネルごとの平均・標準偏差・最小・最大を求めます
+    """
+    levels = np.arange(256, dtype=np.float64)
+    counts = histogram.astype(np.float64)
+    total = np.maximum(counts.sum(axis=1), 1)
+    mean = (counts * levels).sum(axis=1) / total
+    std = np.sqrt(np.maximum((counts * levels ** 2).sum(axis=1) / total - mean ** 2, 0))
+    nonzero = histogram > 0
+    minimum = np.where(nonzero.any(axis=1), nonzero.argmax(axis=1), 0)
+    maximum = np.where(nonzero.any(axis=1), 255 - nonzero[:, ::-1].argmax(axis=1), 0)
+    return {"mean": mean, "std": std, "min": minimum, "max": maximum}
+
+
+def analyze(data, max_pixels=STATS_MAX_PIXELS, tile_rows=TILE_ROWS, preview_max_side=PREVIEW_MAX_SIDE):
+    """
+    画像のバイト列から、元の情報・プレビュー・チャンネルごとの統計とヒストグラムを返します
+
+    画像のデコードは1回だけで、プレビューも統計に使ったデコード済みの画像から作ります。
+    """
+    img = _open(data)
+    info = {
+        "format": img.format,
+        "size": img.size,
+        "mode": img.mode,
+        "bytes": len(data),
+    }
+
+    stats_scale = _draft_to(img, max_pixels)
+    stats_mode, histogram = tile_histograms(img, tile_rows)
+    info.update({
+        "stats_size": img.size,
+        "stats_scale": stats_scale,
+        "channels": list(stats_mode),
+        "histogram": histogram,
+        **histogram_stats(histogram),
+        "preview": make_preview(img, preview_max_side),
+    })
+    return info
@@ -0,0 +1,20 @@
+"""
+アイリスの特徴量の定義
+
+スライダーの範囲と刻み幅を、予測キャッシュや検証用入力と共有するための定数です。
+"""
+
+# (特徴量名, 最小値, 最大値) モデルが期待する順番
+IRIS_FEATURES = [
+    ("がく片の長さ", 4.0, 8.0),
+    ("がく片の幅", 2.0, 4.5),
+    ("花びらの長さ", 1.0, 7.0),
+    ("花びらの幅", 0.1, 2.5),
+]
+
+# スライダーの刻み幅（cm）
+IRIS_STEP = 0.1
+
+IRIS_FEATURE_NAMES = [name for name, _, _ in IRIS_FEATURES]
+IRIS_LOWS = [low for _, low, _ in IRIS_FEATURES]
+IRIS_HIGHS = [high for _, _, high in IRIS_FEATURES]
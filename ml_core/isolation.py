@@ -0,0 +1,439 @@
+"""
+モデルを別プロセスで読み込み・実行するバックエンド（プロセス分離）
+
+pickle.load や model.predict を Streamlit サーバーのプロセス内で行うと、遅いモデルや
+壊れたモデルがスクリプトのスレッドを止めたり、サーバーごと落としたりします。
+IsolatedModelPool はワーカープロセスのプールでモデルを読み込み・実行し、
+
+- 呼び出しごとのタイムアウト（過ぎたらワーカーを強制終了して作り直す）
+- ワーカーのメモリ上限（Linux では RLIMIT_AS。超えると MemoryError になりワーカーを作り直す）
+- ワーカーが落ちた場合の自動再起動
+
+を行うので、1つの悪いモデルが他のユーザーの予測を止めることはありません。
+
+入力と確率の配列は親プロセスが作った共有メモリ（multiprocessing.shared_memory）で受け渡し、
+ワーカーは入力をコピーせずにそのまま読みます（ワーカーがタイムアウトで強制終了されても、
+共有メモリは親プロセスが必ず削除します）。ワーカーはそれぞれモデルを読み込むので、
+配列の大きい線形モデルやKNNなどは .joblib（メモリマップ）にしておくとワーカー間でページキャッシュを
+共有できます（決定木・ランダムフォレストの木は読み込み時にコピーされるので共有されません）。
+
+RemoteModel は classes_ / n_features_in_ / predict_proba などを持つ普通のモデルのように振る舞うので、
+マイクロバッチや予測キャッシュ、スキーマの読み込みはそのまま使えます。
+
+環境変数:
+    MODEL_ISOLATION=1          multi_model_app.py で最初から分離プロセスを使う
+    MODEL_WORKERS              ワーカー数（既定: 2）
+    MODEL_TIMEOUT_S            1回の呼び出しのタイムアウト秒（既定: 30）
+    MODEL_WORKER_MEMORY_MB     ワーカー1つのメモリ上限MB（既定: 上限なし）
+"""
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DEFAULT_WORKERS = 2
+DEFAULT_TIMEOUT = 30.0
+
+# 1つのワーカーが読み込んだまま保持するモデルの数
+WORKER_MAX_MODELS = 8
+
+# 同じワーカーで処理する呼び出し回数の上限（メモリの断片化やリークを溜めない）
+MAX_CALLS_PER_WORKER = 10_000
+
+# ワーカーの終了を待つ時間（秒）。過ぎたら強制終了
+STOP_TIMEOUT = 2.0
+
+
+class WorkerCrashedError(RuntimeError):
+    """
+    呼び出しの途中でワーカープロセスが終了した
+    """
+
+
+class RemoteError(RuntimeError):
+    """
+    ワーカープロセスの中でモデルの読み込みや予測が失敗した
+    """
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# ---- ワーカープロセス側 ----
+
+def _set_memory_limit(memory_limit_bytes):
+    if not memory_limit_bytes:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+    except (ImportError, ValueError, OSError):
+        # Linux 以外では上限をかけられない
+        pass
+
+
+def _worker_main(conn, memory_limit_bytes):
+    from ml_core import loading
+
+    _set_memory_limit(memory_limit_bytes)
+    models = OrderedDict()  # パス -> (ファイルの状態, モデル)
+
+    def get_model(path):
+        signature = _signature(path)
+        entry = models.get(path)
+        if entry is not None and entry[0] == signature:
+            models.move_to_end(path)
+            return entry[1]
+        model = loading.load_model_file(path)
+        models[path] = (signature, model)
+        while len(models) > WORKER_MAX_MODELS:
+            models.popitem(last=False)
+        return model
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+        command, path, payload = message
+
+        try:
+            model = get_model(path)
+            if command == "describe":
+                result = _describe(model)
+            else:
+                result = _run(model, command, payload)
+            conn.send(("ok", result))
+        except MemoryError:
+            # メモリ上限に達したワーカーは終了し、親プロセスに作り直してもらう
+            conn.send(("fatal", "MemoryError: ワーカーのメモリ上限を超えました"))
+            break
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def _describe(model):
+    classes = getattr(model, "classes_", None)
+    names = getattr(model, "feature_names_in_", None)
+    return {
+        "classes": list(np.asarray(classes).tolist()) if classes is not None else None,
+        "n_features_in": getattr(model, "n_features_in_", None),
+        "feature_names_in": [str(n) for n in names] if names is not None else None,
+        "has_proba": hasattr(model, "predict_proba"),
+        "repr": repr(model)[:200],
+    }
+
+
+def _run(model, command, payload):
+    """
+    親プロセスが作った共有メモリの入力で予測します
+
+    predict_proba の確率は、親プロセスが用意した出力用の共有メモリに収まればそこに書いて
+    ("shm", 形, dtype) を、収まらなければ ("array", 確率) を返します。
+    """
+    shm_name, shape, dtype, out_name, out_size = payload
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # 親プロセスが書いた入力をコピーせずに読む
+        X = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if command == "predict_proba":
+            proba = np.ascontiguousarray(model.predict_proba(X), dtype=np.float64)
+            del X
+            if out_name is None or proba.nbytes > out_size:
+                return ("array", proba)
+            out = shared_memory.SharedMemory(name=out_name)
+            try:
+                np.ndarray(proba.shape, dtype=proba.dtype, buffer=out.buf)[...] = proba
+            finally:
+                out.close()
+            return ("shm", proba.shape, proba.dtype.str)
+        labels = np.asarray(model.predict(X))
+        del X
+        return labels
+    finally:
+        shm.close()
+
+
+# ---- 親プロセス側 ----
+
+class _Worker:
+    def __init__(self, context, memory_limit_bytes):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_limit_bytes), name="model-worker", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.calls = 0
+        self.started_at = time.time()
+        self.dead = False  # 終了を知らせてきた（またはこれから終了する）ワーカー
+
+    def alive(self):
+        return not self.dead and self.process.is_alive()
+
+    def kill(self, force=False):
+        if not force:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class IsolatedModelPool:
+    """
+    ワーカープロセスのプール
+
+    ワーカーは spawn で起動します（Streamlit のスレッドを持ったまま fork しないため）。
+    """
+
+    def __init__(self, n_workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, memory_limit_mb=None,
+                 max_calls_per_worker=MAX_CALLS_PER_WORKER):
+        self.n_workers = n_workers
+        self.timeout = timeout
+        self.memory_limit_bytes = int(memory_limit_mb * 1024 * 1024) if memory_limit_mb else None
+        self.max_calls_per_worker = max_calls_per_worker
+
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._models = {}  # パス -> (ファイルの状態, RemoteModel)
+        self._closed = False
+
+        self.calls = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.restarts = 0
+        self.errors = 0
+
+        for _ in range(n_workers):
+            self._add_worker()
+
+    def _add_worker(self):
+        worker = _Worker(self._context, self.memory_limit_bytes)
+        with self._lock:
+            self._workers.add(worker)
+        self._idle.put(worker)
+
+    def _replace(self, worker, force=False):
+        with self._lock:
+            self._workers.discard(worker)
+            closed = self._closed
+        worker.kill(force)
+        if not closed:
+            self.restarts += 1
+            self._add_worker()
+
+    def _release(self, worker):
+        worker.calls += 1
+        if not worker.alive() or worker.calls >= self.max_calls_per_worker:
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+
+    def _acquire(self, deadline):
+        """
+        空いている生きたワーカーを返します（待っている間に落ちたワーカーは作り直します）
+        """
+        while True:
+            try:
+                worker = self._idle.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                self.timeouts += 1
+                raise TimeoutError("空いているワーカーがありません（他の予測が時間内に終わりませんでした）")
+            if worker.alive():
+                return worker
+            self.crashes += 1
+            self._replace(worker, force=True)
+
+    def call(self, command, model_path, payload=None, timeout=None):
+        """
+        空いているワーカーで command を実行し、結果を返します
+
+        時間内に終わらなければワーカーを作り直して TimeoutError、ワーカーが落ちたら
+        WorkerCrashedError、モデル側の例外は RemoteError を送出します。
+        """
+        if self._closed:
+            raise RuntimeError("ワーカープールは終了しています")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        worker = self._acquire(deadline)
+
+        self.calls += 1
+        try:
+            worker.conn.send((command, str(model_path), payload))
+            finished = worker.conn.poll(max(deadline - time.monotonic(), 0))
+            if finished:
+                status, result = worker.conn.recv()
+        except (EOFError, OSError):
+            self.crashes += 1
+            self._replace(worker, force=True)
+            raise WorkerCrashedError("モデルの処理中にワーカープロセスが終了しました")
+        if not finished:
+            # 処理中のワーカーは止められないので、強制終了して作り直す
+            self.timeouts += 1
+            self._replace(worker, force=True)
+            raise TimeoutError(f"モデルの処理が{timeout:.0f}秒以内に終わりませんでした")
+
+        if status == "fatal":
+            # ワーカーは終了するので、空きワーカーに戻す前に作り直しの対象にする
+            worker.dead = True
+        self._release(worker)
+        if status in ("error", "fatal"):
+            self.errors += 1
+            raise RemoteError(result)
+        return result
+
+    def predict_proba(self, model_path, X, timeout=None, n_classes=None):
+        """
+        ワーカーで predict_proba を実行します（入力と結果は共有メモリで受け渡します）
+
+        n_classes が分かれば結果用の共有メモリも先に作っておきます（分からなければ結果はパイプで受け取ります）。
+        共有メモリはどちらも親プロセスが作って削除するので、ワーカーが強制終了されても残りません。
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        out_size = len(X) * n_classes * X.itemsize if n_classes else 0
+        shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+        out = shared_memory.SharedMemory(create=True, size=out_size) if out_size else None
+        try:
+            np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[...] = X
+            result = self.call(
+                "predict_proba", model_path,
+                (shm.name, X.shape, X.dtype.str, out.name if out is not None else None, out_size), timeout
+            )
+            if result[0] == "array":
+                return result[1]
+            _, shape, dtype = result
+            return np.ndarray(shape, dtype=dtype, buffer=out.buf).copy()
+        finally:
+            for segment in (shm, out):
+                if segment is not None:
+                    segment.close()
+                    segment.unlink()
+
+    def predict(self, model_path, X, timeout=None):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+        try:
+            np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[...] = X
+            return self.call("predict", model_path, (shm.name, X.shape, X.dtype.str, None, 0), timeout)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def model(self, model_path):
+        """
+        ワーカーで読み込んだモデルの代理オブジェクトを返します（ファイルが変わるまで同じオブジェクト）
+        """
+        key = str(model_path)
+        signature = _signature(key)
+        if signature is None:
+            raise FileNotFoundError(f"モデルファイルが見つかりません: {model_path}")
+        with self._lock:
+            entry = self._models.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        remote = RemoteModel(self, key, self.call("describe", key))
+        with self._lock:
+            self._models[key] = (signature, remote)
+        return remote
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.kill()
+
+    def stats(self):
+        with self._lock:
+            workers = list(self._workers)
+        return {
+            "workers": len(workers),
+            "alive": sum(w.alive() for w in workers),
+            "idle": self._idle.qsize(),
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+            "restarts": self.restarts,
+            "errors": self.errors,
+            "models": len(self._models),
+        }
+
+
+class RemoteModel:
+    """
+    ワーカープロセスにあるモデルの代理（sklearn のモデルと同じように使えます）
+    """
+
+    def __init__(self, pool, model_path, info):
+        self.pool = pool
+        self.model_path = model_path
+        self.info = info
+        if info["classes"] is not None:
+            self.classes_ = np.asarray(info["classes"])
+        if info["n_features_in"] is not None:
+            self.n_features_in_ = info["n_features_in"]
+        if info["feature_names_in"] is not None:
+            self.feature_names_in_ = np.asarray(info["feature_names_in"], dtype=object)
+        if info["has_proba"]:
+            # 確率を出せないモデルでは hasattr(model, "predict_proba") が False になるようにする
+            self.predict_proba = self._predict_proba
+
+    def _predict_proba(self, X):
+        classes = getattr(self, "classes_", None)
+        return self.pool.predict_proba(self.model_path, X, n_classes=len(classes) if classes is not None else None)
+
+    def predict(self, X):
+        if self.info["has_proba"]:
+            proba = self._predict_proba(X)
+            classes = getattr(self, "classes_", np.arange(proba.shape[1]))
+            return np.asarray(classes)[proba.argmax(axis=1)]
+        return self.pool.predict(self.model_path, X)
+
+    def __repr__(self):
+        return f"RemoteModel({self.info['repr']})"
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def isolation_enabled():
+    return os.environ.get("MODEL_ISOLATION", "0") not in ("0", "false", "")
+
+
+def shared_pool():
+    """
+    プロセス内で共有するワーカープールを返します（初回の呼び出しでワーカーを起動します）
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            memory_limit_mb = os.environ.get("MODEL_WORKER_MEMORY_MB")
+            _shared_pool = IsolatedModelPool(
+                n_workers=int(os.environ.get("MODEL_WORKERS", DEFAULT_WORKERS)),
+                timeout=float(os.environ.get("MODEL_TIMEOUT_S", DEFAULT_TIMEOUT)),
+                memory_limit_mb=float(memory_limit_mb) if memory_limit_mb else None,
+            )
+            atexit.register(_shared_pool.close)
+        return _shared_pool
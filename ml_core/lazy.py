@@ -0,0 +1,169 @@
+"""
+重いモジュールの遅延import
+
+    px = lazy.lazy_import("plotly.express")
+
+のように書くと、px の属性に初めてアクセスした時点で import されます。
+そのページで使わないライブラリの import 時間を、最初の表示で払わずに済みます。
+
+import にかかった時間は記録され、import_report() で確認できます（起動時間のレポート）。
+
+各ライブラリを新しいPythonで import したときの時間（コールドスタート）と、
+アプリの冒頭の import を遅延importあり・なしで実行したときの時間の比較は次で確認できます:
+    python -m ml_core.lazy [アプリ.py ...]
+"""
+import ast
+import importlib
+import subprocess
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+
+_lock = threading.Lock()
+_proxies = {}
+_timings = {}  # モジュール名 -> 実際に import したときの秒数（import済みなら0に近い）
+
+
+class LazyModule(types.ModuleType):
+    """
+    属性に初めてアクセスしたときに本物のモジュールを import する代理オブジェクト
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            name = self.__name__
+            already_loaded = name in sys.modules
+            started = time.perf_counter()
+            module = importlib.import_module(name)
+            with _lock:
+                _timings.setdefault(name, {
+                    "seconds": time.perf_counter() - started,
+                    "already_loaded": already_loaded,
+                })
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    name のモジュールの代理オブジェクトを返します（同じ名前なら同じオブジェクト）
+    """
+    with _lock:
+        proxy = _proxies.get(name)
+        if proxy is None:
+            proxy = _proxies[name] = LazyModule(name)
+        return proxy
+
+
+def import_report():
+    """
+    遅延importしたモジュールごとの {名前: {"seconds", "already_loaded"}} と、
+    まだ一度も使われていないモジュール名のリストを返します
+    """
+    with _lock:
+        loaded = dict(_timings)
+        pending = sorted(name for name in _proxies if name not in _timings)
+    return loaded, pending
+
+
+def measure_cold_import(name):
+    """
+    新しいPythonプロセスで name を import したときの秒数を返します（失敗したら None）
+    """
+    code = (
+        "import time; started = time.perf_counter(); "
+        f"import {name}; print(time.perf_counter() - started)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def _startup_code(app_file, eager):
+    """
+    アプリの冒頭の import 文だけを実行して時間を表示するコードを返します
+
+    eager が True なら lazy_import しているモジュールもその場で import します（遅延importを使わない場合）。
+    """
+    tree = ast.parse(Path(app_file).read_text(encoding="utf-8"))
+    statements, deferred = [], []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            statements.append(ast.unparse(node))
+        elif (isinstance(node, ast.Assign) and isinstance(node.value, ast.Call)
+                and isinstance(node.value.func, ast.Attribute) and node.value.func.attr == "lazy_import"
+                and node.value.args and isinstance(node.value.args[0], ast.Constant)):
+            statements.append(ast.unparse(node))
+            deferred.append(node.value.args[0].value)
+    if eager:
+        statements.extend(f"import {name}" for name in deferred)
+    return "\n".join([
+        "import time",
+        "started = time.perf_counter()",
+        *statements,
+        "print(time.perf_counter() - started)",
+    ])
+
+
+def measure_startup(app_file):
+    """
+    新しいPythonプロセスでアプリの冒頭の import を実行した秒数を
+    {"before": 遅延importなし, "after": 遅延importあり} で返します（失敗したら None）
+    """
+    app_dir = Path(app_file).resolve().parent
+    timings = {}
+    for label, eager in (("before", True), ("after", False)):
+        result = subprocess.run(
+            [sys.executable, "-c", _startup_code(app_file, eager)],
+            capture_output=True, text=True, cwd=app_dir
+        )
+        if result.returncode != 0:
+            return None
+        timings[label] = float(result.stdout.strip().splitlines()[-1])
+    return timings
+
+
+def main(argv=None):
+    from ml_core import prewarm
+
+    argv = sys.argv[1:] if argv is None else argv
+
+    print("🕒 コールドスタート時の import 時間")
+    for name in prewarm.HEAVY_MODULES:
+        seconds = measure_cold_import(name)
+        if seconds is None:
+            print(f"  {name}: （インストールされていません）")
+        else:
+            print(f"  {name}: {seconds * 1000:.0f} ms")
+
+    if not argv:
+        return
+    print("🚀 アプリの起動時の import 時間（遅延importなし → あり）")
+    for app_file in argv:
+        timings = measure_startup(app_file)
+        if timings is None:
+            print(f"  {app_file}: （import に失敗しました）")
+        else:
+            print(f"  {app_file}: {timings['before'] * 1000:.0f} ms → {timings['after'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
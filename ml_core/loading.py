@@ -0,0 +1,73 @@
+"""
+モデルファイルの読み込み
+
+Streamlitアプリと推論サーバーが同じ読み込み処理を使うための共通部品です。
+Streamlitに依存しないので、st.cache_resource の外からも呼び出せます。
+
+.pkl は pickle で読み込みます。.joblib は joblib の mmap_mode="r" で読み込み、
+モデルの属性として保存されているNumPy配列（線形モデルの coef_、KNNの _fit_X、
+前処理の mean_ / scale_ など）を読み取り専用でメモリマップします。これらの配列は
+読み込み時にコピーされず、複数のプロセスが同じページキャッシュを共有できます。
+
+決定木・ランダムフォレストなどの木（sklearn の Tree）は、読み込み時に Tree.__setstate__ が
+ノードの配列を自分のメモリにコピーするため、メモリマップの効果はありません
+（ファイルの読み込み自体は pickle と同程度で、メモリもプロセスごとに使います）。
+
+.pkl から .joblib への変換:
+    python -m ml_core.loading ../iris/models/model_iris.pkl
+"""
+import argparse
+import os
+import pickle
+from pathlib import Path
+
+# iris_streamlit_app.py が使うモデルファイル
+DEFAULT_MODEL_PATH = "../iris/models/model_iris.pkl"
+
+PICKLE_SUFFIXES = (".pkl",)
+MMAP_SUFFIXES = (".joblib",)
+
+
+def load_model_file(model_path):
+    """
+    モデルファイルを読み込みます
+
+    ファイルが無い場合は FileNotFoundError、読み込みに失敗した場合は元の例外をそのまま送出します。
+    """
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"モデルファイルが見つかりません: {model_path}")
+
+    if Path(model_path).suffix.lower() in MMAP_SUFFIXES:
+        import joblib
+        return joblib.load(model_path, mmap_mode="r")
+
+    with open(model_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_mmap_model(model, output_path):
+    """
+    メモリマップで読み込める形式（圧縮なしのjoblib）でモデルを保存します
+    """
+    import joblib
+
+    # 圧縮すると mmap_mode が使えないので compress=0 のまま保存する
+    tmp_path = f"{output_path}.tmp"
+    joblib.dump(model, tmp_path, compress=0)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=".pkl のモデルをメモリマップ用の .joblib に変換します")
+    parser.add_argument("model", nargs="+", help="変換する .pkl ファイル")
+    args = parser.parse_args(argv)
+
+    for model_path in args.model:
+        output_path = Path(model_path).with_suffix(MMAP_SUFFIXES[0])
+        save_mmap_model(load_model_file(model_path), output_path)
+        print(f"✅ {model_path} → {output_path}")
+
+
+if __name__ == "__main__":
+    main()
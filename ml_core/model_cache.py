@@ -0,0 +1,239 @@
+"""
+メモリ上限つきのモデルキャッシュ
+
+読み込んだモデルのおおよそのメモリ使用量を測り、合計が上限を超えたら
+最も長く使われていないモデル（LRU）から順に破棄します。ピン留めしたモデルは破棄しません。
+"""
+import itertools
+import os
+import sys
+import threading
+import types
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from ml_core import loading
+
+# キャッシュの上限（MB）。環境変数 MODEL_CACHE_MAX_MB で変更できます
+DEFAULT_MAX_MB = 1024
+
+_versions = weakref.WeakKeyDictionary()
+_version_counter = itertools.count(1)
+_versions_lock = threading.Lock()
+
+
+def model_version(model):
+    """
+    読み込んだモデルのオブジェクトごとに一意な番号を返します
+
+    id() と違い、モデルが破棄された後に別のモデルへ同じ番号が使われることはないので、
+    予測結果などのキャッシュのキーに使えます。
+    """
+    with _versions_lock:
+        try:
+            version = _versions.get(model)
+            if version is None:
+                version = next(_version_counter)
+                _versions[model] = version
+        except TypeError:
+            # 弱参照を作れないオブジェクト（__slots__ だけのクラスなど）は id で代用する
+            return f"id-{id(model)}"
+        return version
+
+
+def estimate_model_bytes(model):
+    """
+    モデルが参照しているオブジェクトをたどって、おおよそのメモリ使用量（バイト）を返します
+
+    NumPy配列は nbytes、それ以外は sys.getsizeof で数えます。メモリマップされた配列は数えません。
+    sklearnの決定木のように __dict__ を持たないオブジェクトは __getstate__ の中身を数えます。
+    """
+    seen = set()
+    total = 0
+    stack = [model]
+
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        if isinstance(obj, np.memmap):
+            # メモリマップされた配列はページキャッシュを共有するので数えない
+            continue
+
+        if isinstance(obj, np.ndarray):
+            # ビューは元の配列側で数える
+            total += obj.nbytes if obj.base is None else 0
+            if obj.base is not None:
+                stack.append(obj.base)
+            if obj.dtype == object:
+                stack.extend(obj.ravel().tolist())
+            continue
+
+        if isinstance(obj, (type, types.ModuleType, types.FunctionType)):
+            # クラスや関数はモデルごとのデータではないので数えない
+            continue
+
+        total += sys.getsizeof(obj)
+
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.append(obj.__dict__)
+        elif hasattr(obj, "__getstate__"):
+            try:
+                stack.append(obj.__getstate__())
+            except Exception:
+                pass
+
+    return total
+
+
+class ModelCache:
+    """
+    モデルのパスをキーにしたLRUキャッシュ
+
+    get() で読み込み済みならそれを返し（ヒット）、無ければ loader で読み込みます（ミス）。
+    on_evict は破棄したモデルのパスで、ロックを外してから呼び出します。
+    """
+
+    def __init__(self, max_bytes=None, loader=loading.load_model_file, on_evict=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("MODEL_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.on_evict = on_evict
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (model, size_bytes)
+        self._pinned = set()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_path):
+        key = str(model_path)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        # 読み込みはロックの外で行い、他のモデルのヒットを止めない
+        model = self.loader(model_path)
+        size = estimate_model_bytes(model)
+
+        with self._lock:
+            if key in self._entries:
+                # 同時に別のセッションが読み込んでいた場合はそちらを使う
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self._entries[key] = (model, size)
+            self.current_bytes += size
+            evicted = self._evict(keep=key)
+        self._notify_evicted(evicted)
+        return model
+
+    def put(self, model_path, model):
+        """
+        読み込み済みのモデルをキャッシュに登録します（事前読み込み用）
+        """
+        key = str(model_path)
+        size = estimate_model_bytes(model)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (model, size)
+            self.current_bytes += size
+            evicted = self._evict(keep=key)
+        self._notify_evicted(evicted)
+
+    def _evict(self, keep):
+        """
+        上限を超えた分を破棄し、破棄したパスのリストを返します（ロックを持った状態で呼ぶ）
+        """
+        evicted = []
+        for key in list(self._entries):
+            if self.current_bytes <= self.max_bytes:
+                break
+            if key == keep or key in self._pinned:
+                continue
+            _, size = self._entries.pop(key)
+            self.current_bytes -= size
+            self.evictions += 1
+            evicted.append(key)
+        return evicted
+
+    def _notify_evicted(self, evicted):
+        # コールバックの中で他のロックを取ったり時間がかかったりしても、キャッシュを止めない
+        if self.on_evict is not None:
+            for key in evicted:
+                self.on_evict(key)
+
+    def pin(self, model_path):
+        with self._lock:
+            self._pinned.add(str(model_path))
+
+    def unpin(self, model_path):
+        with self._lock:
+            self._pinned.discard(str(model_path))
+            evicted = self._evict(keep=None)
+        self._notify_evicted(evicted)
+
+    def is_pinned(self, model_path):
+        return str(model_path) in self._pinned
+
+    def discard(self, model_path):
+        with self._lock:
+            entry = self._entries.pop(str(model_path), None)
+            if entry is not None:
+                self.current_bytes -= entry[1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "pinned": len(self._pinned),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "models": {key: size for key, (_, size) in self._entries.items()},
+            }
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_cache():
+    """
+    プロセス内で共有するモデルキャッシュを返します
+
+    破棄したモデルのマイクロバッチ用キューと予測結果のキャッシュも一緒に捨てて、
+    モデルへの参照が残らないようにします。
+    キューは受け付けを止めてから、処理中のリクエストを全て返し終えた後に終了します。
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ModelCache(on_evict=_on_shared_evict)
+        return _shared_cache
+
+
+def _on_shared_evict(model_path):
+    from ml_core import batching, prediction_cache
+
+    batching.discard_batcher(model_path)
+    prediction_cache.discard_model_path(model_path)
@@ -0,0 +1,207 @@
+"""
+量子化した入力をキーにした予測結果キャッシュ
+
+アイリスのスライダーは0.1cm刻みで範囲も決まっているため、入力の組み合わせは有限です。
+(モデル, 量子化した特徴量) をキーに予測クラスと確率をまとめて保存し、
+同じ入力ではモデルを呼ばずに結果を返します。
+
+precompute() を使うと、格子上の全ての点を predict_proba でまとめて計算して
+密な配列に保存します（アイリスなら約160万点、確率はfloat32で約20MB）。
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 事前計算で一度に predict_proba に渡す行数（メモリ使用量の上限）
+PRECOMPUTE_CHUNK_ROWS = 262_144
+
+# 格子外の入力などを保存する辞書キャッシュの最大件数
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+class QuantizedGrid:
+    """
+    low〜high を step 刻みにした格子。入力を格子の番号に変換します
+    """
+
+    def __init__(self, lows, highs, step):
+        self.lows = np.asarray(lows, dtype=np.float64)
+        self.highs = np.asarray(highs, dtype=np.float64)
+        self.step = float(step)
+        self.shape = tuple(int(n) for n in np.round((self.highs - self.lows) / self.step) + 1)
+        self.size = int(np.prod(self.shape))
+
+    def quantize(self, values):
+        """
+        入力を格子の番号のタプルに変換します。格子上に無い入力なら None を返します
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.shape != self.lows.shape:
+            return None
+        index = np.round((values - self.lows) / self.step)
+        if np.any(index < 0) or np.any(index >= self.shape):
+            return None
+        if not np.allclose(self.lows + index * self.step, values, rtol=0, atol=1e-9):
+            return None
+        return tuple(int(i) for i in index)
+
+    def flat_index(self, key):
+        return int(np.ravel_multi_index(key, self.shape))
+
+    def points(self, start, stop):
+        """
+        通し番号 start〜stop-1 の格子点を (行数, 特徴量数) の配列で返します
+        """
+        index = np.unravel_index(np.arange(start, stop), self.shape)
+        return self.lows + np.column_stack(index) * self.step
+
+
+class PredictionCache:
+    """
+    (モデルのキー, 量子化した入力) → (予測クラス, 確率) のキャッシュ
+    """
+
+    def __init__(self, grid, max_entries=DEFAULT_MAX_ENTRIES):
+        self.grid = grid
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tables = {}  # model_key -> (classes, 予測クラスの番号, 確率)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_key, values):
+        key = self.grid.quantize(values)
+        if key is None:
+            return None
+
+        with self._lock:
+            table = self._tables.get(model_key)
+            if table is not None:
+                classes, best, proba = table
+                i = self.grid.flat_index(key)
+                self.hits += 1
+                return classes[best[i]], proba[i].astype(np.float64)
+
+            entry = self._entries.get((model_key, key))
+            if entry is not None:
+                self._entries.move_to_end((model_key, key))
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, model_key, values, label, proba):
+        key = self.grid.quantize(values)
+        if key is None:
+            return
+        with self._lock:
+            self._entries[(model_key, key)] = (label, np.asarray(proba))
+            self._entries.move_to_end((model_key, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def predict(self, model_key, model, values):
+        """
+        キャッシュにあればそれを、無ければ predict_proba を1回呼んで結果を保存して返します
+        """
+        cached = self.get(model_key, values)
+        if cached is not None:
+            return cached
+
+        proba = model.predict_proba(np.asarray(values, dtype=np.float64).reshape(1, -1))[0]
+        classes = np.asarray(getattr(model, "classes_", np.arange(len(proba))))
+        label = classes[int(np.argmax(proba))]
+        self.put(model_key, values, label, proba)
+        return label, proba
+
+    def precompute(self, model_key, model, chunk_rows=PRECOMPUTE_CHUNK_ROWS):
+        """
+        格子上の全ての点の予測をまとめて計算して保存します
+        """
+        with self._lock:
+            if model_key in self._tables:
+                return
+
+        best = None
+        proba_table = None
+        for start in range(0, self.grid.size, chunk_rows):
+            stop = min(start + chunk_rows, self.grid.size)
+            proba = model.predict_proba(self.grid.points(start, stop))
+            if proba_table is None:
+                proba_table = np.empty((self.grid.size, proba.shape[1]), dtype=np.float32)
+                best = np.empty(self.grid.size, dtype=np.min_scalar_type(proba.shape[1]))
+            proba_table[start:stop] = proba
+            best[start:stop] = proba.argmax(axis=1)
+
+        classes = np.asarray(getattr(model, "classes_", np.arange(proba_table.shape[1])))
+        with self._lock:
+            self._tables[model_key] = (classes, best, proba_table)
+
+    def is_precomputed(self, model_key):
+        return model_key in self._tables
+
+    def discard(self, model_key):
+        with self._lock:
+            self._tables.pop(model_key, None)
+            for key in [k for k in self._entries if k[0] == model_key]:
+                del self._entries[key]
+
+    def discard_path(self, model_path):
+        """
+        同じパスのモデル（古いバージョンを含む）の結果を全て捨てます
+        """
+        model_path = str(model_path)
+        with self._lock:
+            for key in [k for k in self._tables if k[0] == model_path]:
+                del self._tables[key]
+            for key in [k for k in self._entries if k[0][0] == model_path]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "precomputed_models": len(self._tables),
+            }
+
+
+def model_key(model_path, model):
+    """
+    キャッシュのキーにするモデルの識別子（パスと、読み込んだオブジェクトごとのバージョン番号）
+
+    id() は破棄されたモデルの番号が別のモデルに使い回されるため使いません。
+    """
+    from ml_core import model_cache
+
+    return (str(model_path), model_cache.model_version(model))
+
+
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+
+def shared_iris_cache():
+    """
+    アイリスのスライダーの格子に対するプロセス内で共有のキャッシュを返します
+    """
+    from ml_core import iris
+
+    with _shared_caches_lock:
+        if "iris" not in _shared_caches:
+            grid = QuantizedGrid(iris.IRIS_LOWS, iris.IRIS_HIGHS, iris.IRIS_STEP)
+            _shared_caches["iris"] = PredictionCache(grid)
+        return _shared_caches["iris"]
+
+
+def discard_model_path(model_path):
+    """
+    共有キャッシュから、そのパスのモデルの結果を全て捨てます
+    """
+    with _shared_caches_lock:
+        caches = list(_shared_caches.values())
+    for cache in caches:
+        cache.discard_path(model_path)
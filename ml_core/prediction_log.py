@@ -0,0 +1,283 @@
+"""
+予測ログ（非同期・まとめ書き）
+
+予測ごとに入力・確率・モデルのパス・レイテンシを記録します。
+log() はキューに入れるだけで戻り、ディスクへの書き込みはバックグラウンドのスレッドが
+まとめて行うので、予測ボタンの処理がディスクI/Oを待つことはありません。
+
+- キューの上限を超えた記録は捨てて件数だけ数えます（メモリ使用量が増え続けない）
+- ファイルが一定のサイズ・行数・経過時間を超えたら新しいファイルに切り替えます（ローテーション）。
+  Parquet は閉じるまで読めないので、既定では1分ごとに閉じてドリフト監視などから読めるようにします
+- 保存期間を過ぎたファイルと、上限の数を超えた古いファイルは削除します
+- 形式は JSONL（既定）または Parquet（pyarrow が必要）
+
+環境変数:
+    PREDICTION_LOG=0                 ログを無効にする
+    PREDICTION_LOG_DIR               出力先フォルダ（既定: prediction_logs）
+    PREDICTION_LOG_FORMAT            jsonl または parquet
+    PREDICTION_LOG_RETENTION_DAYS    ログを残す日数（既定: 7）
+"""
+import atexit
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_LOG_DIR = "prediction_logs"
+
+# キューに貯めておける記録の最大数
+DEFAULT_MAX_QUEUE = 10_000
+
+# まとめて書き出す行数と、最長の待ち時間（秒）
+DEFAULT_FLUSH_ROWS = 1_000
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# 1ファイルの最大サイズ（バイト）と最大行数
+DEFAULT_ROTATE_BYTES = 64 * 1024 * 1024
+DEFAULT_ROTATE_ROWS = 100_000
+
+# 1ファイルに書き続ける最長の時間（秒）。Parquet は閉じるまで読めないので短くする
+DEFAULT_ROTATE_SECONDS = {"jsonl": 3600.0, "parquet": 60.0}
+
+# ログを残す期間（秒）と、フォルダに残すファイル数の上限
+DEFAULT_RETENTION_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_FILES = 1_000
+
+FORMATS = ("jsonl", "parquet")
+
+
+def make_record(app, model_path, inputs, prediction, probabilities, latency_ms):
+    """
+    1件分の予測ログを作ります
+    """
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "app": app,
+        "model_path": str(model_path),
+        "inputs": [float(v) for v in np.ravel(inputs)],
+        "prediction": str(prediction),
+        "probabilities": [float(p) for p in np.ravel(probabilities)] if probabilities is not None else None,
+        "latency_ms": float(latency_ms),
+    }
+
+
+def parquet_schema():
+    """
+    Parquet のスキーマ（最初のバッチから推測すると、確率が全て None のとき列の型が null になるため固定する）
+    """
+    import pyarrow as pa
+
+    return pa.schema([
+        ("timestamp", pa.string()),
+        ("app", pa.string()),
+        ("model_path", pa.string()),
+        ("inputs", pa.list_(pa.float64())),
+        ("prediction", pa.string()),
+        ("probabilities", pa.list_(pa.float64())),
+        ("latency_ms", pa.float64()),
+    ])
+
+
+class PredictionLogger:
+    """
+    予測ログをバックグラウンドでまとめて書き出します
+    """
+
+    def __init__(self, log_dir=DEFAULT_LOG_DIR, fmt="jsonl", max_queue=DEFAULT_MAX_QUEUE,
+                 flush_rows=DEFAULT_FLUSH_ROWS, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 rotate_bytes=DEFAULT_ROTATE_BYTES, rotate_rows=DEFAULT_ROTATE_ROWS, rotate_seconds=None,
+                 retention_seconds=DEFAULT_RETENTION_SECONDS, max_files=DEFAULT_MAX_FILES):
+        if fmt not in FORMATS:
+            raise ValueError(f"対応していない形式です: {fmt}")
+        self.log_dir = Path(log_dir)
+        self.fmt = fmt
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_rows = rotate_rows
+        self.rotate_seconds = DEFAULT_ROTATE_SECONDS[fmt] if rotate_seconds is None else rotate_seconds
+        self.retention_seconds = retention_seconds
+        self.max_files = max_files
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._path = None
+        self._file = None
+        self._parquet_writer = None
+        self._opened_at = None
+        self._rows_in_file = 0
+        self.pruned = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._writer_loop, name="prediction-log", daemon=True)
+        self._thread.start()
+
+    def log(self, record):
+        """
+        記録をキューに入れます（ブロックしません）。キューが一杯なら捨てて False を返します
+        """
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout=5.0):
+        """
+        キューに残った記録を書き出してから終了します
+        """
+        self._stopped.set()
+        self._thread.join(timeout)
+
+    # ---- 書き込みスレッド ----
+
+    def _writer_loop(self):
+        while True:
+            batch = self._drain()
+            if batch:
+                try:
+                    self._write(batch)
+                    self.written += len(batch)
+                except Exception:
+                    self.errors += 1
+            elif self._stopped.is_set():
+                break
+            elif self._path is not None and self._should_rotate():
+                # 記録が来なくても時間が来たら閉じる（Parquet を読めるようにする）
+                self._close_file()
+        self._close_file()
+
+    def _drain(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(timeout, 0.1)))
+            except queue.Empty:
+                if self._stopped.is_set():
+                    break
+        return batch
+
+    def _new_path(self):
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return self.log_dir / f"predictions-{stamp}-{os.getpid()}.{self.fmt}"
+
+    def _should_rotate(self):
+        if not self._path.exists():
+            return True
+        return (
+            self._path.stat().st_size >= self.rotate_bytes
+            or self._rows_in_file >= self.rotate_rows
+            or time.monotonic() - self._opened_at >= self.rotate_seconds
+        )
+
+    def _rotate_if_needed(self):
+        if self._path is not None and not self._should_rotate():
+            return
+        self._close_file()
+        self._path = self._new_path()
+        self._opened_at = time.monotonic()
+        self._rows_in_file = 0
+
+    def _write(self, batch):
+        self._rotate_if_needed()
+
+        if self.fmt == "jsonl":
+            if self._file is None:
+                self._file = open(self._path, "a", encoding="utf-8")
+            self._file.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch))
+            self._file.flush()
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            schema = parquet_schema()
+            table = pa.Table.from_pylist(batch, schema=schema)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self._path, schema)
+            self._parquet_writer.write_table(table)
+        self._rows_in_file += len(batch)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._path is not None:
+            self._path = None
+            self._prune()
+
+    def _prune(self):
+        """
+        保存期間を過ぎたファイルと、max_files を超えた古いファイルを削除します（他のプロセスのファイルも対象）
+        """
+        files = []
+        for path in self.log_dir.glob("predictions-*"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        files.sort(reverse=True)
+        cutoff = time.time() - self.retention_seconds
+        for i, (mtime, path) in enumerate(files):
+            if mtime < cutoff or i >= self.max_files:
+                try:
+                    path.unlink()
+                    self.pruned += 1
+                except OSError:
+                    continue
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "pruned": self.pruned,
+            "path": str(self._path) if self._path else None,
+        }
+
+
+_shared_logger = None
+_shared_logger_lock = threading.Lock()
+
+
+def shared_logger():
+    """
+    プロセス内で共有するロガーを返します。PREDICTION_LOG=0 なら None を返します
+    """
+    global _shared_logger
+    if os.environ.get("PREDICTION_LOG", "1") in ("0", "false"):
+        return None
+    with _shared_logger_lock:
+        if _shared_logger is None:
+            _shared_logger = PredictionLogger(
+                log_dir=os.environ.get("PREDICTION_LOG_DIR", DEFAULT_LOG_DIR),
+                fmt=os.environ.get("PREDICTION_LOG_FORMAT", "jsonl"),
+                retention_seconds=float(os.environ.get("PREDICTION_LOG_RETENTION_DAYS", 7)) * 24 * 3600,
+            )
+            atexit.register(_shared_logger.close)
+        return _shared_logger
+
+
+def log_prediction(app, model_path, inputs, prediction, probabilities, latency_ms):
+    """
+    共有ロガーに1件記録します（ログが無効なら何もしません）
+    """
+    logger = shared_logger()
+    if logger is not None:
+        logger.log(make_record(app, model_path, inputs, prediction, probabilities, latency_ms))
@@ -0,0 +1,214 @@
+"""
+事前ウォームアップしてからStreamlitアプリを起動する
+
+`streamlit run` は最初のリクエストで pandas / plotly / sklearn の import と
+モデルの読み込みを行うため、デプロイ直後の1回目の表示が数秒かかります。
+このモジュールは先に重いモジュールを import し、起動するアプリが使うモデルを
+プロセス内の共有キャッシュ（ml_core.model_cache）に読み込んでからサーバーを起動します
+（iris_streamlit_app.py はアイリスのモデルだけ、multi_model_app.py は選択できる全てのモデル、
+モデルを使わないアプリは読み込みません）。
+
+--workers を2以上にすると、ウォームアップ済みの親プロセスから fork した
+子プロセスがそれぞれ別のポートでサーバーを起動します。import 済みのモジュールや
+モデルのメモリはコピーオンライトで共有されます。子プロセスが落ちた場合は親が fork し直します。
+
+起動例:
+    python -m ml_core.prewarm multi_model_app.py --port 8502
+    python -m ml_core.prewarm multi_model_app.py --port 8502 --workers 4
+"""
+import argparse
+import importlib
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+# 各アプリが使う重いモジュール
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "plotly.express",
+    "plotly.graph_objects",
+    "sklearn",
+    "sklearn.ensemble",
+    "sklearn.linear_model",
+    "sklearn.neighbors",
+    "sklearn.tree",
+    "PIL.Image",
+    "streamlit",
+)
+
+
+def warm_imports(modules=HEAVY_MODULES):
+    """
+    モジュールを import し、{モジュール名: 秒} を返します（見つからないものは飛ばします）
+    """
+    timings = {}
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+def app_model_paths(app_file, root="../"):
+    """
+    アプリが読み込むモデルのパスを返します（モデルを使わないアプリなら空のリスト）
+    """
+    from ml_core import loading, registry
+
+    name = Path(app_file).stem
+    if name == "iris_streamlit_app":
+        return [Path(loading.DEFAULT_MODEL_PATH)]
+    if name == "multi_model_app":
+        # どのプロジェクトのモデルも選べるので、見つかったモデルを全て読み込む（キャッシュの上限まで）
+        index = registry.ModelRegistry(root, index_path=None)
+        return [m for project in index.projects() for m in project["models"]]
+    return []
+
+
+def preload_models(paths):
+    """
+    モデルを共有キャッシュに読み込み、{パス: 秒} を返します
+
+    監視スレッドなどは起動しないので、この後に fork しても安全です。
+    """
+    from ml_core import model_cache
+
+    cache = model_cache.shared_cache()
+    timings = {}
+    for path in paths:
+        started = time.perf_counter()
+        try:
+            cache.get(path)
+        except Exception as e:
+            print(f"⚠️ {path} を読み込めませんでした: {e}", file=sys.stderr)
+            continue
+        timings[str(path)] = time.perf_counter() - started
+    return timings
+
+
+def run_streamlit(app_file, port, extra_args=()):
+    """
+    このプロセスの中でStreamlitサーバーを起動します（戻りません）
+    """
+    from streamlit.web import cli
+
+    args = ["run", str(app_file), "--server.port", str(port), "--server.headless", "true", *extra_args]
+    cli.main(args=args, prog_name="streamlit")
+
+
+def _fork_worker(app_file, port, extra_args):
+    pid = os.fork()
+    if pid == 0:
+        # 子プロセス: 親のシグナル設定を戻してからサーバーを起動する
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            run_streamlit(app_file, port, extra_args)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def serve_forked(app_file, ports, extra_args=()):
+    """
+    ports ごとに子プロセスを fork して起動し、落ちた子プロセスは fork し直します
+
+    続けて落ちる場合（ポートが使用中など）は、ランチャーの自動再起動と同じく
+    待ち時間を2倍ずつ延ばしてから fork します。
+    """
+    from ml_core.supervisor import MAX_RESTART_BACKOFF, RESTART_BACKOFF
+
+    workers = {}  # PID -> (ポート, 起動した時刻)
+    for port in ports:
+        workers[_fork_worker(app_file, port, extra_args)] = (port, time.monotonic())
+    failures = {port: 0 for port in ports}
+    restart_at = {}  # ポート -> fork し直す時刻
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    while workers or (restart_at and not stopping):
+        now = time.monotonic()
+        for port, when in list(restart_at.items()):
+            if when <= now and not stopping:
+                del restart_at[port]
+                workers[_fork_worker(app_file, port, extra_args)] = (port, time.monotonic())
+
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        except InterruptedError:
+            continue
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+        entry = workers.pop(pid, None)
+        if entry is None or stopping:
+            continue
+        port, started_at = entry
+        # しばらく動いていたワーカーなら、待ち時間を最初からやり直す
+        if time.monotonic() - started_at > MAX_RESTART_BACKOFF:
+            failures[port] = 0
+        failures[port] += 1
+        backoff = min(RESTART_BACKOFF * 2 ** (failures[port] - 1), MAX_RESTART_BACKOFF)
+        restart_at[port] = time.monotonic() + backoff
+        print(f"⚠️ ポート{port}のワーカー(PID {pid})が終了しました。{backoff:.0f}秒後に起動し直します", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ウォームアップしてからStreamlitアプリを起動します")
+    parser.add_argument("app", help="起動するアプリ（.py）")
+    parser.add_argument("--port", type=int, default=8501, help="最初のワーカーのポート")
+    parser.add_argument("--workers", type=int, default=1, help="fork するワーカー数（ポートは連番）")
+    parser.add_argument("--models-root", default="../", help="事前に読み込むモデルを探すフォルダ")
+    parser.add_argument("--model", action="append", default=[], help="追加で事前に読み込むモデル（複数指定可）")
+    parser.add_argument("--no-preload", action="store_true", help="モデルの事前読み込みをしない")
+    args, extra_args = parser.parse_known_args(argv)
+    extra_models = [Path(p).resolve() for p in args.model]
+
+    # アプリと同じ場所から起動したのと同じ状態にする（相対パス ../ や ml_core の import のため）
+    app_dir = Path(args.app).resolve().parent
+    os.chdir(app_dir)
+    sys.path.insert(0, str(app_dir))
+
+    started = time.perf_counter()
+    import_timings = warm_imports()
+    if args.no_preload:
+        model_timings = {}
+    else:
+        paths = app_model_paths(args.app, args.models_root) + extra_models
+        model_timings = preload_models(paths)
+
+    print("🔥 ウォームアップ完了")
+    for name, seconds in import_timings.items():
+        print(f"  import {name}: {seconds * 1000:.0f} ms")
+    for path, seconds in model_timings.items():
+        print(f"  model {path}: {seconds * 1000:.0f} ms")
+    print(f"  合計: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    app_file = Path(args.app).name
+    if args.workers <= 1:
+        run_streamlit(app_file, args.port, extra_args)
+    else:
+        serve_forked(app_file, [args.port + i for i in range(args.workers)], extra_args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Streamlitの再実行（rerun）ごとの処理時間の計測
+
+環境変数 ML_PROFILE=1 のときだけ有効になります（無効のときは何もしません）。
+各アプリの処理を名前付きの区間（stage）で囲み、区間ごとの時間をヒストグラムに集計します。
+
+    prof = profiling.start_rerun("multi_model_app")
+    with prof.stage("discovery"):
+        ...
+    prof.finish()
+
+集計結果は次の方法で確認できます。
+- サイドバーのデバッグパネル（profiling.sidebar_panel）
+- Prometheus形式のテキスト: ML_PROFILE_FILE に書き出し、ML_PROFILE_PORT を指定すると
+  http://localhost:<port>/metrics でも取得できます
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get("ML_PROFILE", "") not in ("", "0", "false")
+
+# ヒストグラムのバケット境界（秒）
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# セッションごとの直近の再実行を何セッション分保持するか
+MAX_SESSIONS = 200
+
+# Prometheus形式のファイルを書き出す最短間隔（秒）
+FILE_WRITE_INTERVAL = 1.0
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        バケットから分位点を概算します（バケットの上限を返す）
+        """
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), self.counts):
+            cumulative += n
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+
+class ProfileStore:
+    """
+    全セッションの計測結果を集計して保持します
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}  # (app, stage) -> Histogram
+        self.sessions = OrderedDict()  # session_id -> {"app", "stages", "total", "finished_at"}
+        self._file_written_at = 0.0
+        self._file_error = None
+
+    def observe(self, app, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get((app, stage))
+            if histogram is None:
+                histogram = self.histograms[(app, stage)] = Histogram()
+            histogram.observe(seconds)
+
+    def record_rerun(self, session_id, app, stages, total):
+        with self._lock:
+            self.sessions[session_id] = {
+                "app": app,
+                "stages": dict(stages),
+                "total": total,
+                "finished_at": time.time(),
+            }
+            self.sessions.move_to_end(session_id)
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+        self._maybe_write_file()
+
+    def summary(self):
+        with self._lock:
+            return {
+                key: {
+                    "count": h.count,
+                    "mean_ms": h.total / h.count * 1000 if h.count else 0.0,
+                    "p50_ms": h.quantile(0.5) * 1000,
+                    "p95_ms": h.quantile(0.95) * 1000,
+                }
+                for key, h in sorted(self.histograms.items())
+            }
+
+    def render_prometheus(self):
+        lines = [
+            "# HELP streamlit_stage_seconds Time spent in each named stage of a Streamlit rerun.",
+            "# TYPE streamlit_stage_seconds histogram",
+        ]
+        with self._lock:
+            for (app, stage), h in sorted(self.histograms.items()):
+                labels = f'app="{app}",stage="{stage}"'
+                cumulative = 0
+                for bound, n in zip(BUCKETS, h.counts):
+                    cumulative += n
+                    lines.append(f'streamlit_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'streamlit_stage_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f"streamlit_stage_seconds_sum{{{labels}}} {h.total}")
+                lines.append(f"streamlit_stage_seconds_count{{{labels}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def _maybe_write_file(self):
+        path = os.environ.get("ML_PROFILE_FILE")
+        now = time.monotonic()
+        if not path or now - self._file_written_at < FILE_WRITE_INTERVAL:
+            return
+        self._file_written_at = now
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render_prometheus())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # 書き出せなくてもページの表示は止めない（同じエラーは1度だけ表示する）
+            message = f"{type(e).__name__}: {e}"
+            if message != self._file_error:
+                print(f"⚠️ ML_PROFILE_FILE に書き出せませんでした: {message}", file=sys.stderr)
+            self._file_error = message
+            return
+        self._file_error = None
+
+
+store = ProfileStore()
+
+
+class RerunProfile:
+    """
+    1回の再実行の計測。区間ごとの時間はその場でヒストグラムにも記録します
+
+    st.stop() で途中終了した場合も、それまでに終わった区間は記録されます。
+    """
+
+    def __init__(self, app, session_id):
+        self.app = app
+        self.session_id = session_id
+        self.stages = OrderedDict()
+        self.started = time.perf_counter()
+        self._last_checkpoint = self.started
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            store.observe(self.app, name, elapsed)
+            self._last_checkpoint = time.perf_counter()
+
+    def checkpoint(self, name):
+        """
+        直前の区間（または計測開始）からの時間を name の区間として記録します
+
+        with で囲みにくい長い処理（ページ全体など）の計測に使います。
+        """
+        now = time.perf_counter()
+        elapsed = now - self._last_checkpoint
+        self._last_checkpoint = now
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+        store.observe(self.app, name, elapsed)
+
+    def finish(self):
+        total = time.perf_counter() - self.started
+        store.observe(self.app, "rerun_total", total)
+        store.record_rerun(self.session_id, self.app, self.stages, total)
+
+
+class _NullProfile:
+    """
+    計測が無効なときに使う、何もしない RerunProfile
+    """
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def checkpoint(self, name):
+        pass
+
+    def finish(self):
+        pass
+
+
+_endpoint_lock = threading.Lock()
+_endpoint_started = False
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx is not None else "no-session"
+    except ImportError:
+        return "no-session"
+
+
+def start_rerun(app):
+    """
+    再実行の計測を始めます。ML_PROFILE が無効なら何もしないオブジェクトを返します
+    """
+    if not ENABLED:
+        return _NullProfile()
+    start_http_endpoint()
+    return RerunProfile(app, _session_id())
+
+
+def start_http_endpoint(port=None):
+    """
+    ML_PROFILE_PORT（または port）で /metrics を返すHTTPサーバーを1度だけ起動します
+    """
+    global _endpoint_started
+    port = port or os.environ.get("ML_PROFILE_PORT")
+    if not port:
+        return
+    with _endpoint_lock:
+        if _endpoint_started:
+            return
+        _endpoint_started = True
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = store.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", int(port)), _Handler)
+    except OSError:
+        # 別のアプリが同じポートで起動済み
+        return
+    threading.Thread(target=server.serve_forever, name="profile-endpoint", daemon=True).start()
+
+
+def sidebar_panel(prof):
+    """
+    サイドバーにデバッグパネルを表示します（ML_PROFILE が有効なときのみ）
+    """
+    if not ENABLED:
+        return
+    import streamlit as st
+
+    with st.sidebar.expander("🐞 処理時間（デバッグ）"):
+        if isinstance(prof, RerunProfile):
+            st.markdown("**今回の再実行**")
+            for name, seconds in prof.stages.items():
+                st.write(f"{name}: {seconds * 1000:.2f} ms")
+
+        st.markdown("**全セッションの集計**")
+        rows = [
+            {"アプリ": app, "区間": stage, "回数": s["count"],
+             "平均 (ms)": round(s["mean_ms"], 2), "p50 (ms)": s["p50_ms"], "p95 (ms)": s["p95_ms"]}
+            for (app, stage), s in store.summary().items()
+        ]
+        if rows:
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+        st.caption(f"記録中のセッション数: {len(store.sessions)}")
+
+        from ml_core import lazy
+        loaded, pending = lazy.import_report()
+        st.markdown("**遅延importの時間（起動時間レポート）**")
+        for name, timing in loaded.items():
+            note = "（import済み）" if timing["already_loaded"] else ""
+            st.write(f"{name}: {timing['seconds'] * 1000:.1f} ms{note}")
+        if pending:
+            st.write(f"まだ使われていないモジュール: {', '.join(pending)}")
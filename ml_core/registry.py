@@ -0,0 +1,273 @@
+"""
+プロジェクト/モデルの一覧（モデルレジストリ）
+
+../ 以下の各プロジェクトの models/ フォルダ（.pkl / .joblib）を探す処理を、ディレクトリの更新時刻（mtime）を
+キーにしたインデックスとしてファイルに保存します。再実行のたびに全体を走査せず、
+更新時刻が変わったディレクトリだけを調べ直します。
+
+watchdog がインストールされていれば、ファイルシステムの変更通知（Linuxではinotify）を受けて
+変更があったときだけ再走査するウォッチャーも使えます。監視するのは root 直下（プロジェクトの増減）、
+各プロジェクト直下の models/ フォルダの作成・削除と models/ の中身だけで、予測ログやインデックスのファイルなど他の書き込みには反応しません。
+NFS などのネットワークファイルシステムでは変更通知が届かないため、更新時刻の確認（ポーリング）を続けます。
+"""
+import fnmatch
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+MODEL_PATTERNS = ("*.pkl", "*.joblib")
+
+# インデックスを保存するファイル
+DEFAULT_INDEX_PATH = ".model_registry.json"
+
+# ウォッチャーが無い場合に、更新時刻を確認し直すまでの最短間隔（秒）
+DEFAULT_TTL_SECONDS = 5.0
+
+INDEX_VERSION = 1
+
+# 変更通知が届かないファイルシステム（/proc/mounts の種類）
+NETWORK_FILESYSTEMS = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p", "afs", "ceph", "glusterfs")
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def is_network_filesystem(path):
+    """
+    path がネットワークファイルシステム上にあれば True を返します（/proc/mounts が無ければ False）
+    """
+    path = os.path.realpath(path)
+    best, fs_type = "", None
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace("\\040", " ")
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) >= len(best):
+                    best, fs_type = mount_point, fields[2]
+    except OSError:
+        return False
+    return fs_type in NETWORK_FILESYSTEMS
+
+
+class ModelRegistry:
+    """
+    root 以下の「プロジェクト/models/*.pkl, *.joblib」を一覧にして保持します
+    """
+
+    def __init__(self, root="../", index_path=DEFAULT_INDEX_PATH,
+                 patterns=MODEL_PATTERNS, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.root = Path(root)
+        self.index_path = Path(index_path) if index_path else None
+        self.patterns = tuple(patterns)
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._index = {"version": INDEX_VERSION, "root_mtime": None, "projects": {}}
+        self._checked_at = 0.0
+        self._dirty = True
+        self._observer = None
+        self._watches = {}  # 監視中のフォルダ -> watchdog の監視
+        self.scans = 0
+
+        self._load_index()
+
+    # ---- インデックスの保存と読み込み ----
+
+    def _load_index(self):
+        if self.index_path is None or not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (index.get("version") == INDEX_VERSION
+                and index.get("root") == str(self.root.resolve())
+                and index.get("patterns") == list(self.patterns)):
+            self._index = index
+
+    def _save_index(self):
+        if self.index_path is None:
+            return
+        self._index["root"] = str(self.root.resolve())
+        self._index["patterns"] = list(self.patterns)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass
+
+    # ---- 走査 ----
+
+    def _scan_project(self, project_path, entry):
+        """
+        1つのプロジェクトを調べ直します。更新時刻が変わっていなければ entry をそのまま返します
+        """
+        models_dir = project_path / "models"
+        project_mtime = _mtime(project_path)
+        models_mtime = _mtime(models_dir)
+
+        if (entry is not None
+                and entry["project_mtime"] == project_mtime
+                and entry["models_mtime"] == models_mtime):
+            return entry
+
+        models = []
+        if models_mtime is not None and models_dir.is_dir():
+            for pattern in self.patterns:
+                models.extend(p.name for p in models_dir.glob(pattern))
+            self.scans += 1
+
+        return {
+            "project_mtime": project_mtime,
+            "models_mtime": models_mtime,
+            "models": sorted(models),
+        }
+
+    def refresh(self, force=False):
+        """
+        変更があったディレクトリだけを調べ直してインデックスを更新します
+        """
+        with self._lock:
+            now = time.monotonic()
+            watching = self._observer is not None
+            if not force and not self._dirty and (watching or now - self._checked_at < self.ttl_seconds):
+                return False
+
+            old_projects = self._index["projects"]
+            root_mtime = _mtime(self.root)
+
+            # ルートの更新時刻が同じならプロジェクトの増減は無いので、前回の一覧を使う
+            if root_mtime == self._index["root_mtime"] and not force:
+                names = list(old_projects)
+            else:
+                names = [p.name for p in self.root.iterdir() if p.is_dir()]
+
+            projects = {}
+            for name in names:
+                entry = self._scan_project(self.root / name, old_projects.get(name))
+                projects[name] = entry
+
+            changed = projects != old_projects or root_mtime != self._index["root_mtime"]
+            self._index["projects"] = projects
+            self._index["root_mtime"] = root_mtime
+            self._checked_at = now
+            self._dirty = False
+
+            if changed:
+                self._save_index()
+            if self._observer is not None:
+                self._watch_models_dirs()
+            return changed
+
+    def projects(self):
+        """
+        モデルがあるプロジェクトを [{"name", "path", "models"}] の形で返します
+        """
+        self.refresh()
+        with self._lock:
+            items = sorted(self._index["projects"].items())
+        return [
+            {
+                "name": name,
+                "path": self.root / name,
+                "models": [self.root / name / "models" / m for m in entry["models"]],
+            }
+            for name, entry in items
+            if entry["models"]
+        ]
+
+    # ---- ファイル変更の監視 ----
+
+    def _is_model_file(self, path):
+        name = os.path.basename(path)
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.patterns)
+
+    def start_watching(self):
+        """
+        watchdog で root 直下と各プロジェクトの models/ の変更を監視します
+
+        watchdog が無い場合や root がネットワークファイルシステム上にある場合は False を返し、
+        TTLごとの更新時刻チェックを続けます。
+        """
+        if self._observer is not None:
+            return True
+        if is_network_filesystem(self.root):
+            return False
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+
+        registry = self
+
+        class _RootHandler(FileSystemEventHandler):
+            # プロジェクトのフォルダが増えた・消えた・名前が変わったときだけ
+            def on_any_event(self, event):
+                if event.is_directory and event.event_type in ("created", "deleted", "moved"):
+                    registry._dirty = True
+
+        class _ProjectHandler(FileSystemEventHandler):
+            # models/ フォルダが作られた・消えたときだけ
+            def on_any_event(self, event):
+                paths = (event.src_path, getattr(event, "dest_path", ""))
+                if event.is_directory and any(p and os.path.basename(p) == "models" for p in paths):
+                    registry._dirty = True
+
+        class _ModelsHandler(FileSystemEventHandler):
+            # モデルのファイルが変わったときだけ
+            def on_any_event(self, event):
+                paths = (event.src_path, getattr(event, "dest_path", ""))
+                if event.is_directory or any(p and registry._is_model_file(p) for p in paths):
+                    registry._dirty = True
+
+        self._project_handler = _ProjectHandler()
+        self._models_handler = _ModelsHandler()
+        observer = Observer()
+        observer.schedule(_RootHandler(), str(self.root), recursive=False)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+        self._watch_models_dirs()
+        return True
+
+    def _watch_models_dirs(self):
+        """
+        インデックスにあるプロジェクトと models/ を監視対象に加え、消えたものを外します
+        """
+        wanted = {}
+        for name, entry in self._index["projects"].items():
+            wanted[self.root / name] = self._project_handler
+            if entry["models_mtime"] is not None:
+                wanted[self.root / name / "models"] = self._models_handler
+        for path in list(self._watches):
+            if path not in wanted:
+                try:
+                    self._observer.unschedule(self._watches.pop(path))
+                except (KeyError, OSError):
+                    pass
+        for path in wanted.keys() - self._watches.keys():
+            try:
+                self._watches[path] = self._observer.schedule(wanted[path], str(path), recursive=False)
+            except OSError:
+                # 監視を始める前に消えた場合は次の更新で調べ直す
+                self._dirty = True
+
+    def stop_watching(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+            self._watches = {}
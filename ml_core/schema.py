@@ -0,0 +1,124 @@
+"""
+モデルの入力スキーマ（特徴量とクラス名）
+
+次の優先順位で、モデルが期待する特徴量とクラス名を決めます。
+
+1. モデルと同じ名前の横に置いたJSON（例: models/model.pkl → models/model.schema.json）
+2. 学習済みモデルの feature_names_in_ / n_features_in_ / classes_
+
+サイドカーJSONの例:
+    {
+      "features": [
+        {"name": "がく片の長さ", "min": 4.0, "max": 8.0, "default": 5.5, "step": 0.1},
+        {"name": "がく片の幅", "min": 2.0, "max": 4.5}
+      ],
+      "class_names": ["Setosa", "Versicolor", "Virginica"]
+    }
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+SCHEMA_SUFFIX = ".schema.json"
+
+
+class ModelSchema:
+    """
+    特徴量の一覧（名前・最小値・最大値・初期値・刻み幅）とクラス名
+    """
+
+    def __init__(self, features, class_names=None, source=""):
+        self.features = features
+        self.class_names = class_names
+        self.source = source
+
+        self.names = [f["name"] for f in features]
+        self.lows = np.array([f.get("min", -np.inf) for f in features], dtype=np.float64)
+        self.highs = np.array([f.get("max", np.inf) for f in features], dtype=np.float64)
+
+    @property
+    def n_features(self):
+        return len(self.features)
+
+    def validate(self, values):
+        """
+        入力をまとめてチェックし、エラーメッセージのリストを返します（問題が無ければ空）
+        """
+        X = np.asarray(values, dtype=np.float64).reshape(-1, np.shape(values)[-1])
+        if X.shape[1] != self.n_features:
+            return [f"特徴量の数が違います（モデルは{self.n_features}個、入力は{X.shape[1]}個）"]
+
+        bad = ~np.isfinite(X) | (X < self.lows) | (X > self.highs)
+        errors = []
+        for i in np.flatnonzero(bad.any(axis=0)):
+            feature = self.features[i]
+            errors.append(
+                f"{feature['name']} は {feature.get('min', '-∞')}〜{feature.get('max', '∞')} の範囲で入力してください"
+            )
+        return errors
+
+    def label_for(self, model, prediction):
+        """
+        予測値（classes_ の値）を表示用のクラス名に変換します
+        """
+        classes = getattr(model, "classes_", None)
+        if self.class_names is None or classes is None:
+            return str(prediction)
+        matches = np.flatnonzero(np.asarray(classes) == prediction)
+        if len(matches) == 0 or matches[0] >= len(self.class_names):
+            return str(prediction)
+        return self.class_names[matches[0]]
+
+    def class_labels(self, n_classes):
+        """
+        確率の列ごとのクラス名（足りない分は「クラスi」）
+        """
+        names = list(self.class_names or [])
+        return [names[i] if i < len(names) else f"クラス{i}" for i in range(n_classes)]
+
+
+def sidecar_path(model_path):
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + SCHEMA_SUFFIX)
+
+
+def _final_estimator(model):
+    steps = getattr(model, "steps", None)
+    return steps[-1][1] if steps else model
+
+
+def load_schema(model_path, model):
+    """
+    モデルのスキーマを返します。特徴量の数が分からない場合は None を返します
+
+    サイドカーJSONが壊れている（JSONとして読めない、"features" が無いなど）場合は
+    ValueError / KeyError / TypeError をそのまま送出します。
+    """
+    path = sidecar_path(model_path)
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+        features = [{"name": f} if isinstance(f, str) else dict(f) for f in spec["features"]]
+        return ModelSchema(features, spec.get("class_names"), source=path.name)
+    return schema_from_model(model)
+
+
+def schema_from_model(model):
+    """
+    学習済みモデルの属性からスキーマを作ります。特徴量の数が分からない場合は None を返します
+    """
+    names = getattr(model, "feature_names_in_", None)
+    n_features = getattr(model, "n_features_in_", None)
+    if names is None and n_features is None:
+        n_features = getattr(_final_estimator(model), "n_features_in_", None)
+    if names is not None:
+        features = [{"name": str(name)} for name in names]
+    elif n_features is not None:
+        features = [{"name": f"特徴量{i + 1}"} for i in range(n_features)]
+    else:
+        return None
+
+    classes = getattr(model, "classes_", None)
+    class_names = [str(c) for c in classes] if classes is not None else None
+    return ModelSchema(features, class_names, source="モデルの属性")
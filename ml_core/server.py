@@ -0,0 +1,283 @@
+"""
+ヘッドレス推論サーバー
+
+Streamlitを経由せずに予測を返すHTTPサーバーです。
+同時に届いたリクエストを短い時間だけ待ってまとめ（マイクロバッチ）、
+1回の predict_proba でまとめて予測します。
+
+起動例:
+    python -m ml_core.server --model ../iris/models/model_iris.pkl --port 8000
+
+リクエスト例:
+    curl -X POST localhost:8000/predict -d '[5.1, 3.5, 1.4, 0.2]'
+    curl -X POST localhost:8000/predict -d '{"instances": [[5.1, 3.5, 1.4, 0.2], [6.7, 3.0, 5.2, 2.3]]}'
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ml_core import loading
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+def parse_instances(payload):
+    """
+    リクエストのJSONを2次元配列に変換します
+
+    1行（[..]）、複数行（[[..], [..]]）、{"instances": ...} のどれでも受け付けます。
+    """
+    if isinstance(payload, dict):
+        if "instances" not in payload:
+            raise ValueError('"instances" キーがありません')
+        payload = payload["instances"]
+
+    rows = np.asarray(payload, dtype=np.float64)
+    if rows.ndim == 1:
+        rows = rows.reshape(1, -1)
+    if rows.ndim != 2 or rows.size == 0:
+        raise ValueError("入力は1行または行の配列で指定してください")
+    # json.loads は NaN / Infinity も受け付けるが、同じバッチの他のリクエストまで失敗させるので断る
+    if not np.isfinite(rows).all():
+        raise ValueError("NaN や Infinity は入力できません")
+    return rows
+
+
+class AsyncMicroBatcher:
+    """
+    同時に届いた予測リクエストをまとめて1回の predict_proba で処理します
+
+    最初のリクエストから max_wait_ms だけ待つか、max_batch_rows 行に達した時点でバッチを確定し、
+    スレッドプールで予測します。同時に実行するバッチ数は workers 個までです。
+    列数の違うリクエストは同じバッチに入れません（1件の不正な入力がバッチ全体を失敗させないため）。
+    """
+
+    def __init__(self, model, max_batch_rows=256, max_wait_ms=1.0, workers=4):
+        self.model = model
+        self.classes = np.asarray(getattr(model, "classes_", []))
+        self.n_features = getattr(model, "n_features_in_", None)
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="predict")
+        self.slots = asyncio.Semaphore(workers)
+        self.queue = asyncio.Queue()
+        self.task = None
+        self.stopped = False
+        self._collecting = []  # 集めている途中のリクエスト（停止時に失敗させるため）
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._collect_loop())
+
+    async def stop(self):
+        """
+        バッチの収集を止め、まだ予測していないリクエストを RuntimeError で失敗させます
+        """
+        self.stopped = True
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        pending = list(self._collecting)
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("推論サーバーを停止しました"))
+        self.executor.shutdown(wait=False)
+
+    def check_rows(self, rows):
+        """
+        モデルの特徴量の数と列数が合わなければ ValueError を送出します
+        """
+        if self.n_features is not None and rows.shape[1] != self.n_features:
+            raise ValueError(f"特徴量の数が違います（{rows.shape[1]}列、モデルは{self.n_features}列）")
+
+    async def predict(self, rows):
+        """
+        rows をキューに入れ、自分の分の (予測クラス, 確率) が返るまで待ちます
+        """
+        self.check_rows(rows)
+        if self.stopped:
+            raise RuntimeError("推論サーバーを停止しました")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def _collect_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = self._collecting = [await self.queue.get()]
+            n_rows = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+
+            # 締め切りか行数の上限まで後続のリクエストを集める
+            while n_rows < self.max_batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                n_rows += len(item[0])
+
+            # 列数ごとに分けて予測する
+            groups = {}
+            for item in pending:
+                groups.setdefault(item[0].shape[1], []).append(item)
+            for group in groups.values():
+                await self.slots.acquire()
+                loop.create_task(self._run_batch(group))
+            self._collecting = []
+
+    async def _run_batch(self, pending):
+        loop = asyncio.get_running_loop()
+        try:
+            X = np.vstack([rows for rows, _ in pending])
+            proba = await loop.run_in_executor(self.executor, self.model.predict_proba, X)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.slots.release()
+
+        # 予測クラスは確率の argmax から求める（predict を別に呼ばない）
+        best = proba.argmax(axis=1)
+        labels = self.classes[best] if len(self.classes) else best
+
+        start = 0
+        for rows, future in pending:
+            end = start + len(rows)
+            if not future.done():
+                future.set_result((labels[start:end], proba[start:end]))
+            start = end
+
+
+class InferenceServer:
+    """
+    /predict と /health を提供する最小限のHTTP/1.1サーバー
+    """
+
+    def __init__(self, model_path, batcher):
+        self.model_path = str(model_path)
+        self.batcher = batcher
+        self.n_requests = 0
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                status, response = await self.dispatch(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            return 200, {"status": "ok", "model": self.model_path, "requests": self.n_requests}
+        if path != "/predict":
+            return 404, {"error": f"{path} は存在しません"}
+        if method != "POST":
+            return 405, {"error": "POSTで送信してください"}
+
+        try:
+            rows = parse_instances(json.loads(body or b"null"))
+            self.batcher.check_rows(rows)
+        except (ValueError, TypeError) as e:
+            return 400, {"error": f"入力が不正です: {e}"}
+
+        started = time.perf_counter()
+        try:
+            labels, proba = await self.batcher.predict(rows)
+        except Exception as e:
+            return 500, {"error": f"予測中にエラーが発生しました: {e}"}
+
+        self.n_requests += 1
+        return 200, {
+            "predictions": labels.tolist(),
+            "probabilities": proba.tolist(),
+            "latency_ms": (time.perf_counter() - started) * 1000,
+        }
+
+    @staticmethod
+    def _write_response(writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+
+async def serve(model_path, host, port, workers, max_batch_rows, max_wait_ms):
+    model = loading.load_model_file(model_path)
+
+    batcher = AsyncMicroBatcher(model, max_batch_rows, max_wait_ms, workers)
+    batcher.start()
+    server = InferenceServer(model_path, batcher)
+
+    tcp_server = await asyncio.start_server(server.handle_connection, host, port)
+    print(f"🚀 推論サーバーを起動しました: http://{host}:{port}/predict (モデル: {model_path})")
+    try:
+        async with tcp_server:
+            await tcp_server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ヘッドレス推論サーバー")
+    parser.add_argument("--model", default=loading.DEFAULT_MODEL_PATH, help="モデルファイルのパス")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="予測を実行するスレッド数")
+    parser.add_argument("--max-batch-rows", type=int, default=256, help="1バッチの最大行数")
+    parser.add_argument("--max-wait-ms", type=float, default=1.0, help="バッチを集める最大待ち時間（ミリ秒）")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.model, args.host, args.port, args.workers,
+                          args.max_batch_rows, args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+"""
+Streamlitアプリのプロセス管理（app_launcher.py 用）
+
+アプリごとに空いているポートを割り当てて `streamlit run` を子プロセスとして起動し、
+PIDの記録、ヘルスチェック、メモリ(RSS)/CPU使用率の取得、クラッシュ時の自動再起動を行います。
+
+子プロセスは新しいプロセスグループで起動し、停止時はグループごと終了させます。
+起動したPIDはファイルに記録しておき、ランチャー自体が落ちた後に再起動したときは
+前回の子プロセスを片付けてから始めます。
+"""
+import atexit
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+# 割り当てるポートの範囲（8501はメインアプリ用に空けておく）
+PORT_RANGE = range(8502, 8600)
+
+# 起動したPIDを記録するファイル
+DEFAULT_PID_FILE = ".launcher_pids.json"
+
+# 監視スレッドが状態を確認する間隔（秒）
+POLL_INTERVAL = 2.0
+
+# 起動直後または最後にヘルスチェックが通ってから、応答が無いまま待つ時間（秒）。過ぎたら再起動
+STARTUP_GRACE = 30.0
+
+# 停止を待つ時間（秒）。過ぎたら強制終了
+STOP_TIMEOUT = 5.0
+
+# 自動再起動の間隔（秒）。連続でクラッシュするたびに2倍にする（上限あり）
+RESTART_BACKOFF = 1.0
+MAX_RESTART_BACKOFF = 60.0
+
+HEALTH_PATHS = ("/_stcore/health", "/healthz")
+
+
+def discover_apps(app_dir=".", exclude=("app_launcher.py",)):
+    """
+    app_dir 直下の Streamlit アプリ（streamlit を import している .py）を返します
+    """
+    apps = []
+    for app_file in sorted(Path(app_dir).glob("*.py")):
+        if app_file.name in exclude:
+            continue
+        try:
+            source = app_file.read_text(encoding="utf-8", errors="ignore")
+        except OSError:
+            continue
+        if "import streamlit" not in source:
+            continue
+        apps.append({"name": app_file.stem, "file": str(app_file)})
+    return apps
+
+
+def _port_is_free(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.bind(("127.0.0.1", port))
+        except OSError:
+            return False
+    return True
+
+
+def _read_proc_usage(pid):
+    """
+    psutil が無い場合に /proc から (RSSバイト, CPU時間秒) を読みます（Linuxのみ）
+    """
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            rss_pages = int(f.read().split()[1])
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+        return rss_pages * os.sysconf("SC_PAGE_SIZE"), cpu_seconds
+    except (OSError, ValueError, IndexError):
+        return None, None
+
+
+class ManagedApp:
+    """
+    1つのアプリのプロセスと状態
+    """
+
+    def __init__(self, name, file):
+        self.name = name
+        self.file = file
+        self.port = None
+        self.n_ports = 1  # prewarm の --workers で fork したワーカーは port から連番のポートを使う
+        self.process = None
+        self.wanted = False  # 起動しておくべきか（停止ボタンで False）
+        self.started_at = None
+        self.restarts = 0
+        self.healthy = False
+        self.last_healthy_at = None
+        self.last_exit_code = None
+        self.next_restart_at = None
+        self.rss_bytes = None
+        self.cpu_percent = None
+        self._cpu_sample = None  # (時刻, CPU時間)
+        self._ps_process = None
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process is not None else None
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def status(self):
+        if self.running:
+            return "稼働中" if self.healthy else "起動中"
+        if self.wanted:
+            return "再起動待ち"
+        return "停止"
+
+    def url(self):
+        return f"http://localhost:{self.port}" if self.port else None
+
+
+class Supervisor:
+    """
+    複数のアプリを起動・停止・監視します
+    """
+
+    def __init__(self, apps, pid_file=DEFAULT_PID_FILE, auto_restart=True, prewarm=False, prewarm_workers=1,
+                 extra_args=()):
+        self.apps = {}
+        self.pid_file = Path(pid_file) if pid_file else None
+        self.auto_restart = auto_restart
+        # True なら ml_core.prewarm 経由で起動し、import とモデル読み込みを済ませてから受け付ける
+        self.prewarm = prewarm
+        # prewarm のとき fork するワーカー数（ワーカーごとに連番のポートを割り当てる）
+        self.prewarm_workers = prewarm_workers
+        self.extra_args = list(extra_args)
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+
+        # PIDファイルを書き換える前に、前回の子プロセスを片付ける
+        self._cleanup_orphans()
+        self.update_apps(apps)
+        self._monitor = threading.Thread(target=self._monitor_loop, name="app-supervisor", daemon=True)
+        self._monitor.start()
+        atexit.register(self.shutdown)
+
+    def update_apps(self, apps):
+        """
+        管理するアプリの一覧を更新します
+
+        新しく見つかったアプリを追加し、ファイルが無くなったアプリは停止して一覧から外します。
+        同じアプリはそのまま（起動中なら起動したまま）残します。
+        """
+        with self._lock:
+            files = {app["name"]: app["file"] for app in apps}
+            for name in list(self.apps):
+                if files.get(name) != self.apps[name].file:
+                    self._terminate(self.apps.pop(name))
+            for name, file in files.items():
+                if name not in self.apps:
+                    self.apps[name] = ManagedApp(name, file)
+            self._save_pids()
+
+    # ---- 起動と停止 ----
+
+    def _allocate_port(self, n_ports=1):
+        """
+        連続して空いている n_ports 個のポートの先頭を返します
+        """
+        used = {
+            app.port + i
+            for app in self.apps.values() if app.running
+            for i in range(app.n_ports)
+        }
+        for port in PORT_RANGE:
+            ports = range(port, port + n_ports)
+            if ports[-1] in PORT_RANGE and all(p not in used and _port_is_free(p) for p in ports):
+                return port
+        raise RuntimeError("空いているポートがありません")
+
+    def command(self, app):
+        if self.prewarm:
+            return [
+                sys.executable, "-m", "ml_core.prewarm", app.file,
+                "--port", str(app.port),
+                "--workers", str(app.n_ports),
+                *self.extra_args,
+            ]
+        return [
+            sys.executable, "-m", "streamlit", "run", app.file,
+            "--server.port", str(app.port),
+            "--server.headless", "true",
+            *self.extra_args,
+        ]
+
+    def _spawn(self, app):
+        app.n_ports = max(1, self.prewarm_workers) if self.prewarm else 1
+        app.port = self._allocate_port(app.n_ports)
+        app.process = subprocess.Popen(
+            self.command(app),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,  # 停止時にプロセスグループごと終了させるため
+        )
+        app.started_at = time.time()
+        app.healthy = False
+        app.last_healthy_at = None
+        app.next_restart_at = None
+        app._cpu_sample = None
+        app._ps_process = None
+        self._save_pids()
+
+    def start(self, name):
+        with self._lock:
+            app = self.apps[name]
+            app.wanted = True
+            if not app.running:
+                self._spawn(app)
+            return app
+
+    def stop(self, name):
+        with self._lock:
+            app = self.apps[name]
+            app.wanted = False
+            self._terminate(app)
+            self._save_pids()
+            return app
+
+    def restart(self, name):
+        with self._lock:
+            app = self.apps[name]
+            self._terminate(app)
+            app.wanted = True
+            self._spawn(app)
+            return app
+
+    def _terminate(self, app):
+        if app.process is None:
+            return
+        if app.process.poll() is None:
+            _kill_group(app.process.pid, signal.SIGTERM)
+            try:
+                app.process.wait(STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                _kill_group(app.process.pid, signal.SIGKILL)
+                app.process.wait()
+        app.last_exit_code = app.process.returncode
+        app.process = None
+        app.healthy = False
+        app.rss_bytes = None
+        app.cpu_percent = None
+
+    def shutdown(self):
+        """
+        監視を止めて全てのアプリを停止します
+        """
+        self._stop_event.set()
+        with self._lock:
+            for app in self.apps.values():
+                app.wanted = False
+                self._terminate(app)
+            self._save_pids()
+
+    # ---- PIDファイル ----
+
+    def _save_pids(self):
+        if self.pid_file is None:
+            return
+        pids = {app.name: app.pid for app in self.apps.values() if app.running}
+        try:
+            self.pid_file.write_text(json.dumps(pids), encoding="utf-8")
+        except OSError:
+            pass
+
+    def _cleanup_orphans(self):
+        """
+        前回のランチャーが残した子プロセスを終了させます
+        """
+        if self.pid_file is None or not self.pid_file.exists():
+            return
+        try:
+            pids = json.loads(self.pid_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            pids = {}
+        for pid in pids.values():
+            if _is_streamlit_process(pid):
+                _kill_group(pid, signal.SIGTERM)
+        self.pid_file.unlink(missing_ok=True)
+
+    # ---- 監視 ----
+
+    def _monitor_loop(self):
+        while not self._stop_event.wait(POLL_INTERVAL):
+            with self._lock:
+                apps = list(self.apps.values())
+            for app in apps:
+                try:
+                    self._check(app)
+                except Exception:
+                    pass
+
+    def _check(self, app):
+        with self._lock:
+            if app.process is not None and app.process.poll() is not None:
+                # クラッシュ（停止ボタン以外で終了）
+                app.last_exit_code = app.process.returncode
+                app.process = None
+                app.healthy = False
+                if app.wanted and self.auto_restart:
+                    app.restarts += 1
+                    backoff = min(RESTART_BACKOFF * 2 ** (app.restarts - 1), MAX_RESTART_BACKOFF)
+                    app.next_restart_at = time.time() + backoff
+                self._save_pids()
+
+            if (not app.running and app.wanted and self.auto_restart
+                    and app.next_restart_at is not None and time.time() >= app.next_restart_at):
+                self._spawn(app)
+                return
+
+        process = app.process
+        if app.running:
+            # ヘルスチェックはロックの外で行うので、その間に停止・再起動された場合は結果を使わない
+            healthy = self._health_check(app)
+            with self._lock:
+                if app.process is not process or not app.running:
+                    return
+                app.healthy = healthy
+                if healthy:
+                    app.last_healthy_at = time.time()
+                elif (app.wanted and self.auto_restart
+                        and time.time() - (app.last_healthy_at or app.started_at) > STARTUP_GRACE):
+                    # 応答しなくなったプロセスは再起動する
+                    app.restarts += 1
+                    self._terminate(app)
+                    self._spawn(app)
+                    return
+            self._update_usage(app)
+
+    def _health_check(self, app):
+        for path in HEALTH_PATHS:
+            try:
+                with urllib.request.urlopen(f"{app.url()}{path}", timeout=1.0) as response:
+                    if response.status == 200:
+                        return True
+            except Exception:
+                continue
+        return False
+
+    def _update_usage(self, app):
+        try:
+            import psutil
+        except ImportError:
+            psutil = None
+
+        if psutil is not None:
+            try:
+                if app._ps_process is None:
+                    app._ps_process = psutil.Process(app.pid)
+                    app._ps_process.cpu_percent(None)
+                    return
+                app.rss_bytes = app._ps_process.memory_info().rss
+                app.cpu_percent = app._ps_process.cpu_percent(None)
+            except psutil.Error:
+                app._ps_process = None
+            return
+
+        rss, cpu_seconds = _read_proc_usage(app.pid)
+        if rss is None:
+            return
+        now = time.monotonic()
+        app.rss_bytes = rss
+        if app._cpu_sample is not None:
+            last_time, last_cpu = app._cpu_sample
+            app.cpu_percent = (cpu_seconds - last_cpu) / max(now - last_time, 1e-6) * 100
+        app._cpu_sample = (now, cpu_seconds)
+
+    def snapshot(self):
+        """
+        画面表示用に全アプリの状態を返します
+        """
+        with self._lock:
+            return [
+                {
+                    "name": app.name,
+                    "file": app.file,
+                    "status": app.status,
+                    "pid": app.pid,
+                    "port": app.port if app.running else None,
+                    "url": app.url() if app.running else None,
+                    "healthy": app.healthy,
+                    "rss_mb": app.rss_bytes / 1024**2 if app.rss_bytes else None,
+                    "cpu_percent": app.cpu_percent,
+                    "restarts": app.restarts,
+                    "uptime_s": time.time() - app.started_at if app.running else None,
+                    "last_exit_code": app.last_exit_code,
+                }
+                for app in self.apps.values()
+            ]
+
+
+def _kill_group(pid, sig):
+    try:
+        os.killpg(os.getpgid(pid), sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _read_cmdline(pid):
+    """
+    プロセスのコマンドラインを返します（/proc が無ければ ps で調べる。分からなければ None）
+    """
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        if os.path.isdir("/proc/self"):
+            # /proc があるのに無い = プロセスが終了している
+            return None
+    except OSError:
+        return None
+    try:
+        result = subprocess.run(["ps", "-p", str(int(pid)), "-o", "command="], capture_output=True, timeout=5)
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout if result.returncode == 0 and result.stdout.strip() else None
+
+
+def _is_streamlit_process(pid):
+    """
+    ランチャーが起動した子プロセス（streamlit run または ml_core.prewarm）なら True を返します
+
+    コマンドラインを確認できない場合は False を返します（PIDが別のプロセスに再利用されていると、
+    関係の無いプロセスグループを終了させてしまうため）。
+    """
+    cmdline = _read_cmdline(pid)
+    if cmdline is None:
+        return False
+    return b"streamlit" in cmdline or b"ml_core.prewarm" in cmdline
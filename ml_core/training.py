@@ -0,0 +1,280 @@
+"""
+アイリスモデルの学習と書き出し（オフライン）
+
+sklearn に同梱されたアイリスのデータでモデルを学習し、アプリが使うファイルを書き出します。
+ネットワークには接続しません。
+
+書き出すファイル（既定の出力先: ../iris/models）:
+    model_iris.pkl           float64 の配列を float32 に縮めた（予測が変わらない場合のみ）コンパクトな pickle
+    model_iris.joblib        メモリマップで読み込める形式（ml_core.loading）
+    model_iris.schema.json   特徴量・クラス名（ml_core.schema）に、学習の情報とベンチマーク結果を加えたもの
+
+ファイルは作業用のフォルダに書き出してベンチマークした後、サイドカーJSON、モデルの順に
+1つずつ置き換えるので、起動中のアプリのホットリロード（ml_core.hot_reload）が書きかけのファイルや
+新しいモデルに対応する前のサイドカーを読むことはありません。
+
+実行例:
+    python -m ml_core.training
+    python -m ml_core.training --search --n-jobs -1
+    python -m ml_core.training --grid grid.json --output-dir ../iris/models
+"""
+import argparse
+import copy
+import datetime
+import json
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ml_core import compiled, iris, loading, schema
+
+DEFAULT_OUTPUT_DIR = str(Path(loading.DEFAULT_MODEL_PATH).parent)
+MODEL_STEM = Path(loading.DEFAULT_MODEL_PATH).stem
+
+RANDOM_STATE = 0
+CV_FOLDS = 5
+
+IRIS_CLASS_NAMES = ["Setosa", "Versicolor", "Virginica"]
+
+# iris_streamlit_app.py のスライダーの初期値
+IRIS_DEFAULTS = [5.5, 3.0, 4.0, 1.0]
+
+# float32 に縮めたモデルが元のモデルと一致しているとみなす許容誤差（確率）
+SHRINK_TOLERANCE = 1e-4
+
+# ベンチマークで1行予測を繰り返す回数
+BENCH_CALLS = 200
+
+
+def default_grid():
+    """
+    --search で使う探索範囲（前処理つき Pipeline の clf を入れ替える）
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    return [
+        {"clf": [LogisticRegression(max_iter=1_000)], "clf__C": [0.1, 1.0, 10.0]},
+        {"clf": [RandomForestClassifier(random_state=RANDOM_STATE)],
+         "clf__n_estimators": [50, 100], "clf__max_depth": [None, 4]},
+        {"clf": [DecisionTreeClassifier(random_state=RANDOM_STATE)], "clf__max_depth": [3, 5, None]},
+        {"clf": [KNeighborsClassifier()], "clf__n_neighbors": [3, 5, 9]},
+    ]
+
+
+def load_grid(path):
+    """
+    JSONの探索範囲を読み込みます。"clf" には推定器のクラス名（例: "RandomForestClassifier"）を書きます
+
+    例: [{"clf": ["LogisticRegression"], "clf__C": [0.1, 1, 10]}]
+    """
+    from sklearn.utils import all_estimators
+
+    estimators = dict(all_estimators(type_filter="classifier"))
+    with open(path, encoding="utf-8") as f:
+        grid = json.load(f)
+    for params in grid:
+        params["clf"] = [estimators[name]() for name in params["clf"]]
+    return grid
+
+
+def train(grid=None, n_jobs=-1):
+    """
+    モデルを学習し、(モデル, 学習の情報) を返します
+
+    grid を渡すと、GridSearchCV で全ての組み合わせを n_jobs 個のCPUコアで並列に交差検証し、
+    最も良い組み合わせで学習し直したモデルを返します。
+    """
+    from sklearn.datasets import load_iris
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import GridSearchCV, cross_val_score
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    import sklearn
+
+    X, y = load_iris(return_X_y=True)
+    started = time.perf_counter()
+
+    if grid:
+        pipeline = Pipeline([("scaler", StandardScaler()), ("clf", LogisticRegression())])
+        search = GridSearchCV(pipeline, grid, cv=CV_FOLDS, n_jobs=n_jobs)
+        search.fit(X, y)
+        model = search.best_estimator_
+        cv_score = float(search.best_score_)
+        params = {k: (type(v).__name__ if k == "clf" else v) for k, v in search.best_params_.items()}
+        n_candidates = len(search.cv_results_["params"])
+    else:
+        model = LogisticRegression(max_iter=1_000)
+        cv_score = float(cross_val_score(model, X, y, cv=CV_FOLDS, n_jobs=n_jobs).mean())
+        model.fit(X, y)
+        params = model.get_params()
+        n_candidates = 1
+
+    info = {
+        "estimator": type(model).__name__ if not hasattr(model, "steps") else type(model.steps[-1][1]).__name__,
+        "params": json.loads(json.dumps(params, default=str)),
+        "cv_accuracy": cv_score,
+        "cv_folds": CV_FOLDS,
+        "candidates": n_candidates,
+        "n_samples": int(len(X)),
+        "training_seconds": time.perf_counter() - started,
+        "trained_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "sklearn": sklearn.__version__,
+        "random_state": RANDOM_STATE,
+    }
+    return model, info
+
+
+def _estimators(model):
+    """
+    モデルの中の推定器（Pipeline の各ステップ、アンサンブルの各木など）を全てたどります
+    """
+    stack = [model]
+    while stack:
+        obj = stack.pop()
+        if not hasattr(obj, "get_params"):
+            continue
+        yield obj
+        for value in vars(obj).values():
+            if hasattr(value, "get_params"):
+                stack.append(value)
+            elif isinstance(value, (list, tuple)):
+                for item in value:
+                    stack.extend(item[1:] if isinstance(item, tuple) else [item])
+
+
+def shrink_dtypes(model, probe_X, tolerance=SHRINK_TOLERANCE):
+    """
+    float64 の配列の属性を float32 にしたコピーを作り、probe_X での予測が変わらなければそれを返します
+
+    戻り値は (モデル, float32 にした属性名のリスト)。予測が変わる場合は元のモデルをそのまま返します。
+    """
+    shrunk = copy.deepcopy(model)
+    converted = []
+    for estimator in _estimators(shrunk):
+        for name, value in vars(estimator).items():
+            if isinstance(value, np.ndarray) and value.dtype == np.float64:
+                setattr(estimator, name, value.astype(np.float32))
+                converted.append(f"{type(estimator).__name__}.{name}")
+    if not converted:
+        return model, []
+
+    try:
+        same_labels = np.array_equal(model.predict(probe_X), shrunk.predict(probe_X))
+        if hasattr(model, "predict_proba"):
+            diff = np.abs(model.predict_proba(probe_X) - shrunk.predict_proba(probe_X)).max()
+            same_labels = same_labels and diff <= tolerance
+    except Exception:
+        return model, []
+    return (shrunk, converted) if same_labels else (model, [])
+
+
+def _atomic_write(path, write):
+    tmp_path = Path(f"{path}.tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_compact_pickle(model, path):
+    _atomic_write(path, lambda p: p.write_bytes(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)))
+
+
+def benchmark(model_paths, probe_X, n_calls=BENCH_CALLS):
+    """
+    書き出したファイルごとの読み込み時間と、1行予測・まとめて予測の時間を計測します
+    """
+    results = {}
+    for path in model_paths:
+        started = time.perf_counter()
+        model = loading.load_model_file(path)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        predict = model.predict_proba if hasattr(model, "predict_proba") else model.predict
+        row = probe_X[:1]
+        predict(row)
+        timings = np.empty(n_calls)
+        for i in range(n_calls):
+            started = time.perf_counter()
+            predict(row)
+            timings[i] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        predict(probe_X)
+        batch_seconds = time.perf_counter() - started
+
+        results[Path(path).suffix.lstrip(".")] = {
+            "file_bytes": os.path.getsize(path),
+            "load_ms": load_ms,
+            "single_row_p50_us": float(np.percentile(timings, 50) * 1e6),
+            "single_row_p99_us": float(np.percentile(timings, 99) * 1e6),
+            "rows_per_second": len(probe_X) / batch_seconds if batch_seconds > 0 else None,
+        }
+    return results
+
+
+def export(model, info, output_dir=DEFAULT_OUTPUT_DIR, stem=MODEL_STEM):
+    """
+    コンパクトな pickle、メモリマップ用の joblib、サイドカーJSONを書き出し、サイドカーの内容を返します
+    """
+    output_dir = Path(output_dir)
+    staging_dir = output_dir / f".{stem}.staging"
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    probe = compiled.make_probe(len(iris.IRIS_FEATURES), low=iris.IRIS_LOWS, high=iris.IRIS_HIGHS)
+
+    compact, converted = shrink_dtypes(model, probe)
+    pkl_path = staging_dir / f"{stem}.pkl"
+    joblib_path = staging_dir / f"{stem}{loading.MMAP_SUFFIXES[0]}"
+    save_compact_pickle(compact, pkl_path)
+    # メモリマップ用は元の精度のまま保存する（メモリマップされる配列はプロセス間で共有されるため）
+    loading.save_mmap_model(model, joblib_path)
+
+    sidecar = {
+        "features": [
+            {"name": name, "min": low, "max": high, "default": default, "step": iris.IRIS_STEP}
+            for name, low, high, default in zip(
+                iris.IRIS_FEATURE_NAMES, list(iris.IRIS_LOWS), list(iris.IRIS_HIGHS), IRIS_DEFAULTS
+            )
+        ],
+        "class_names": IRIS_CLASS_NAMES,
+        "classes": np.asarray(model.classes_).tolist(),
+        "training": {**info, "float32_attributes": converted},
+        "benchmark": benchmark([pkl_path, joblib_path], probe),
+    }
+    # サイドカーを先に置き換え、新しいモデルを読んだアプリが古いサイドカーを読まないようにする
+    _atomic_write(schema.sidecar_path(output_dir / pkl_path.name), lambda p: p.write_text(
+        json.dumps(sidecar, ensure_ascii=False, indent=2), encoding="utf-8"
+    ))
+    for path in (pkl_path, joblib_path):
+        os.replace(path, output_dir / path.name)
+    staging_dir.rmdir()
+    return sidecar
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="同梱のアイリスデータでモデルを学習し、アプリ用のファイルを書き出します")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="書き出し先のフォルダ")
+    parser.add_argument("--search", action="store_true", help="既定の探索範囲でハイパーパラメータを探索する")
+    parser.add_argument("--grid", help="探索範囲のJSONファイル")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="並列に学習するCPUコア数（-1: 全コア）")
+    args = parser.parse_args(argv)
+
+    grid = load_grid(args.grid) if args.grid else (default_grid() if args.search else None)
+    model, info = train(grid, n_jobs=args.n_jobs)
+    sidecar = export(model, info, args.output_dir)
+
+    print(f"✅ {info['estimator']}（交差検証の正解率 {info['cv_accuracy']:.3f}、候補 {info['candidates']}個、"
+          f"{info['training_seconds']:.1f}秒）", file=sys.stderr)
+    for fmt, result in sidecar["benchmark"].items():
+        print(f"  {fmt}: {result['file_bytes'] / 1024:.1f} KB / 読み込み {result['load_ms']:.1f} ms"
+              f" / 1行予測 p50 {result['single_row_p50_us']:.0f} µs", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
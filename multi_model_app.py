@@ -1,11 +1,17 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import pickle
-import os
+import time
 from pathlib import Path
-import plotly.express as px
-import plotly.graph_objects as go
+
+from ml_core import (
+    batching, compare, compiled, explain, iris, isolation, lazy, model_cache, prediction_cache, prediction_log, profiling, registry,
+    schema
+)
+
+# 使う場面が限られる重いライブラリは、最初に使うときまで import しない
+pd = lazy.lazy_import("pandas")
+px = lazy.lazy_import("plotly.express")
+batch = lazy.lazy_import("ml_core.batch")
 
 st.set_page_config(
     page_title="汎用ML予測アプリ",
@@ -13,6 +19,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# 処理時間の計測（環境変数 ML_PROFILE=1 のときだけ有効）
+prof = profiling.start_rerun("multi_model_app")
+
 st.title("🤖 汎用機械学習予測アプリ")
 st.markdown("複数のプロジェクトのモデルを使って予測ができます")
 
@@ -20,25 +29,26 @@ st.markdown("複数のプロジェクトのモデルを使って予測ができ
 st.sidebar.header("📁 プロジェクト選択")
 
 # 利用可能なプロジェクトを検索
-projects_dir = Path("../")
-available_projects = []
-
-for project_path in projects_dir.iterdir():
-    if project_path.is_dir() and (project_path / "models").exists():
-        models_dir = project_path / "models"
-        pkl_files = list(models_dir.glob("*.pkl"))
-        if pkl_files:
-            available_projects.append({
-                "name": project_path.name,
-                "path": project_path,
-                "models": pkl_files
-            })
+@st.cache_resource
+def get_model_registry():
+    # 全セッションで共有するインデックス（更新時刻が変わったフォルダだけを再走査）
+    index = registry.ModelRegistry(Path("../"))
+    index.start_watching()
+    return index
+
+with prof.stage("discovery"):
+    model_registry = get_model_registry()
+    available_projects = model_registry.projects()
 
 if not available_projects:
     st.error("利用可能なプロジェクト/モデルが見つかりません")
-    st.info("MLProjectsフォルダ内にmodels/フォルダと.pklファイルがあるプロジェクトを作成してください")
+    st.info("MLProjectsフォルダ内にmodels/フォルダと.pkl（または.joblib）ファイルがあるプロジェクトを作成してください")
     st.stop()
 
+if st.sidebar.button("🔄 モデル一覧を再読み込み"):
+    model_registry.refresh(force=True)
+    available_projects = model_registry.projects()
+
 # プロジェクト選択
 project_names = [p["name"] for p in available_projects]
 selected_project_name = st.sidebar.selectbox("プロジェクトを選択", project_names)
@@ -53,20 +63,43 @@ selected_model_name = st.sidebar.selectbox("モデルを選択", model_names)
 selected_model_path = selected_project["path"] / "models" / selected_model_name
 
 # モデルを読み込み
-@st.cache_resource
+# 全セッションで共有するメモリ上限つきキャッシュ（上限を超えたら使われていないモデルから破棄）
+cache = model_cache.shared_cache()
+
+# 分離モードでは、モデルの読み込みと予測をワーカープロセスで行う（遅い・壊れたモデルでもサーバーが止まらない）
+use_isolation = st.sidebar.toggle(
+    "🛡️ 別プロセスでモデルを実行",
+    value=isolation.isolation_enabled(),
+    help="信頼できないモデルや遅いモデルを、タイムアウトとメモリ上限つきのワーカープロセスで動かします"
+)
+model_loader = isolation.shared_pool().model if use_isolation else cache.get
+
 def load_model(model_path):
     try:
-        with open(model_path, 'rb') as f:
-            return pickle.load(f)
+        return model_loader(model_path)
     except Exception as e:
         st.error(f"モデルの読み込みに失敗しました: {e}")
         return None
 
-model = load_model(selected_model_path)
+with prof.stage("load_model"):
+    model = load_model(selected_model_path)
 
 if model is None:
     st.stop()
 
+# 入力スキーマ（特徴量とクラス名）はモデルと一緒にキャッシュする
+@st.cache_resource
+def get_model_schema(model_path, _model, model_version):
+    # サイドカーJSONが壊れていてもページは止めず、モデルの属性から作ったスキーマを使う
+    try:
+        return schema.load_schema(model_path, _model), None
+    except (ValueError, KeyError, TypeError) as e:
+        return schema.schema_from_model(_model), f"{schema.sidecar_path(model_path).name} を読み込めませんでした: {e}"
+
+model_schema, schema_error = get_model_schema(str(selected_model_path), model, model_cache.model_version(model))
+if schema_error:
+    st.warning(f"⚠️ {schema_error}（モデルの情報から特徴量を決めます）")
+
 st.success(f"✅ プロジェクト: {selected_project_name}")
 st.success(f"✅ モデル: {selected_model_name}")
 
@@ -79,19 +112,47 @@ with col1:
     if selected_project_name.lower() == "iris":
         # Iris専用の入力
         st.markdown("**🌸 Iris花の特徴量**")
-        sepal_length = st.slider("がく片の長さ (cm)", 4.0, 8.0, 5.5)
-        sepal_width = st.slider("がく片の幅 (cm)", 2.0, 4.5, 3.0)
-        petal_length = st.slider("花びらの長さ (cm)", 1.0, 7.0, 4.0)
-        petal_width = st.slider("花びらの幅 (cm)", 0.1, 2.5, 1.0)
+        # iris_streamlit_app.py と同じ0.1cm刻み（予測キャッシュの格子と一致させる）
+        sepal_length = st.slider("がく片の長さ (cm)", 4.0, 8.0, 5.5, step=iris.IRIS_STEP)
+        sepal_width = st.slider("がく片の幅 (cm)", 2.0, 4.5, 3.0, step=iris.IRIS_STEP)
+        petal_length = st.slider("花びらの長さ (cm)", 1.0, 7.0, 4.0, step=iris.IRIS_STEP)
+        petal_width = st.slider("花びらの幅 (cm)", 0.1, 2.5, 1.0, step=iris.IRIS_STEP)
         
         input_data = np.array([[sepal_length, sepal_width, petal_length, petal_width]])
         feature_names = ["がく片の長さ", "がく片の幅", "花びらの長さ", "花びらの幅"]
         values = [sepal_length, sepal_width, petal_length, petal_width]
         
         class_names = ["Setosa", "Versicolor", "Virginica"]
+        input_errors = []
+        
+    elif model_schema is not None:
+        # スキーマ（サイドカーJSONまたはモデルの属性）から入力フォームを作る
+        st.markdown(f"**⚙️ {selected_project_name}プロジェクトの特徴量**")
+        st.caption(f"入力項目の定義: {model_schema.source}")
+        
+        input_values = []
+        for i, feature in enumerate(model_schema.features):
+            low = feature.get("min")
+            high = feature.get("max")
+            default = feature.get("default", low if low is not None else 0.0)
+            input_values.append(st.number_input(
+                feature["name"],
+                min_value=float(low) if low is not None else None,
+                max_value=float(high) if high is not None else None,
+                value=float(default),
+                step=float(feature.get("step", 0.1)),
+                key=f"feature_{selected_model_path}_{i}"
+            ))
+        
+        input_data = np.array([input_values])
+        feature_names = model_schema.names
+        values = input_values
+        class_names = model_schema.class_labels(len(getattr(model, "classes_", [])) or 3)
+        # 全特徴量の範囲チェックを1回でまとめて行う
+        input_errors = model_schema.validate(input_data)
         
     else:
-        # 汎用的な入力（他のプロジェクト用）
+        # 汎用的な入力（特徴量の数が分からないモデル用）
         st.markdown(f"**⚙️ {selected_project_name}プロジェクトの特徴量**")
         
         # 特徴量の数を推定（仮で4つ）
@@ -110,15 +171,41 @@ with col1:
         input_data = np.array([input_values])
         values = input_values
         class_names = ["クラス0", "クラス1", "クラス2"]  # デフォルト
+        input_errors = []
+
+    for error in input_errors:
+        st.error(f"❌ {error}")
 
     # 予測実行
-    if st.button("🎯 予測実行", type="primary"):
+    if st.button("🎯 予測実行", type="primary", disabled=bool(input_errors)):
         try:
-            prediction = model.predict(input_data)[0]
-            
             # 確率予測（可能な場合）
             if hasattr(model, 'predict_proba'):
-                prediction_proba = model.predict_proba(input_data)[0]
+                predict_started = time.perf_counter()
+                with prof.stage("predict"):
+                    # Irisは入力が0.1cm刻みなので、同じ入力の予測結果はキャッシュから返す
+                    cached = None
+                    if selected_project_name.lower() == "iris":
+                        iris_results = prediction_cache.shared_iris_cache()
+                        iris_key = prediction_cache.model_key(selected_model_path, model)
+                        cached = iris_results.get(iris_key, input_data[0])
+                    
+                    if cached is not None:
+                        prediction, prediction_proba = cached
+                    else:
+                        # 他のセッションの予測とまとめて1回の predict_proba で処理し、予測クラスは確率から求める
+                        batcher = batching.get_batcher(selected_model_path, model)
+                        predictions, probabilities = batcher.predict_proba(input_data)
+                        prediction = predictions[0]
+                        prediction_proba = probabilities[0]
+                        if selected_project_name.lower() == "iris":
+                            iris_results.put(iris_key, input_data[0], prediction, prediction_proba)
+                
+                # 予測ログ（キューに入れるだけで、ディスクへの書き込みは待たない）
+                prediction_log.log_prediction(
+                    "multi_model_app", selected_model_path, input_data[0], prediction, prediction_proba,
+                    (time.perf_counter() - predict_started) * 1000
+                )
                 
                 with col2:
                     st.subheader("📈 予測結果")
@@ -126,6 +213,8 @@ with col1:
                     if selected_project_name.lower() == "iris":
                         predicted_class = class_names[prediction]
                         st.success(f"予測クラス: **{predicted_class}**")
+                    elif model_schema is not None and model_schema.class_names:
+                        st.success(f"予測クラス: **{model_schema.label_for(model, prediction)}**")
                     else:
                         st.success(f"予測値: **{prediction}**")
                     
@@ -138,14 +227,54 @@ with col1:
                             st.progress(prob)
                         
                         # 確率の可視化
+                        with prof.stage("plot"):
+                            fig = px.bar(
+                                x=class_names[:len(prediction_proba)],
+                                y=prediction_proba,
+                                title="クラス別確率",
+                                labels={'x': 'クラス', 'y': '確率'}
+                            )
+                            st.plotly_chart(fig, use_container_width=True)
+                    
+                    # 特徴量ごとの寄与（オクルージョンの場合も predict_proba は1回だけ）
+                    with prof.stage("explain"):
+                        if selected_project_name.lower() == "iris":
+                            background = compiled.make_probe(
+                                4, low=iris.IRIS_LOWS, high=iris.IRIS_HIGHS, n_rows=explain.DEFAULT_BACKGROUND_ROWS
+                            )
+                        elif (model_schema is not None and np.isfinite(model_schema.lows).all()
+                                and np.isfinite(model_schema.highs).all()):
+                            background = compiled.make_probe(
+                                model_schema.n_features, low=model_schema.lows, high=model_schema.highs,
+                                n_rows=explain.DEFAULT_BACKGROUND_ROWS
+                            )
+                        else:
+                            background = None
+                        explanation = explain.explain(model, input_data[0], background)
+                    
+                    if explanation is not None:
+                        target_index = int(np.argmax(prediction_proba))
+                        st.markdown("**🔍 特徴量ごとの寄与**")
+                        st.caption(f"{explanation.method}（単位: {explanation.unit}、予測クラスに対する寄与）")
+                        contributions = explanation.for_class(target_index)
                         fig = px.bar(
-                            x=class_names[:len(prediction_proba)],
-                            y=prediction_proba,
-                            title="クラス別確率",
-                            labels={'x': 'クラス', 'y': '確率'}
+                            x=contributions,
+                            y=feature_names[:len(contributions)],
+                            orientation="h",
+                            color=np.where(contributions >= 0, "予測を後押し", "予測を妨げる"),
+                            color_discrete_map={"予測を後押し": "#2ca02c", "予測を妨げる": "#d62728"},
+                            labels={'x': f'寄与（{explanation.unit}）', 'y': '特徴量', 'color': ''}
                         )
                         st.plotly_chart(fig, use_container_width=True)
             else:
+                predict_started = time.perf_counter()
+                with prof.stage("predict"):
+                    prediction = model.predict(input_data)[0]
+                prediction_log.log_prediction(
+                    "multi_model_app", selected_model_path, input_data[0], prediction, None,
+                    (time.perf_counter() - predict_started) * 1000
+                )
+                
                 with col2:
                     st.subheader("📈 予測結果")
                     st.success(f"予測値: **{prediction}**")
@@ -153,12 +282,102 @@ with col1:
         except Exception as e:
             st.error(f"予測中にエラーが発生しました: {e}")
 
+# モデル比較モード（同じ入力を複数のモデルで同時に予測して比べる）
+if st.sidebar.toggle("🆚 モデル比較モード", value=False):
+    st.subheader("🆚 モデル比較")
+    compare_names = st.multiselect("比較するモデル", model_names, default=model_names[:10])
+    compare_source = st.radio("比較に使う入力", ["現在の入力", "ファイル（CSV/Parquet）"], horizontal=True)
+    
+    compare_X = None
+    if compare_source == "現在の入力":
+        if input_errors:
+            st.warning("入力値に誤りがあるため比較できません")
+        else:
+            compare_X = input_data
+    else:
+        compare_file = st.file_uploader("測定データファイル", type=["csv", "parquet"], key="compare_file")
+        if compare_file is not None:
+            try:
+                file_columns = batch.read_columns(compare_file, compare_file.name)
+            except Exception as e:
+                st.error(f"ファイルを読み込めませんでした: {e}")
+                file_columns = []
+            if file_columns:
+                default_columns = [c for c in feature_names if c in file_columns] or file_columns[:len(feature_names)]
+                compare_columns = st.multiselect("特徴量の列（モデルが期待する順番）", file_columns, default=default_columns)
+                if compare_columns:
+                    first_chunk = next(batch.iter_chunks(
+                        compare_file, compare_file.name, columns=compare_columns, chunk_rows=compare.MAX_FILE_ROWS
+                    ), None)
+                    if first_chunk is not None:
+                        compare_X = first_chunk[compare_columns].to_numpy(dtype=np.float64)
+                        st.caption(f"先頭の{len(compare_X):,}行で比較します")
+    
+    if st.button("🆚 比較を実行", disabled=compare_X is None or not compare_names):
+        compare_paths = [selected_project["path"] / "models" / name for name in compare_names]
+        with st.spinner(f"{len(compare_paths)}個のモデルを並列に読み込んで予測しています..."):
+            with prof.stage("compare"):
+                compare_results, compare_seconds = compare.compare_models(compare_paths, compare_X, model_loader)
+        
+        for result in compare_results:
+            if result.error:
+                st.error(f"{result.name}: {result.error}")
+        ok_results = [r for r in compare_results if r.ok]
+        
+        if ok_results:
+            serial_ms = sum((r.load_ms or 0) + (r.predict_ms or 0) for r in compare_results)
+            agree_rate = compare.all_agree_rate(compare_results)
+            metric_col1, metric_col2, metric_col3 = st.columns(3)
+            metric_col1.metric("全体の処理時間", f"{compare_seconds * 1000:.0f} ms")
+            metric_col2.metric("順番に処理した場合の合計", f"{serial_ms:.0f} ms")
+            metric_col3.metric("全モデルの予測が一致", f"{agree_rate:.1%}")
+            
+            # モデルごとの結果とレイテンシ
+            summary = pd.DataFrame({
+                "モデル": [r.name for r in ok_results],
+                "読み込み (ms)": [round(r.load_ms, 1) for r in ok_results],
+                "予測 (ms)": [round(r.predict_ms, 1) for r in ok_results],
+            })
+            if len(compare_X) == 1:
+                summary["予測"] = [str(r.labels[0]) for r in ok_results]
+                for r in ok_results:
+                    if r.proba is not None:
+                        for class_value, prob in zip(r.classes, r.proba[0]):
+                            summary.loc[summary["モデル"] == r.name, f"確率 {class_value}"] = round(float(prob), 4)
+            st.dataframe(summary, use_container_width=True, hide_index=True)
+            
+            if len(compare_X) == 1:
+                proba_rows = [
+                    {"モデル": r.name, "クラス": str(c), "確率": float(p)}
+                    for r in ok_results if r.proba is not None
+                    for c, p in zip(r.classes, r.proba[0])
+                ]
+                if proba_rows:
+                    fig = px.bar(pd.DataFrame(proba_rows), x="クラス", y="確率", color="モデル",
+                                 barmode="group", title="モデル別のクラス確率")
+                    st.plotly_chart(fig, use_container_width=True)
+            
+            if len(ok_results) > 1:
+                matrix_col1, matrix_col2 = st.columns(2)
+                with matrix_col1:
+                    names, agreement = compare.agreement_matrix(compare_results)
+                    fig = px.imshow(agreement, x=names, y=names, zmin=0, zmax=1, text_auto=".0%",
+                                    color_continuous_scale="Greens", title="予測の一致率")
+                    st.plotly_chart(fig, use_container_width=True)
+                with matrix_col2:
+                    names, gaps = compare.probability_gaps(compare_results)
+                    if len(names) > 1:
+                        fig = px.imshow(gaps, x=names, y=names, zmin=0, text_auto=".3f",
+                                        color_continuous_scale="Reds", title="確率の差（行ごとの最大差の平均）")
+                        st.plotly_chart(fig, use_container_width=True)
+
 # 入力データの表示
 with st.expander("📋 入力データ詳細"):
-    input_df = pd.DataFrame({
-        '特徴量': feature_names,
-        '値': values
-    })
+    with prof.stage("input_df"):
+        input_df = pd.DataFrame({
+            '特徴量': feature_names,
+            '値': values
+        })
     st.dataframe(input_df, use_container_width=True)
 
 # プロジェクト情報
@@ -168,6 +387,59 @@ with st.expander(f"📚 {selected_project_name}プロジェクト情報"):
     for model_file in selected_project["models"]:
         st.write(f"- {model_file.name}")
 
+# モデルキャッシュの統計
+def toggle_pin(model_path, widget_key):
+    # チェックが変わったときだけ共有のピン留め状態を変える（再実行のたびには書き換えない）
+    if st.session_state[widget_key]:
+        cache.pin(model_path)
+    else:
+        cache.unpin(model_path)
+
+with st.sidebar.expander("🗄️ モデルキャッシュ"):
+    pin_key = f"pin_{selected_model_path}"
+    st.checkbox(
+        "このモデルを常にメモリに残す（ピン留め）",
+        value=cache.is_pinned(selected_model_path),
+        key=pin_key,
+        on_change=toggle_pin,
+        args=(selected_model_path, pin_key)
+    )
+
+    cache_stats = cache.stats()
+    st.write(f"ヒット: {cache_stats['hits']:,} / ミス: {cache_stats['misses']:,} / 破棄: {cache_stats['evictions']:,}")
+    st.write(
+        f"使用量: {cache_stats['current_bytes'] / 1024**2:.1f} MB"
+        f" / 上限 {cache_stats['max_bytes'] / 1024**2:.0f} MB"
+        f"（{cache_stats['entries']}モデル、ピン留め {cache_stats['pinned']}）"
+    )
+    for path, size in cache_stats["models"].items():
+        st.write(f"- {Path(path).name}: {size / 1024**2:.2f} MB")
+
+# バッチ予測の統計
+batch_metrics = batching.all_metrics()
+if batch_metrics:
+    with st.sidebar.expander("⚡ バッチ予測の統計"):
+        for path, metrics in batch_metrics.items():
+            st.markdown(f"**{Path(path).name}**")
+            st.write(f"バッチ数: {metrics['total_batches']:,} / 予測行数: {metrics['total_rows']:,}")
+            st.write(f"平均バッチサイズ: {metrics['mean_batch_size']:.1f}（最大 {metrics['max_batch_size']}）")
+            st.write(f"キュー待ち: 平均 {metrics['mean_queue_wait_ms']:.2f} ms / p95 {metrics['p95_queue_wait_ms']:.2f} ms")
+
+# ワーカープロセスの状態
+if use_isolation:
+    with st.sidebar.expander("🛡️ ワーカープロセス"):
+        pool_stats = isolation.shared_pool().stats()
+        st.write(f"ワーカー: {pool_stats['alive']}/{pool_stats['workers']}（待機中 {pool_stats['idle']}）")
+        st.write(f"呼び出し: {pool_stats['calls']:,} / エラー: {pool_stats['errors']:,}")
+        st.write(
+            f"タイムアウト: {pool_stats['timeouts']:,} / 異常終了: {pool_stats['crashes']:,}"
+            f" / 再起動: {pool_stats['restarts']:,}"
+        )
+
+# 処理時間（デバッグ）
+profiling.sidebar_panel(prof)
+
 # フッター
 st.markdown("---")
-st.markdown("🚀 **汎用ML予測アプリ** - 複数プロジェクトの機械学習モデルを統合管理")
\ No newline at end of file
+st.markdown("🚀 **汎用ML予測アプリ** - 複数プロジェクトの機械学習モデルを統合管理")
+prof.finish()
\ No newline at end of file
@@ -1,9 +1,17 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
+import io
+import random
 from datetime import datetime
-from PIL import Image, ImageDraw
+
+from ml_core import lazy, profiling
+
+# 重いライブラリは、そのページで最初に使うときまで import しない
+pd = lazy.lazy_import("pandas")
+np = lazy.lazy_import("numpy")
+px = lazy.lazy_import("plotly.express")
+Image = lazy.lazy_import("PIL.Image")  # 🖼️ 画像操作 ページのみ
+ImageDraw = lazy.lazy_import("PIL.ImageDraw")  # 🖼️ 画像操作 ページのみ
+images = lazy.lazy_import("ml_core.images")  # 🖼️ 画像操作 ページのみ
 
 st.set_page_config(
     page_title="🧪 Streamlit軽量テストアプリ",
@@ -11,6 +19,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# 処理時間の計測（環境変数 ML_PROFILE=1 のときだけ有効）
+prof = profiling.start_rerun("streamlit_test_app")
+
 st.title("🧪 Streamlit軽量テストアプリ")
 st.markdown("基本的なStreamlit機能を試すためのアプリです")
 
@@ -20,20 +31,69 @@ feature = st.sidebar.selectbox(
     "試したい機能を選択",
     ["📊 表とグラフ", "🖼️ 画像操作", "🎛️ 入力要素", "📱 レイアウト", "🎨 スタイル"]
 )
+prof.checkpoint("sidebar")
+
 
 # ====================
-# 📊 表とグラフ
+# キャッシュ（入力が同じなら結果も同じ内容は、再実行のたびに作り直さない）
 # ====================
-if feature == "📊 表とグラフ":
-    st.header("📊 表とグラフのテスト")
-    
-    # サンプルデータ作成
-    data = pd.DataFrame({
+@st.cache_data
+def get_sample_data():
+    return pd.DataFrame({
         '商品': ['商品A', '商品B', '商品C', '商品D', '商品E'],
         '売上': [1200, 800, 1500, 600, 2000],
         '利益': [300, 200, 450, 150, 600],
         '評価': [4.2, 3.8, 4.5, 3.5, 4.8]
     })
+
+
+@st.cache_data
+def get_sales_figure(graph_type):
+    """
+    グラフの種類ごとに Plotly の図を作り、描画用の dict（図の定義）として返します
+    """
+    data = get_sample_data()
+    if graph_type == "棒グラフ":
+        fig = px.bar(data, x='商品', y='売上', title="商品別売上")
+    elif graph_type == "折れ線グラフ":
+        fig = px.line(data, x='商品', y='売上', title="売上推移")
+    elif graph_type == "散布図":
+        fig = px.scatter(data, x='売上', y='利益', title="売上 vs 利益")
+    else:
+        fig = px.pie(data, values='売上', names='商品', title="売上構成")
+    return fig.to_dict()
+
+
+@st.cache_data
+def get_random_frame(rows, columns, seed):
+    """
+    シード付きの乱数で作った表（同じシードなら同じ内容なのでキャッシュできる）
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.standard_normal((rows, len(columns))), columns=list(columns))
+
+
+@st.cache_data(max_entries=16)
+def analyze_upload(digest, _data):
+    """
+    アップロード画像のプレビューと統計（画像の内容のハッシュごとにキャッシュ）
+    """
+    return images.analyze(_data)
+
+
+def to_png(img):
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+# ====================
+# 📊 表とグラフ
+# ====================
+if feature == "📊 表とグラフ":
+    st.header("📊 表とグラフのテスト")
+    
+    # サンプルデータ作成
+    data = get_sample_data()
     
     col1, col2 = st.columns(2)
     
@@ -53,21 +113,8 @@ if feature == "📊 表とグラフ":
         
         graph_type = st.selectbox("グラフの種類", ["棒グラフ", "折れ線グラフ", "散布図", "円グラフ"])
         
-        if graph_type == "棒グラフ":
-            fig = px.bar(data, x='商品', y='売上', title="商品別売上")
-            st.plotly_chart(fig, use_container_width=True)
-        
-        elif graph_type == "折れ線グラフ":
-            fig = px.line(data, x='商品', y='売上', title="売上推移")
-            st.plotly_chart(fig, use_container_width=True)
-        
-        elif graph_type == "散布図":
-            fig = px.scatter(data, x='売上', y='利益', title="売上 vs 利益")
-            st.plotly_chart(fig, use_container_width=True)
-        
-        elif graph_type == "円グラフ":
-            fig = px.pie(data, values='売上', names='商品', title="売上構成")
-            st.plotly_chart(fig, use_container_width=True)
+        # 図の定義はグラフの種類ごとにキャッシュ済み
+        st.plotly_chart(get_sales_figure(graph_type), use_container_width=True)
 
 # ====================
 # 🖼️ 画像操作
@@ -75,7 +122,8 @@ if feature == "📊 表とグラフ":
 elif feature == "🖼️ 画像操作":
     st.header("🖼️ 画像操作のテスト")
     
-    # 画像生成関数
+    # 画像生成関数（PNGにエンコードした結果をキャッシュ）
+    @st.cache_data
     def create_sample_image():
         img = Image.new('RGB', (400, 300), color='lightblue')
         draw = ImageDraw.Draw(img)
@@ -85,15 +133,16 @@ elif feature == "🖼️ 画像操作":
         draw.ellipse([100, 100, 300, 200], fill='yellow', outline='orange', width=2)
         draw.text((180, 140), "Streamlit", fill='black')
         
-        return img
+        return to_png(img)
     
-    # ランダム画像生成
-    def create_random_image():
-        import random
+    # ランダム画像生成（シードごとにキャッシュ。同じシードなら同じ画像）
+    @st.cache_data(max_entries=32)
+    def create_random_image(seed):
+        rng = random.Random(seed)
         
         # ランダムな背景色
         bg_colors = ['lightblue', 'lightgreen', 'lightpink', 'lightyellow', 'lavender']
-        bg_color = random.choice(bg_colors)
+        bg_color = rng.choice(bg_colors)
         
         img = Image.new('RGB', (400, 300), color=bg_color)
         draw = ImageDraw.Draw(img)
@@ -102,14 +151,14 @@ elif feature == "🖼️ 画像操作":
         shape_colors = ['red', 'blue', 'green', 'purple', 'orange', 'pink']
         
         # ランダムな図形を複数描画
-        for i in range(random.randint(2, 5)):
-            x1 = random.randint(0, 300)
-            y1 = random.randint(0, 200)
-            x2 = x1 + random.randint(50, 100)
-            y2 = y1 + random.randint(50, 100)
-            color = random.choice(shape_colors)
+        for i in range(rng.randint(2, 5)):
+            x1 = rng.randint(0, 300)
+            y1 = rng.randint(0, 200)
+            x2 = x1 + rng.randint(50, 100)
+            y2 = y1 + rng.randint(50, 100)
+            color = rng.choice(shape_colors)
             
-            shape_type = random.choice(['rectangle', 'ellipse'])
+            shape_type = rng.choice(['rectangle', 'ellipse'])
             if shape_type == 'rectangle':
                 draw.rectangle([x1, y1, x2, y2], fill=color, outline='black', width=2)
             else:
@@ -117,12 +166,28 @@ elif feature == "🖼️ 画像操作":
         
         # ランダムなテキスト
         texts = ['Streamlit', 'Python', 'Random', 'Test', 'Fun!']
-        text = random.choice(texts)
-        text_x = random.randint(50, 300)
-        text_y = random.randint(50, 250)
+        text = rng.choice(texts)
+        text_x = rng.randint(50, 300)
+        text_y = rng.randint(50, 250)
         draw.text((text_x, text_y), text, fill='black')
         
-        return img
+        return to_png(img)
+    
+    # アート風ランダム画像（シードごとにキャッシュ）
+    @st.cache_data(max_entries=32)
+    def create_art_image(seed):
+        rng = random.Random(seed)
+        img = Image.new('RGB', (400, 300), color='black')
+        draw = ImageDraw.Draw(img)
+        
+        # ランダムな線を描画
+        for _ in range(20):
+            x1, y1 = rng.randint(0, 400), rng.randint(0, 300)
+            x2, y2 = rng.randint(0, 400), rng.randint(0, 300)
+            color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+            draw.line([x1, y1, x2, y2], fill=color, width=rng.randint(1, 5))
+        
+        return to_png(img)
     
     col1, col2 = st.columns(2)
     
@@ -133,48 +198,51 @@ elif feature == "🖼️ 画像操作":
         
         st.subheader("🎲 ランダム画像生成")
         if st.button("🔄 新しいランダム画像を生成", key="random_img"):
-            st.session_state.random_image = create_random_image()
+            st.session_state.random_seed = random.randrange(2**32)
         
-        # セッションステートで画像を保持
-        if 'random_image' not in st.session_state:
-            st.session_state.random_image = create_random_image()
+        # セッションステートにはシードだけを保持（画像はシードごとにキャッシュ）
+        if 'random_seed' not in st.session_state:
+            st.session_state.random_seed = 0
         
-        st.image(st.session_state.random_image, caption="ランダム生成画像")
+        st.image(create_random_image(st.session_state.random_seed), caption="ランダム生成画像")
         
         if st.button("🎨 アート風ランダム画像", key="art_img"):
             # より芸術的なランダム画像
-            import random
-            img = Image.new('RGB', (400, 300), color='black')
-            draw = ImageDraw.Draw(img)
-            
-            # ランダムな線を描画
-            for _ in range(20):
-                x1, y1 = random.randint(0, 400), random.randint(0, 300)
-                x2, y2 = random.randint(0, 400), random.randint(0, 300)
-                color = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
-                draw.line([x1, y1, x2, y2], fill=color, width=random.randint(1, 5))
-            
-            st.session_state.art_image = img
+            st.session_state.art_seed = random.randrange(2**32)
         
-        if 'art_image' in st.session_state:
-            st.image(st.session_state.art_image, caption="アート風ランダム画像")
+        if 'art_seed' in st.session_state:
+            st.image(create_art_image(st.session_state.art_seed), caption="アート風ランダム画像")
     
     with col2:
         st.subheader("📸 画像アップロード")
         uploaded_file = st.file_uploader("画像をアップロード", type=['png', 'jpg', 'jpeg'])
         
         if uploaded_file:
-            image = Image.open(uploaded_file)
-            st.image(image, caption="アップロードされた画像")
+            # 縮小デコードしたプレビューとタイルごとの統計（同じ画像なら再計算しない）
+            image_data = uploaded_file.getvalue()
+            try:
+                image_info = analyze_upload(images.content_hash(image_data), image_data)
+            except Exception as e:
+                st.error(f"❌ 画像を読み込めませんでした: {e}")
+                image_info = None
             
-            # 画像情報
-            st.write(f"**サイズ**: {image.size}")
-            st.write(f"**モード**: {image.mode}")
-            
-            # 画像の統計情報
-            img_array = np.array(image)
-            if len(img_array.shape) == 3:
-                st.write(f"**平均色 (RGB)**: {img_array.mean(axis=(0,1)).astype(int)}")
+            if image_info is not None:
+                st.image(image_info["preview"], caption="アップロードされた画像（縮小プレビュー）")
+                
+                # 画像情報
+                st.write(f"**サイズ**: {image_info['size']}")
+                st.write(f"**モード**: {image_info['mode']}")
+                st.write(f"**形式**: {image_info['format']}（{image_info['bytes'] / 1024**2:.1f} MB）")
+                
+                # 画像の統計情報
+                channels = "".join(image_info["channels"])
+                st.write(f"**平均色 ({channels})**: {image_info['mean'].astype(int)}")
+                st.write(f"**標準偏差 ({channels})**: {image_info['std'].round(1)}")
+                st.write(f"**最小 / 最大**: {image_info['min']} / {image_info['max']}")
+                if image_info["stats_scale"] > 1:
+                    st.caption(f"統計は 1/{image_info['stats_scale']:.0f} に縮小してデコードした画像で計算しています")
+                
+                st.line_chart(pd.DataFrame(image_info["histogram"].T, columns=image_info["channels"]))
         
         st.subheader("🎨 画像生成のコツ")
         with st.expander("画像生成について"):
@@ -252,12 +320,12 @@ elif feature == "📱 レイアウト":
     
     with tab1:
         st.write("**データタブの内容**")
-        sample_data = pd.DataFrame(np.random.randn(5, 3), columns=['A', 'B', 'C'])
+        sample_data = get_random_frame(5, ('A', 'B', 'C'), seed=1)
         st.dataframe(sample_data)
     
     with tab2:
         st.write("**グラフタブの内容**")
-        chart_data = pd.DataFrame(np.random.randn(20, 3), columns=['a', 'b', 'c'])
+        chart_data = get_random_frame(20, ('a', 'b', 'c'), seed=2)
         st.line_chart(chart_data)
     
     with tab3:
@@ -270,7 +338,7 @@ elif feature == "📱 レイアウト":
     
     with col1:
         st.info("幅2のカラム")
-        st.bar_chart(np.random.randn(10, 1))
+        st.bar_chart(get_random_frame(10, ('値',), seed=3))
     
     with col2:
         st.success("幅1のカラム")
@@ -341,4 +409,9 @@ def calculate_total(items):
 
 # フッター
 st.markdown("---")
-st.markdown("🧪 **Streamlit軽量テストアプリ** - 基本機能のテスト用")
\ No newline at end of file
+st.markdown("🧪 **Streamlit軽量テストアプリ** - 基本機能のテスト用")
+
+# 処理時間（デバッグ）
+prof.checkpoint(f"page:{feature}")
+profiling.sidebar_panel(prof)
+prof.finish()
\ No newline at end of file
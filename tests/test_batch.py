@@ -0,0 +1,85 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+from sklearn.datasets import load_iris
+from sklearn.linear_model import LogisticRegression
+
+from ml_core import batch
+
+FEATURES = ["a", "b", "c", "d"]
+
+
+@pytest.fixture(scope="module")
+def model():
+    X, y = load_iris(return_X_y=True)
+    return LogisticRegression(max_iter=1_000).fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def frame():
+    X, _ = load_iris(return_X_y=True)
+    return pd.DataFrame(X, columns=FEATURES).assign(id=range(len(X)))
+
+
+def test_detect_format():
+    assert batch.detect_format("x.CSV") == "csv"
+    assert batch.detect_format("x.pq") == "parquet"
+    with pytest.raises(ValueError):
+        batch.detect_format("x.xlsx")
+
+
+def test_score_chunk_matches_predict(model, frame):
+    scored = batch.score_chunk(model, frame, FEATURES, label_names={0: "A", 1: "B", 2: "C"})
+    np.testing.assert_array_equal(scored["prediction"], model.predict(frame[FEATURES]))
+    np.testing.assert_allclose(scored["proba_0"], model.predict_proba(frame[FEATURES])[:, 0])
+    assert set(scored["prediction_label"]) <= {"A", "B", "C"}
+    assert list(scored["id"]) == list(frame["id"])
+
+
+def test_score_file_csv_in_chunks(model, frame):
+    source = io.BytesIO(frame.to_csv(index=False).encode())
+    output = io.BytesIO()
+    progress = []
+    rows = batch.score_file(model, source, "in.csv", FEATURES, output, chunk_rows=40, progress=progress.append)
+
+    assert rows == len(frame)
+    assert progress == [40, 80, 120, 150]
+    result = pd.read_csv(io.BytesIO(output.getvalue()))
+    assert len(result) == len(frame)
+    np.testing.assert_array_equal(result["prediction"], model.predict(frame[FEATURES]))
+
+
+def test_score_file_parquet_round_trip(model, frame):
+    pytest.importorskip("pyarrow")
+    source = io.BytesIO()
+    frame.to_parquet(source, index=False)
+    source.seek(0)
+    assert batch.read_columns(source, "in.parquet") == list(frame.columns)
+
+    output = io.BytesIO()
+    rows = batch.score_file(model, source, "in.parquet", FEATURES, output, chunk_rows=64)
+    assert rows == len(frame)
+    result = pd.read_parquet(io.BytesIO(output.getvalue()))
+    np.testing.assert_array_equal(result["prediction"], model.predict(frame[FEATURES]))
+
+
+def test_score_file_parquet_keeps_first_chunk_schema(model, frame):
+    pytest.importorskip("pyarrow")
+    # 最初のチャンクは整数、次のチャンクは欠損値を含む（pandas では小数になる）
+    frame = frame.assign(id=frame["id"].astype(object))
+    frame.loc[100:, "id"] = None
+    source = io.BytesIO(frame.to_csv(index=False).encode())
+
+    output = io.BytesIO()
+    rows = batch.score_file(model, source, "in.csv", FEATURES, output, output_format="parquet",
+                            chunk_rows=100, keep_columns=["id"])
+    assert rows == len(frame)
+    result = pd.read_parquet(io.BytesIO(output.getvalue()))
+    assert list(result.columns[:5]) == FEATURES + ["id"]
+    assert result["id"].iloc[:100].tolist() == list(range(100))
+    assert result["id"].iloc[100:].isna().all()
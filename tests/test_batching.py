@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+from sklearn.datasets import load_iris
+from sklearn.linear_model import LogisticRegression
+
+from ml_core import batching
+
+
+@pytest.fixture(scope="module")
+def data():
+    X, y = load_iris(return_X_y=True)
+    return LogisticRegression(max_iter=1_000).fit(X, y), X
+
+
+def test_concurrent_rows_are_batched(data):
+    model, X = data
+    batcher = batching.MicroBatcher(model, max_wait_ms=50)
+    results = [None] * 16
+
+    def call(i):
+        results[i] = batcher.predict_proba(X[i], timeout=10)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(results))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    labels = np.concatenate([labels for labels, _ in results])
+    np.testing.assert_array_equal(labels, model.predict(X[:16]))
+    summary = batcher.metrics.summary()
+    assert summary["total_rows"] == 16
+    assert summary["total_batches"] < 16
+
+
+def test_wrong_width_is_rejected(data):
+    model, X = data
+    batcher = batching.MicroBatcher(model)
+    with pytest.raises(ValueError):
+        batcher.predict_proba(X[0, :3], timeout=10)
+    labels, _ = batcher.predict_proba(X[0], timeout=10)
+    assert labels[0] == model.predict(X[:1])[0]
+    batcher.close()
+
+
+def test_closed_batcher_still_answers(data):
+    model, X = data
+    batcher = batching.MicroBatcher(model)
+    batcher.close()
+    labels, proba = batcher.predict_proba(X[:3], timeout=10)
+    np.testing.assert_array_equal(labels, model.predict(X[:3]))
+    np.testing.assert_allclose(proba, model.predict_proba(X[:3]))
+
+
+def test_get_batcher_replaces_and_discards(data):
+    model, X = data
+    first = batching.get_batcher("m.pkl", model)
+    assert batching.get_batcher("m.pkl", model) is first
+
+    other = LogisticRegression(max_iter=1_000).fit(X, load_iris(return_X_y=True)[1])
+    second = batching.get_batcher("m.pkl", other)
+    assert second is not first and first.closed
+    # 置き換えられた古いバッチャーを持っているセッションも待たされない
+    first.predict_proba(X[0], timeout=10)
+
+    batching.discard_batcher("m.pkl")
+    assert second.closed
+    assert "m.pkl" not in batching.all_metrics()
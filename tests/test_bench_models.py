@@ -0,0 +1,54 @@
+import os
+import pickle
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks import bench_models
+
+
+def result(path, p50=100.0, p99=200.0, load_ms=10.0, rows_per_second=1_000.0):
+    return {
+        "path": path,
+        "single_row": {"p50_us": p50, "p99_us": p99},
+        "load": {"pkl": {"median_ms": load_ms}},
+        "throughput": [{"batch_size": 100, "rows_per_second": rows_per_second}],
+    }
+
+
+def test_compare_reports_only_regressions_beyond_ratio():
+    baseline = {"models": [result("a.pkl"), result("b.pkl")]}
+    current = {"models": [
+        # p50 は 1.5倍に悪化、p99 は改善、読み込みは許容範囲内
+        result("a.pkl", p50=150.0, p99=100.0, load_ms=11.0),
+        # スループットが半分になった = 1行あたりの時間が2倍
+        result("b.pkl", rows_per_second=500.0),
+    ]}
+
+    regressions = bench_models.compare(baseline, current, ratio=1.2)
+    assert [(r["model"], r["metric"]) for r in regressions] == [
+        ("a.pkl", "single_row.p50_us"),
+        ("b.pkl", "throughput.100.seconds_per_row"),
+    ]
+    assert regressions[0]["ratio"] == pytest.approx(1.5)
+    assert regressions[1]["ratio"] == pytest.approx(2.0)
+
+
+def test_compare_skips_new_and_failed_models():
+    baseline = {"models": [result("a.pkl"), {"path": "b.pkl", "error": "broken"}]}
+    current = {"models": [
+        {"path": "a.pkl", "error": "broken now"},
+        result("b.pkl", p50=1e6),
+        result("c.pkl", p50=1e6),
+    ]}
+    assert bench_models.compare(baseline, current, ratio=1.2) == []
+
+
+def test_time_load_records_page_cache_state(tmp_path):
+    path = tmp_path / "model.pkl"
+    path.write_bytes(pickle.dumps({"weights": [1, 2, 3]}))
+
+    timing = bench_models.time_load(path, repeats=2)
+    assert timing["page_cache"] == ("dropped" if hasattr(os, "posix_fadvise") else "warm")
+    assert 0 <= timing["min_ms"] <= timing["median_ms"]
@@ -0,0 +1,58 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ml_core import compare
+
+
+class FixedModel:
+    def __init__(self, classes, proba):
+        self.classes_ = np.asarray(classes)
+        self.proba = np.asarray(proba, dtype=np.float64)
+
+    def predict_proba(self, X):
+        return self.proba[:len(X)]
+
+
+class LabelOnlyModel:
+    def predict(self, X):
+        return np.array(["a", "b", "b"])[:len(X)]
+
+
+MODELS = {
+    "ab.pkl": FixedModel(["a", "b"], [[0.9, 0.1], [0.2, 0.8], [0.6, 0.4]]),
+    "bc.pkl": FixedModel(["b", "c"], [[0.7, 0.3], [1.0, 0.0], [0.1, 0.9]]),
+    "labels.pkl": LabelOnlyModel(),
+}
+
+
+def loader(path):
+    if path.name not in MODELS:
+        raise FileNotFoundError(path.name)
+    return MODELS[path.name]
+
+
+def test_compare_models_aligns_classes():
+    results, seconds = compare.compare_models(["ab.pkl", "bc.pkl", "labels.pkl", "missing.pkl"], np.zeros((3, 2)), loader)
+    by_name = {r.name: r for r in results}
+
+    assert seconds >= 0
+    assert not by_name["missing.pkl"].ok and "読み込みエラー" in by_name["missing.pkl"].error
+    assert by_name["ab.pkl"].classes.tolist() == ["a", "b", "c"]
+    np.testing.assert_allclose(by_name["bc.pkl"].proba[0], [0.0, 0.7, 0.3])
+    assert by_name["labels.pkl"].proba is None
+    assert all(r.model is None for r in results)
+
+
+def test_agreement_and_gaps():
+    results, _ = compare.compare_models(["ab.pkl", "bc.pkl", "labels.pkl"], np.zeros((3, 2)), loader)
+
+    names, matrix = compare.agreement_matrix(results)
+    assert names == ["ab.pkl", "bc.pkl", "labels.pkl"]
+    # ab: a b a / bc: b b c / labels: a b b
+    np.testing.assert_allclose(matrix, [[1, 1 / 3, 2 / 3], [1 / 3, 1, 1 / 3], [2 / 3, 1 / 3, 1]])
+    assert compare.all_agree_rate(results) == pytest.approx(1 / 3)
+
+    names, gaps = compare.probability_gaps(results)
+    assert names == ["ab.pkl", "bc.pkl"]
+    assert gaps[0, 1] == pytest.approx((0.9 + 0.2 + 0.9) / 3)
@@ -0,0 +1,76 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.svm import SVC
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from ml_core import compiled, iris
+
+MODELS = {
+    "logistic": lambda: LogisticRegression(max_iter=1_000),
+    "tree": lambda: DecisionTreeClassifier(random_state=0),
+    "forest": lambda: RandomForestClassifier(n_estimators=20, random_state=0),
+    "scaled_logistic": lambda: make_pipeline(StandardScaler(), LogisticRegression(max_iter=1_000)),
+}
+
+
+@pytest.fixture(scope="module")
+def iris_data():
+    return load_iris(return_X_y=True)
+
+
+@pytest.fixture(scope="module")
+def probe():
+    return compiled.make_probe(4, low=iris.IRIS_LOWS, high=iris.IRIS_HIGHS)
+
+
+@pytest.mark.parametrize("name", sorted(MODELS))
+def test_parity_with_sklearn(name, iris_data, probe):
+    X, y = iris_data
+    model = MODELS[name]().fit(X, y)
+    fast = compiled.compile_model(model, probe_X=probe)
+    assert fast is not None
+
+    # スライダーと同じ0.1刻みの入力も比べる（同じ距離・同じ閾値の値が出やすい）
+    grid = np.round(compiled.make_probe(4, low=iris.IRIS_LOWS, high=iris.IRIS_HIGHS, seed=2), 1)
+    X_test = np.vstack([X, probe, grid])
+    np.testing.assert_array_equal(fast.predict(X_test), model.predict(X_test))
+    np.testing.assert_allclose(fast.predict_proba(X_test), model.predict_proba(X_test), atol=1e-6)
+    np.testing.assert_allclose(fast.predict_proba(X[0]), model.predict_proba(X[:1]), atol=1e-6)
+
+
+def test_large_inputs_are_chunked(iris_data, probe, monkeypatch):
+    X, y = iris_data
+    model = MODELS["forest"]().fit(X, y)
+    # 一時配列の上限を小さくして、何回にも分けて計算させる
+    monkeypatch.setattr(compiled, "CHUNK_BYTES", 64 * 1024)
+    fast = compiled.compile_model(model, probe_X=probe)
+    X_big = compiled.make_probe(4, low=iris.IRIS_LOWS, high=iris.IRIS_HIGHS, n_rows=5_000, seed=1)
+    np.testing.assert_allclose(fast.predict_proba(X_big), model.predict_proba(X_big), atol=1e-6)
+
+
+def test_chunked_splits_rows():
+    calls = []
+
+    def func(X):
+        calls.append(len(X))
+        return X * 2
+
+    run = compiled._chunked(func, bytes_per_row=100, max_bytes=1_000)
+    X = np.arange(25.0).reshape(-1, 1)
+    np.testing.assert_array_equal(run(X), X * 2)
+    assert calls == [10, 10, 5]
+
+
+@pytest.mark.parametrize("model", [SVC(probability=True), KNeighborsClassifier()])
+def test_unsupported_models_return_none(model, iris_data):
+    X, y = iris_data
+    assert compiled.compile_model(model.fit(X, y)) is None
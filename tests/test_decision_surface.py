@@ -0,0 +1,39 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+from sklearn.datasets import load_iris
+from sklearn.linear_model import LogisticRegression
+
+from ml_core import decision_surface, iris
+
+
+@pytest.fixture(scope="module")
+def model():
+    X, y = load_iris(return_X_y=True)
+    return LogisticRegression(max_iter=1_000).fit(X, y)
+
+
+def test_surface_varies_only_the_chosen_axes(model):
+    values = [5.5, 3.0, 4.0, 1.0]
+    xs, ys, proba = decision_surface.compute_surface(
+        model, 2, 3, values, iris.IRIS_LOWS, iris.IRIS_HIGHS, resolution=30
+    )
+    assert proba.shape == (30, 30, 3)
+    assert (xs[0], xs[-1]) == (iris.IRIS_LOWS[2], iris.IRIS_HIGHS[2])
+    np.testing.assert_allclose(proba.sum(axis=2), 1.0)
+    # [y, x] の位置の確率は、その点を1行だけ予測した結果と一致する
+    expected = model.predict_proba([[5.5, 3.0, xs[7], ys[12]]])[0]
+    np.testing.assert_allclose(proba[12, 7], expected)
+
+
+def test_build_figure(model):
+    pytest.importorskip("plotly")
+    xs, ys, proba = decision_surface.compute_surface(
+        model, 0, 1, [5.5, 3.0, 4.0, 1.0], iris.IRIS_LOWS, iris.IRIS_HIGHS, resolution=10
+    )
+    fig = decision_surface.build_figure(xs, ys, proba, ["A", "B"], "x", "y", (5.5, 3.0))
+    assert len(fig.data) == 2
+    fig = decision_surface.build_figure(xs, ys, proba, ["A", "B", "C"], "x", "y", (5.5, 3.0), show_class=2)
+    assert fig.layout.title.text == "C の確率"
@@ -0,0 +1,93 @@
+import json
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ml_core import drift
+
+
+def test_histogram_sketch_bins_and_out_of_range():
+    sketch = drift.HistogramSketch([0.0], [10.0], n_bins=5)
+    sketch.update([[-1.0], [0.0], [1.9], [2.0], [10.0], [11.0], [float("nan")]])
+
+    # [範囲未満, 0-2, 2-4, 4-6, 6-8, 8-10, 範囲超え]
+    assert sketch.counts[0].tolist() == [1, 2, 1, 0, 0, 1, 1]
+    assert sketch.missing.tolist() == [1]
+    assert sketch.total.tolist() == [6]
+
+    other = sketch.empty_like()
+    other.update([[5.0]])
+    sketch.merge(other)
+    assert sketch.counts[0, 3] == 1
+
+
+def test_psi_and_ks():
+    expected = np.array([100, 100, 100, 100])
+    assert drift.psi(expected, expected * 3) == pytest.approx(0.0)
+    assert drift.ks_statistic(expected, expected) == pytest.approx(0.0)
+
+    shifted = np.array([10, 40, 150, 200])
+    assert drift.psi(expected, shifted) > drift.PSI_ALERT
+    assert drift.ks_statistic(expected, shifted) == pytest.approx(0.375)
+
+
+def test_drift_monitor_reference_and_windows():
+    monitor = drift.DriftMonitor([0.0], [1.0], n_bins=4, reference_rows=4, window_rows=2, n_windows=2)
+    monitor.update(np.full((4, 1), 0.1), ["a"] * 4)
+    monitor.update(np.full((6, 1), 0.9), ["b"] * 6)
+
+    report = monitor.report()
+    assert report["total_rows"] == 10
+    assert report["reference_rows"] == 4
+    # 古いウィンドウは捨てられ、直近2つ（4件）だけが残る
+    assert report["current_rows"] == 4
+    assert report["reference_classes"] == {"a": 1.0}
+    assert report["current_classes"] == {"b": 1.0}
+    assert report["features"][0]["psi"] > drift.PSI_ALERT
+
+
+def test_log_monitor_retries_unresolved_models(tmp_path):
+    path = tmp_path / "predictions-1.jsonl"
+    record = {"model_path": "m.pkl", "inputs": [0.5], "prediction": "a"}
+    path.write_text(json.dumps(record) + "\n", encoding="utf-8")
+
+    resolvable = []
+
+    def factory(model_path, n_features):
+        return drift.DriftMonitor([0.0], [1.0]) if resolvable else None
+
+    log_monitor = drift.LogMonitor(tmp_path, factory)
+    assert log_monitor.refresh() == 1
+    assert log_monitor.monitors == {}
+
+    resolvable.append(True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    assert log_monitor.refresh() == 1
+    # 集計できなかった1件目も取っておいて、解決後に数える
+    assert log_monitor.monitors["m.pkl"].total_rows == 2
+    assert log_monitor.pending == {}
+
+
+def test_log_monitor_pending_rows_are_bounded(tmp_path):
+    record = {"model_path": "m.pkl", "inputs": [0.5], "prediction": "a"}
+    (tmp_path / "predictions-1.jsonl").write_text((json.dumps(record) + "\n") * 5, encoding="utf-8")
+    log_monitor = drift.LogMonitor(tmp_path, lambda model_path, n_features: None, max_pending_rows=3)
+    assert log_monitor.refresh() == 5
+    assert len(log_monitor.pending["m.pkl"]) == 3
+
+
+def test_log_monitor_concurrent_refresh_counts_each_record_once(tmp_path):
+    record = {"model_path": "m.pkl", "inputs": [0.5], "prediction": "a"}
+    (tmp_path / "predictions-1.jsonl").write_text((json.dumps(record) + "\n") * 2_000, encoding="utf-8")
+    log_monitor = drift.LogMonitor(tmp_path, lambda model_path, n_features: drift.DriftMonitor([0.0], [1.0]))
+
+    # 共有された LogMonitor を複数のセッションが同時に更新しても、同じ記録を二重に数えない
+    threads = [threading.Thread(target=log_monitor.refresh) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert log_monitor.monitors["m.pkl"].total_rows == 2_000
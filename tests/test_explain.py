@@ -0,0 +1,56 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ml_core import explain
+
+
+class ThresholdModel:
+    """
+    特徴量0が0.5を超えたらクラス1（特徴量1は使わない）
+    """
+
+    def predict_proba(self, X):
+        p = (np.asarray(X)[:, 0] > 0.5).astype(np.float64)
+        return np.column_stack([1.0 - p, p])
+
+
+def test_occlusion_attributes_change_to_used_feature():
+    result = explain.explain(ThresholdModel(), [1.0, 1.0], background=np.zeros((2, 2)))
+    assert result.unit == "確率"
+    np.testing.assert_allclose(result.contributions, [[-1.0, 1.0], [0.0, 0.0]])
+    np.testing.assert_allclose(result.for_class(1), [1.0, 0.0])
+
+
+def test_explain_without_proba_returns_none():
+    class LabelOnly:
+        def predict(self, X):
+            return np.zeros(len(X))
+
+    assert explain.explain(LabelOnly(), [1.0, 2.0]) is None
+
+
+@pytest.fixture(scope="module")
+def iris_data():
+    datasets = pytest.importorskip("sklearn.datasets")
+    return datasets.load_iris(return_X_y=True)
+
+
+def test_linear_contributions_sum_to_decision_function(iris_data):
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    X, y = iris_data
+    model = make_pipeline(StandardScaler(), LogisticRegression(max_iter=1_000)).fit(X, y)
+    result = explain.explain(model, X[60])
+    np.testing.assert_allclose(result.contributions.sum(axis=0) + result.base, model.decision_function(X[60:61])[0])
+
+
+def test_tree_contributions_sum_to_probability(iris_data):
+    from sklearn.ensemble import RandomForestClassifier
+
+    X, y = iris_data
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    result = explain.explain(model, X[100])
+    np.testing.assert_allclose(result.contributions.sum(axis=0) + result.base, model.predict_proba(X[100:101])[0])
@@ -0,0 +1,96 @@
+import json
+import os
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ml_core import hot_reload
+
+
+def json_loader(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_positive(model):
+    if model["value"] <= 0:
+        raise ValueError("value must be positive")
+
+
+def write(path, value, mtime_offset=0):
+    path.write_text(json.dumps({"value": value}), encoding="utf-8")
+    stamp = time.time() + mtime_offset
+    os.utime(path, (stamp, stamp))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_reload_swaps_and_calls_on_swap(tmp_path):
+    path = tmp_path / "model.json"
+    write(path, 1)
+    swaps = []
+    model = hot_reload.HotReloadingModel(
+        path, loader=json_loader, validate=check_positive, prepare=lambda m: m["value"] * 10,
+        on_swap=lambda old, new: swaps.append((old.version, new.version)), poll_interval=3600
+    )
+    try:
+        assert model.model == {"value": 1} and model.current.prepared == 10
+
+        write(path, 2)
+        assert model.reload()
+        assert model.current.version == 1 and model.current.prepared == 20
+        assert swaps == [(0, 1)]
+    finally:
+        model.stop()
+
+
+def test_failed_reload_keeps_old_model(tmp_path):
+    path = tmp_path / "model.json"
+    write(path, 1)
+    model = hot_reload.HotReloadingModel(path, loader=json_loader, validate=check_positive, poll_interval=3600)
+    try:
+        write(path, -1)
+        assert not model.reload()
+        assert model.model == {"value": 1}
+        assert model.stats()["failures"] == 1
+        assert "value must be positive" in model.stats()["last_error"]
+    finally:
+        model.stop()
+
+
+def test_watcher_reloads_after_file_settles(tmp_path):
+    path = tmp_path / "model.json"
+    write(path, 1)
+    model = hot_reload.HotReloadingModel(path, loader=json_loader, poll_interval=0.01)
+    try:
+        write(path, 22, mtime_offset=10)
+        assert wait_for(lambda: model.model == {"value": 22})
+        assert model.stats()["reloads"] == 1
+    finally:
+        model.stop()
+
+
+def test_validate_model():
+    class Model:
+        def __init__(self, proba):
+            self.proba = np.asarray(proba)
+
+        def predict(self, X):
+            return self.proba.argmax(axis=1)
+
+        def predict_proba(self, X):
+            return self.proba
+
+    probe = np.zeros((2, 3))
+    hot_reload.validate_model(Model([[0.2, 0.8], [1.0, 0.0]]), probe)
+    with pytest.raises(ValueError):
+        hot_reload.validate_model(Model([[0.2, 0.7], [1.0, 0.0]]), probe)
+    with pytest.raises(ValueError):
+        hot_reload.validate_model(Model([[0.2, 0.8]]), probe)
@@ -0,0 +1,87 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from ml_core import images
+
+
+def encode(array, fmt):
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pixels():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(300, 200, 3), dtype=np.uint8)
+
+
+def test_tile_histograms_match_full_image(pixels):
+    img = Image.fromarray(pixels)
+    mode, histogram = images.tile_histograms(img, tile_rows=7)
+    assert mode == "RGB"
+    for channel in range(3):
+        np.testing.assert_array_equal(histogram[channel], np.bincount(pixels[:, :, channel].ravel(), minlength=256))
+
+
+def test_histogram_stats_match_numpy(pixels):
+    _, histogram = images.tile_histograms(Image.fromarray(pixels))
+    stats = images.histogram_stats(histogram)
+    flat = pixels.reshape(-1, 3).astype(np.float64)
+    np.testing.assert_allclose(stats["mean"], flat.mean(axis=0))
+    np.testing.assert_allclose(stats["std"], flat.std(axis=0))
+    np.testing.assert_array_equal(stats["min"], flat.min(axis=0))
+    np.testing.assert_array_equal(stats["max"], flat.max(axis=0))
+
+
+def test_analyze_png_keeps_size(pixels):
+    info = images.analyze(encode(pixels, "PNG"))
+    assert info["format"] == "PNG"
+    assert info["size"] == info["stats_size"] == (200, 300)
+    assert info["stats_scale"] == 1
+    assert info["histogram"].sum() == 3 * 200 * 300
+
+
+def test_analyze_large_jpeg_decodes_reduced(pixels):
+    data = encode(np.tile(pixels, (4, 4, 1)), "JPEG")
+    info = images.analyze(data, max_pixels=200 * 300, preview_max_side=100)
+
+    assert info["size"] == (800, 1200)
+    assert info["stats_scale"] > 1
+    assert info["stats_size"][0] * info["stats_size"][1] <= 200 * 300 * 4
+    preview = Image.open(io.BytesIO(info["preview"]))
+    assert max(preview.size) <= 100
+
+
+def test_analyze_decodes_once(pixels, monkeypatch):
+    opened = []
+    original_open = images._open
+
+    def counting_open(data):
+        opened.append(data)
+        return original_open(data)
+
+    monkeypatch.setattr(images, "_open", counting_open)
+    info = images.analyze(encode(pixels, "PNG"), preview_max_side=100)
+    assert len(opened) == 1
+    assert max(Image.open(io.BytesIO(info["preview"])).size) == 100
+
+
+def test_make_preview_leaves_decoded_image_unchanged(pixels):
+    img = Image.fromarray(pixels)
+    images.make_preview(img, max_side=50)
+    assert img.size == (200, 300)
+
+
+def test_16bit_png_is_scaled_to_8bit():
+    # 16ビットの値を255で頭打ちにせず、上位8ビットで数える
+    values = np.array([[0, 256, 32768, 65535]], dtype=np.uint16)
+    data = encode(values, "PNG")
+    info = images.analyze(data)
+    assert info["channels"] == ["L"]
+    assert np.flatnonzero(info["histogram"][0]).tolist() == [0, 1, 128, 255]
+    assert list(images._to_8bit(Image.open(io.BytesIO(data))).getdata()) == [0, 1, 128, 255]
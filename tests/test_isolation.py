@@ -0,0 +1,80 @@
+import pickle
+from multiprocessing import shared_memory
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ml_core import isolation
+
+
+class HalfModel:
+    classes_ = np.array([0, 1])
+
+    def predict_proba(self, X):
+        return np.full((len(X), 2), 0.5)
+
+
+class OutOfMemoryModel:
+    def predict_proba(self, X):
+        raise MemoryError
+
+
+def run_in_process(model, X, out_size):
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    shm = shared_memory.SharedMemory(create=True, size=X.nbytes)
+    out = shared_memory.SharedMemory(create=True, size=max(out_size, 1))
+    try:
+        np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[...] = X
+        result = isolation._run(model, "predict_proba", (shm.name, X.shape, X.dtype.str, out.name, out_size))
+        if result[0] == "shm":
+            return result, np.ndarray(result[1], dtype=result[2], buffer=out.buf).copy()
+        return result, result[1]
+    finally:
+        for segment in (shm, out):
+            segment.close()
+            segment.unlink()
+
+
+def test_run_writes_into_parent_output_buffer():
+    result, proba = run_in_process(HalfModel(), np.zeros((3, 4)), out_size=3 * 2 * 8)
+    assert result[0] == "shm"
+    np.testing.assert_array_equal(proba, np.full((3, 2), 0.5))
+
+
+def test_run_falls_back_to_pipe_when_output_does_not_fit():
+    result, proba = run_in_process(HalfModel(), np.zeros((3, 4)), out_size=8)
+    assert result[0] == "array"
+    assert proba.shape == (3, 2)
+
+
+@pytest.fixture
+def pool():
+    pool = isolation.IsolatedModelPool(n_workers=1, timeout=30)
+    yield pool
+    pool.close()
+
+
+def test_pool_predict_proba(tmp_path, pool):
+    path = tmp_path / "half.pkl"
+    path.write_bytes(pickle.dumps(HalfModel()))
+
+    remote = pool.model(path)
+    assert remote.classes_.tolist() == [0, 1]
+    np.testing.assert_array_equal(remote.predict_proba(np.zeros((2, 4))), np.full((2, 2), 0.5))
+    np.testing.assert_array_equal(pool.predict_proba(path, np.zeros((2, 4))), np.full((2, 2), 0.5))
+
+
+def test_memory_error_replaces_worker(tmp_path, pool):
+    oom_path = tmp_path / "oom.pkl"
+    oom_path.write_bytes(pickle.dumps(OutOfMemoryModel()))
+    half_path = tmp_path / "half.pkl"
+    half_path.write_bytes(pickle.dumps(HalfModel()))
+
+    with pytest.raises(isolation.RemoteError, match="MemoryError"):
+        pool.predict_proba(oom_path, np.zeros((1, 4)))
+    assert pool.stats()["restarts"] == 1
+
+    # 作り直したワーカーで次の呼び出しが成功する
+    np.testing.assert_array_equal(pool.predict_proba(half_path, np.zeros((1, 4))), [[0.5, 0.5]])
+    assert pool.stats()["alive"] == 1
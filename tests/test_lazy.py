@@ -0,0 +1,46 @@
+import sys
+
+from ml_core import lazy
+
+APP_SOURCE = '''import json
+from ml_core import lazy
+
+csv = lazy.lazy_import("csv")
+
+print("page body is not executed")
+'''
+
+
+def test_lazy_import_loads_on_first_attribute_access():
+    proxy = lazy.lazy_import("wave")
+    assert lazy.lazy_import("wave") is proxy
+    assert "not loaded" in repr(proxy)
+    _, pending = lazy.import_report()
+    assert "wave" in pending
+
+    assert proxy.open is sys.modules["wave"].open
+    loaded, pending = lazy.import_report()
+    assert "wave" in loaded and "wave" not in pending
+    assert loaded["wave"]["seconds"] >= 0
+
+
+def test_startup_code_defers_only_when_lazy(tmp_path):
+    app_file = tmp_path / "app.py"
+    app_file.write_text(APP_SOURCE, encoding="utf-8")
+
+    after = lazy._startup_code(app_file, eager=False)
+    before = lazy._startup_code(app_file, eager=True)
+    assert "import json" in after and 'csv = lazy.lazy_import(\'csv\')' in after
+    assert "import csv" not in after
+    assert "import csv" in before
+    assert "page body" not in before
+
+
+def test_measure_startup(tmp_path, monkeypatch):
+    app_file = tmp_path / "app.py"
+    app_file.write_text(APP_SOURCE, encoding="utf-8")
+    monkeypatch.setenv("PYTHONPATH", str(lazy.Path(lazy.__file__).resolve().parents[1]))
+
+    timings = lazy.measure_startup(app_file)
+    assert set(timings) == {"before", "after"}
+    assert all(seconds >= 0 for seconds in timings.values())
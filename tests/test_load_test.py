@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+pytest.importorskip("streamlit")
+
+from benchmarks import load_test
+
+
+@pytest.fixture
+def work_dir(tmp_path, monkeypatch):
+    load_test.make_dummy_models(tmp_path)
+    app_dir = tmp_path / "app"
+    app_dir.mkdir()
+    monkeypatch.chdir(app_dir)
+    monkeypatch.setenv("PREDICTION_LOG", "0")
+    monkeypatch.delenv("ML_PROFILE", raising=False)
+    return app_dir
+
+
+@pytest.mark.parametrize("app, project", [
+    ("iris_streamlit_app.py", None),
+    ("multi_model_app.py", "iris"),
+    ("multi_model_app.py", "demo"),
+])
+def test_one_session_runs_without_errors(work_dir, app, project):
+    records = load_test.run_session(load_test.REPO_DIR / app, 0, 1, project, 0, time.perf_counter())
+
+    assert [r["error"] for r in records if r["error"]] == []
+    assert records[-1]["kind"] == "predict"
+
+
+def test_feature_bounds_come_from_schema(work_dir):
+    bounds = load_test._feature_bounds("demo")
+    assert len(bounds) == load_test.DEMO_FEATURES
+    assert all(low < high for low, high in bounds.values())
+    assert load_test._feature_bounds("iris") == {}
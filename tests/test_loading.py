@@ -0,0 +1,40 @@
+import pickle
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+pytest.importorskip("joblib")
+
+from sklearn.datasets import load_iris
+from sklearn.linear_model import LogisticRegression
+
+from ml_core import loading
+
+
+@pytest.fixture(scope="module")
+def data():
+    X, y = load_iris(return_X_y=True)
+    return LogisticRegression(max_iter=1_000).fit(X, y), X
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        loading.load_model_file(tmp_path / "missing.pkl")
+
+
+def test_pickle_round_trip(tmp_path, data):
+    model, X = data
+    path = tmp_path / "model.pkl"
+    path.write_bytes(pickle.dumps(model))
+    np.testing.assert_array_equal(loading.load_model_file(path).predict(X), model.predict(X))
+
+
+def test_joblib_is_memory_mapped(tmp_path, data):
+    model, X = data
+    path = loading.save_mmap_model(model, tmp_path / "model.joblib")
+    loaded = loading.load_model_file(path)
+    assert isinstance(loaded.coef_, np.memmap)
+    assert not loaded.coef_.flags.writeable
+    np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(X))
+    assert not list(tmp_path.glob("*.tmp"))
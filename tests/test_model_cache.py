@@ -0,0 +1,69 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ml_core import model_cache
+
+MB = 1024 * 1024
+
+
+class FakeModel:
+    def __init__(self, n_bytes):
+        self.coef_ = np.zeros(n_bytes // 8)
+
+
+def make_cache(max_mb=2.5, on_evict=None):
+    loads = []
+
+    def loader(path):
+        loads.append(path)
+        return FakeModel(MB)
+
+    return model_cache.ModelCache(max_bytes=int(max_mb * MB), loader=loader, on_evict=on_evict), loads
+
+
+def test_estimate_counts_arrays_once():
+    model = FakeModel(MB)
+    model.view = model.coef_[:10]
+    assert MB <= model_cache.estimate_model_bytes(model) < MB + 10_000
+
+
+def test_lru_eviction_and_hits():
+    cache, loads = make_cache()
+    a = cache.get("a")
+    cache.get("b")
+    assert cache.get("a") is a
+    cache.get("c")  # 上限を超えるので、最も長く使われていない b を破棄
+    stats = cache.stats()
+    assert set(stats["models"]) == {"a", "c"}
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+    cache.get("b")
+    assert loads == ["a", "b", "c", "b"]
+
+
+def test_pinned_models_are_kept():
+    cache, _ = make_cache()
+    cache.get("a")
+    cache.pin("a")
+    cache.get("b")
+    cache.get("c")
+    assert "a" in cache.stats()["models"]
+    cache.unpin("a")
+    cache.get("d")
+    assert "a" not in cache.stats()["models"]
+
+
+def test_on_evict_runs_outside_the_lock():
+    calls = []
+
+    def on_evict(key):
+        acquired = cache._lock.acquire(timeout=1)
+        if acquired:
+            cache._lock.release()
+        calls.append((key, acquired))
+
+    cache, _ = make_cache(max_mb=1.5, on_evict=on_evict)
+    cache.get("a")
+    cache.get("b")
+    cache.put("c", FakeModel(MB))
+    assert calls == [("a", True), ("b", True)]
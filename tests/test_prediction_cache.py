@@ -0,0 +1,98 @@
+import gc
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ml_core import iris, model_cache, prediction_cache
+
+
+class TableModel:
+    """
+    入力の合計で3クラスの確率が決まる小さなモデル
+    """
+
+    classes_ = np.array([0, 1, 2])
+
+    def __init__(self, shift=0.0):
+        self.shift = shift
+        self.calls = 0
+
+    def predict_proba(self, X):
+        self.calls += 1
+        z = np.asarray(X).sum(axis=1, keepdims=True) + self.shift
+        scores = np.hstack([-z, np.zeros_like(z), z]) / 10
+        e = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return e / e.sum(axis=1, keepdims=True)
+
+
+def small_cache():
+    return prediction_cache.PredictionCache(prediction_cache.QuantizedGrid([0, 0], [1, 1], 0.1))
+
+
+def test_grid_quantize():
+    grid = prediction_cache.QuantizedGrid(iris.IRIS_LOWS, iris.IRIS_HIGHS, iris.IRIS_STEP)
+    assert grid.quantize([4.0, 2.0, 1.0, 0.1]) == (0, 0, 0, 0)
+    assert grid.quantize([5.55, 3.0, 4.0, 1.0]) is None  # 格子の上に無い
+    assert grid.quantize([9.0, 3.0, 4.0, 1.0]) is None  # 範囲外
+    key = grid.quantize([5.1, 3.5, 1.4, 0.2])
+    np.testing.assert_allclose(grid.points(grid.flat_index(key), grid.flat_index(key) + 1)[0], [5.1, 3.5, 1.4, 0.2])
+
+
+def test_predict_uses_cache():
+    cache = small_cache()
+    model = TableModel()
+    key = prediction_cache.model_key("m.pkl", model)
+    first = cache.predict(key, model, [0.3, 0.4])
+    second = cache.predict(key, model, [0.3, 0.4])
+    assert model.calls == 1
+    assert first[0] == second[0]
+    assert cache.stats()["hits"] == 1
+
+
+def test_precompute_matches_model():
+    cache = small_cache()
+    model = TableModel()
+    key = prediction_cache.model_key("m.pkl", model)
+    cache.precompute(key, model, chunk_rows=7)
+    label, proba = cache.get(key, [0.9, 0.2])
+    np.testing.assert_allclose(proba, model.predict_proba([[0.9, 0.2]])[0], atol=1e-6)
+    assert label == 2
+
+
+def test_model_key_is_not_reused_after_gc():
+    model = TableModel()
+    key = prediction_cache.model_key("m.pkl", model)
+    assert prediction_cache.model_key("m.pkl", model) == key
+    del model
+    gc.collect()
+    # 同じアドレスに作られても別のキーになる
+    keys = {prediction_cache.model_key("m.pkl", TableModel()) for _ in range(10)}
+    assert key not in keys
+    assert len(keys) == 10
+
+
+def test_discard_path_drops_all_versions():
+    cache = small_cache()
+    old, new = TableModel(), TableModel(shift=5)
+    cache.predict(prediction_cache.model_key("a.pkl", old), old, [0.1, 0.1])
+    cache.precompute(prediction_cache.model_key("a.pkl", new), new)
+    other = TableModel()
+    cache.predict(prediction_cache.model_key("b.pkl", other), other, [0.1, 0.1])
+
+    cache.discard_path("a.pkl")
+    stats = cache.stats()
+    assert (stats["entries"], stats["precomputed_models"]) == (1, 0)
+
+
+def test_shared_cache_eviction_clears_predictions():
+    model = TableModel()
+    shared = prediction_cache.shared_iris_cache()
+    key = prediction_cache.model_key("evicted.pkl", model)
+    shared.put(key, [5.1, 3.5, 1.4, 0.2], 0, np.array([1.0, 0.0, 0.0]))
+
+    cache = model_cache.ModelCache(max_bytes=1, loader=lambda path: TableModel(),
+                                   on_evict=model_cache._on_shared_evict)
+    cache.put("evicted.pkl", model)
+    cache.get("other.pkl")
+    assert shared.get(key, [5.1, 3.5, 1.4, 0.2]) is None
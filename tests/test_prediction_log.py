@@ -0,0 +1,82 @@
+import os
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ml_core import drift, prediction_log
+
+
+def records(n, probabilities=(0.2, 0.8)):
+    return [
+        prediction_log.make_record("app", "model.pkl", [i, i + 0.5], "1", probabilities, 1.0)
+        for i in range(n)
+    ]
+
+
+def write(logger, batch):
+    for record in batch:
+        assert logger.log(record)
+    logger.close()
+    assert logger.errors == 0
+
+
+def read_all(log_dir):
+    return [r for chunk in drift.LogReader(log_dir).read_new() for r in chunk]
+
+
+def test_jsonl_round_trip(tmp_path):
+    batch = records(5)
+    write(prediction_log.PredictionLogger(tmp_path, flush_interval=0.05), batch)
+    assert read_all(tmp_path) == batch
+
+
+def test_rotate_by_rows(tmp_path):
+    logger = prediction_log.PredictionLogger(tmp_path, flush_rows=1, flush_interval=0.05, rotate_rows=2)
+    write(logger, records(5))
+    assert len(list(tmp_path.glob("predictions-*.jsonl"))) == 3
+    assert len(read_all(tmp_path)) == 5
+
+
+def test_parquet_schema_keeps_probabilities_after_none(tmp_path):
+    pytest.importorskip("pyarrow")
+    logger = prediction_log.PredictionLogger(tmp_path, fmt="parquet", flush_rows=3, flush_interval=0.05)
+    batch = records(3, probabilities=None) + records(3)
+    write(logger, batch)
+
+    assert logger.written == 6
+    rows = read_all(tmp_path)
+    assert [r["probabilities"] for r in rows] == [None] * 3 + [[0.2, 0.8]] * 3
+
+
+def test_parquet_file_is_closed_after_rotate_seconds(tmp_path):
+    pytest.importorskip("pyarrow")
+    logger = prediction_log.PredictionLogger(tmp_path, fmt="parquet", flush_interval=0.05, rotate_seconds=0.1)
+    try:
+        logger.log(records(1)[0])
+        deadline = time.monotonic() + 5
+        rows = []
+        while not rows and time.monotonic() < deadline:
+            time.sleep(0.05)
+            rows = read_all(tmp_path)
+        assert len(rows) == 1
+    finally:
+        logger.close()
+
+
+def test_prune_old_and_excess_files(tmp_path):
+    old = tmp_path / "predictions-old.jsonl"
+    old.write_text("", encoding="utf-8")
+    os.utime(old, (time.time() - 3600, time.time() - 3600))
+    for i in range(3):
+        path = tmp_path / f"predictions-{i}.jsonl"
+        path.write_text("", encoding="utf-8")
+        os.utime(path, (time.time() - i, time.time() - i))
+
+    logger = prediction_log.PredictionLogger(tmp_path, retention_seconds=60, max_files=2)
+    logger.close()
+    logger._prune()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["predictions-0.jsonl", "predictions-1.jsonl"]
+    assert logger.pruned == 2
@@ -0,0 +1,56 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from ml_core import loading, prewarm, supervisor
+
+
+def make_project(root, name, *models):
+    models_dir = root / name / "models"
+    models_dir.mkdir(parents=True)
+    for model in models:
+        (models_dir / model).write_bytes(b"")
+
+
+def test_app_model_paths(tmp_path):
+    make_project(tmp_path, "iris", "model_iris.pkl")
+    make_project(tmp_path, "demo", "a.pkl", "b.joblib")
+
+    assert prewarm.app_model_paths("iris_streamlit_app.py", tmp_path) == [Path(loading.DEFAULT_MODEL_PATH)]
+    assert sorted(p.name for p in prewarm.app_model_paths("multi_model_app.py", tmp_path)) == [
+        "a.pkl", "b.joblib", "model_iris.pkl"
+    ]
+    assert prewarm.app_model_paths("drift_dashboard.py", tmp_path) == []
+    assert prewarm.app_model_paths("streamlit_test_app.py", tmp_path) == []
+
+
+def test_warm_imports_skips_missing_modules():
+    timings = prewarm.warm_imports(("json", "module_that_does_not_exist"))
+    assert list(timings) == ["json"]
+
+
+def test_serve_forked_backs_off_when_workers_keep_crashing(monkeypatch):
+    monkeypatch.setattr(supervisor, "RESTART_BACKOFF", 0.1)
+    monkeypatch.setattr(prewarm.signal, "signal", lambda *args: None)
+    forks = []
+
+    class Done(Exception):
+        pass
+
+    def fake_fork(app_file, port, extra_args):
+        forks.append(time.monotonic())
+        if len(forks) == 4:
+            raise Done
+        # すぐに終了するワーカー（ポートが使用中で起動できない場合など）
+        return subprocess.Popen([sys.executable, "-c", "raise SystemExit(1)"]).pid
+
+    monkeypatch.setattr(prewarm, "_fork_worker", fake_fork)
+    with pytest.raises(Done):
+        prewarm.serve_forked("x.py", [8600])
+
+    gaps = [b - a for a, b in zip(forks, forks[1:])]
+    for i, gap in enumerate(gaps):
+        assert gap >= 0.1 * 2 ** i
@@ -0,0 +1,56 @@
+from ml_core import profiling
+
+
+def test_histogram_quantiles():
+    h = profiling.Histogram()
+    for seconds in (0.0004, 0.003, 0.003, 0.2):
+        h.observe(seconds)
+    assert h.count == 4
+    assert h.quantile(0.5) == 0.005
+    assert h.quantile(1.0) == 0.25
+
+
+def test_rerun_profile_records_stages(monkeypatch):
+    store = profiling.ProfileStore()
+    monkeypatch.setattr(profiling, "store", store)
+    monkeypatch.delenv("ML_PROFILE_FILE", raising=False)
+
+    prof = profiling.RerunProfile("app", "session-1")
+    with prof.stage("load"):
+        pass
+    prof.checkpoint("page")
+    prof.finish()
+
+    assert set(prof.stages) == {"load", "page"}
+    assert set(store.summary()) == {("app", "load"), ("app", "page"), ("app", "rerun_total")}
+    assert store.sessions["session-1"]["app"] == "app"
+    text = store.render_prometheus()
+    assert 'streamlit_stage_seconds_count{app="app",stage="load"} 1' in text
+    assert 'le="+Inf"' in text
+
+
+def test_profile_file_creates_directory(tmp_path, monkeypatch):
+    path = tmp_path / "metrics" / "nested" / "profile.prom"
+    monkeypatch.setenv("ML_PROFILE_FILE", str(path))
+    store = profiling.ProfileStore()
+    store.observe("app", "load", 0.01)
+    store.record_rerun("s", "app", {"load": 0.01}, 0.01)
+    assert "streamlit_stage_seconds" in path.read_text(encoding="utf-8")
+
+
+def test_unwritable_profile_file_does_not_raise(tmp_path, monkeypatch, capsys):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setenv("ML_PROFILE_FILE", str(blocker / "profile.prom"))
+    store = profiling.ProfileStore()
+    store.record_rerun("s", "app", {}, 0.01)
+    assert "ML_PROFILE_FILE" in capsys.readouterr().err
+
+
+def test_null_profile_when_disabled(monkeypatch):
+    monkeypatch.setattr(profiling, "ENABLED", False)
+    prof = profiling.start_rerun("app")
+    with prof.stage("x"):
+        pass
+    prof.finish()
+    assert not isinstance(prof, profiling.RerunProfile)
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from ml_core import registry
+
+
+def make_project(root, name, *models):
+    models_dir = root / name / "models"
+    models_dir.mkdir(parents=True, exist_ok=True)
+    for model in models:
+        (models_dir / model).write_bytes(b"")
+    return models_dir
+
+
+def test_projects_and_index_round_trip(tmp_path):
+    root = tmp_path / "projects"
+    make_project(root, "iris", "model_iris.pkl", "model_iris.joblib", "notes.txt")
+    make_project(root, "empty")
+    (root / "app").mkdir()
+    index_path = tmp_path / "index.json"
+
+    first = registry.ModelRegistry(root, index_path=index_path, ttl_seconds=0)
+    projects = first.projects()
+    assert [p["name"] for p in projects] == ["iris"]
+    assert [m.name for m in projects[0]["models"]] == ["model_iris.joblib", "model_iris.pkl"]
+    assert index_path.exists()
+
+    # 保存したインデックスがあれば、更新時刻が同じフォルダは走査しない
+    second = registry.ModelRegistry(root, index_path=index_path, ttl_seconds=0)
+    assert [p["name"] for p in second.projects()] == ["iris"]
+    assert second.scans == 0
+
+
+def test_refresh_picks_up_new_models(tmp_path):
+    root = tmp_path / "projects"
+    models_dir = make_project(root, "iris", "a.pkl")
+    index = registry.ModelRegistry(root, index_path=None, ttl_seconds=0)
+    assert len(index.projects()[0]["models"]) == 1
+
+    (models_dir / "b.joblib").write_bytes(b"")
+    make_project(root, "demo", "c.pkl")
+    assert index.refresh(force=True)
+    assert {p["name"]: len(p["models"]) for p in index.projects()} == {"demo": 1, "iris": 2}
+
+
+def test_is_network_filesystem_on_local_path(tmp_path):
+    assert registry.is_network_filesystem(tmp_path) is False
+    assert registry.is_network_filesystem("/proc") is False
+
+
+def test_watcher_ignores_unrelated_writes(tmp_path):
+    pytest.importorskip("watchdog")
+    root = tmp_path / "projects"
+    models_dir = make_project(root, "iris", "a.pkl")
+    app_dir = root / "app"
+    app_dir.mkdir()
+    index = registry.ModelRegistry(root, index_path=None, ttl_seconds=0)
+    if not index.start_watching():
+        pytest.skip("ファイルの変更通知を使えない環境")
+    try:
+        index.projects()
+        assert not index._dirty
+
+        # アプリのフォルダへの書き込み（予測ログやインデックス）では再走査しない
+        (app_dir / "prediction_logs").mkdir()
+        (app_dir / "prediction_logs" / "log.jsonl").write_text("{}\n")
+        (app_dir / ".model_registry.json").write_text("{}")
+        time.sleep(0.5)
+        assert not index._dirty
+
+        (models_dir / "b.pkl").write_bytes(b"")
+        deadline = time.monotonic() + 5
+        while not index._dirty and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert index._dirty
+        assert len(index.projects()[0]["models"]) == 2
+    finally:
+        index.stop_watching()
@@ -0,0 +1,53 @@
+import json
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ml_core import schema
+
+
+def test_sidecar_takes_precedence(tmp_path):
+    model_path = tmp_path / "model.pkl"
+    schema.sidecar_path(model_path).write_text(json.dumps({
+        "features": [{"name": "a", "min": 0.0, "max": 1.0}, "b"],
+        "class_names": ["x", "y"],
+    }), encoding="utf-8")
+    model = types.SimpleNamespace(n_features_in_=5, classes_=np.array([0, 1]))
+
+    spec = schema.load_schema(model_path, model)
+    assert spec.source == "model.schema.json"
+    assert spec.names == ["a", "b"]
+    assert spec.label_for(model, 1) == "y"
+    assert spec.class_labels(3) == ["x", "y", "クラス2"]
+
+
+def test_schema_from_model_attributes(tmp_path):
+    model = types.SimpleNamespace(n_features_in_=3, classes_=np.array(["p", "q"]))
+    spec = schema.load_schema(tmp_path / "model.pkl", model)
+    assert spec.names == ["特徴量1", "特徴量2", "特徴量3"]
+    assert spec.class_names == ["p", "q"]
+
+    pipeline = types.SimpleNamespace(steps=[("clf", types.SimpleNamespace(n_features_in_=2))])
+    assert schema.load_schema(tmp_path / "model.pkl", pipeline).n_features == 2
+    assert schema.load_schema(tmp_path / "model.pkl", object()) is None
+
+
+def test_validate():
+    spec = schema.ModelSchema([{"name": "a", "min": 0.0, "max": 1.0}, {"name": "b"}])
+    assert spec.validate([0.5, 100.0]) == []
+    assert spec.validate([[0.5, 1.0], [2.0, 1.0]]) == ["a は 0.0〜1.0 の範囲で入力してください"]
+    assert spec.validate([0.5, float("nan")]) == ["b は -∞〜∞ の範囲で入力してください"]
+    assert "特徴量の数が違います" in spec.validate([1.0, 2.0, 3.0])[0]
+
+
+@pytest.mark.parametrize("content", ["{not json", '{"class_names": ["x"]}', '{"features": [{"min": 0}]}'])
+def test_malformed_sidecar_raises_and_model_schema_still_available(tmp_path, content):
+    model_path = tmp_path / "model.pkl"
+    schema.sidecar_path(model_path).write_text(content, encoding="utf-8")
+    model = types.SimpleNamespace(n_features_in_=2)
+
+    with pytest.raises((ValueError, KeyError, TypeError)):
+        schema.load_schema(model_path, model)
+    assert schema.schema_from_model(model).names == ["特徴量1", "特徴量2"]
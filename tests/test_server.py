@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+from sklearn.datasets import load_iris
+from sklearn.linear_model import LogisticRegression
+
+from ml_core import server
+
+
+@pytest.fixture(scope="module")
+def model():
+    X, y = load_iris(return_X_y=True)
+    return LogisticRegression(max_iter=1_000).fit(X, y)
+
+
+def test_parse_instances():
+    assert server.parse_instances([1, 2, 3, 4]).shape == (1, 4)
+    assert server.parse_instances({"instances": [[1, 2], [3, 4]]}).shape == (2, 2)
+    with pytest.raises(ValueError):
+        server.parse_instances({"rows": [1]})
+    with pytest.raises(ValueError):
+        server.parse_instances([])
+    with pytest.raises(ValueError):
+        server.parse_instances([[]])
+    with pytest.raises(ValueError):
+        server.parse_instances(json.loads("[1, NaN, 3, 4]"))
+    with pytest.raises(ValueError):
+        server.parse_instances(json.loads("[[1, 2], [Infinity, 4]]"))
+
+
+def test_concurrent_requests_are_batched(model):
+    rows = load_iris(return_X_y=True)[0][:20]
+
+    async def run():
+        batcher = server.AsyncMicroBatcher(model, max_wait_ms=20)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.predict(row[None, :]) for row in rows))
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+    labels = np.concatenate([labels for labels, _ in results])
+    np.testing.assert_array_equal(labels, model.predict(rows))
+
+
+def test_wrong_width_is_rejected_without_failing_others(model):
+    async def run():
+        batcher = server.AsyncMicroBatcher(model, max_wait_ms=20)
+        batcher.start()
+        app = server.InferenceServer("model.pkl", batcher)
+        try:
+            return await asyncio.gather(
+                app.dispatch("POST", "/predict", json.dumps([5.1, 3.5, 1.4, 0.2]).encode()),
+                app.dispatch("POST", "/predict", json.dumps([5.1, 3.5, 1.4]).encode()),
+                app.dispatch("POST", "/predict", json.dumps([6.7, 3.0, 5.2, 2.3]).encode()),
+            )
+        finally:
+            await batcher.stop()
+
+    (ok1, body1), (bad, _), (ok2, body2) = asyncio.run(run())
+    assert (ok1, bad, ok2) == (200, 400, 200)
+    assert body1["predictions"] == [0]
+    assert body2["predictions"] == [2]
+
+
+def test_stop_fails_queued_requests(model):
+    async def run():
+        batcher = server.AsyncMicroBatcher(model, max_wait_ms=10_000)
+        batcher.start()
+        request = asyncio.ensure_future(batcher.predict(np.zeros((1, 4))))
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        with pytest.raises(RuntimeError):
+            await request
+        with pytest.raises(RuntimeError):
+            await batcher.predict(np.zeros((1, 4)))
+
+    asyncio.run(run())
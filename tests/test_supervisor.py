@@ -0,0 +1,143 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from ml_core import supervisor
+
+
+@pytest.fixture
+def sup(tmp_path, monkeypatch):
+    monkeypatch.setattr(supervisor, "POLL_INTERVAL", 3600)
+    s = supervisor.Supervisor(
+        [{"name": "a", "file": "a.py"}, {"name": "b", "file": "b.py"}],
+        pid_file=tmp_path / "pids.json",
+    )
+    spawned = []
+
+    def fake_spawn(app):
+        app.process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"],
+                                       start_new_session=True)
+        app.started_at = time.time()
+        spawned.append(app.name)
+
+    monkeypatch.setattr(s, "_spawn", fake_spawn)
+    s.spawned = spawned
+    yield s
+    s.shutdown()
+
+
+def test_discover_apps(tmp_path):
+    (tmp_path / "one.py").write_text("import streamlit as st\n")
+    (tmp_path / "helper.py").write_text("x = 1\n")
+    (tmp_path / "app_launcher.py").write_text("import streamlit as st\n")
+    assert [a["name"] for a in supervisor.discover_apps(tmp_path)] == ["one"]
+
+
+def test_update_apps_keeps_running_apps(sup):
+    sup.start("a")
+    process = sup.apps["a"].process
+    sup.update_apps([{"name": "a", "file": "a.py"}, {"name": "c", "file": "c.py"}])
+    assert set(sup.apps) == {"a", "c"}
+    assert sup.apps["a"].process is process and sup.apps["a"].running
+
+
+def test_stop_during_health_check_is_not_restarted(sup, monkeypatch):
+    sup.start("a")
+    app = sup.apps["a"]
+    app.started_at = time.time() - supervisor.STARTUP_GRACE - 1
+
+    def health_check(checked_app):
+        # ヘルスチェックの途中でユーザーが停止した
+        sup.stop(checked_app.name)
+        return False
+
+    monkeypatch.setattr(sup, "_health_check", health_check)
+    sup._check(app)
+    assert not app.wanted and app.process is None
+    assert sup.spawned == ["a"]
+
+
+def test_unresponsive_app_is_restarted(sup, monkeypatch):
+    sup.start("a")
+    app = sup.apps["a"]
+    app.started_at = time.time() - supervisor.STARTUP_GRACE - 1
+    monkeypatch.setattr(sup, "_health_check", lambda checked_app: False)
+    sup._check(app)
+    assert sup.spawned == ["a", "a"]
+    assert app.restarts == 1
+
+
+def test_crashed_app_is_restarted_after_backoff(sup):
+    sup.start("a")
+    app = sup.apps["a"]
+    app.process.kill()
+    app.process.wait()
+
+    # 1回目の確認ではクラッシュを記録して、バックオフの時間だけ待つ
+    sup._check(app)
+    assert app.process is None and app.restarts == 1
+    assert app.status == "再起動待ち"
+    assert app.next_restart_at == pytest.approx(time.time() + supervisor.RESTART_BACKOFF, abs=0.5)
+    sup._check(app)
+    assert sup.spawned == ["a"]
+
+    # 待ち時間が過ぎたら再起動する
+    app.next_restart_at = time.time() - 1
+    sup._check(app)
+    assert sup.spawned == ["a", "a"] and app.running
+
+    # 続けてクラッシュすると待ち時間が2倍になる
+    app.process.kill()
+    app.process.wait()
+    sup._check(app)
+    assert app.restarts == 2
+    assert app.next_restart_at == pytest.approx(time.time() + supervisor.RESTART_BACKOFF * 2, abs=0.5)
+
+
+def test_crashed_app_that_was_stopped_is_not_restarted(sup):
+    sup.start("a")
+    app = sup.apps["a"]
+    app.wanted = False
+    app.process.kill()
+    app.process.wait()
+    sup._check(app)
+    assert app.next_restart_at is None and app.status == "停止"
+
+
+def test_is_streamlit_process_matches_launcher_children():
+    for argv in (["-m", "streamlit", "run", "x.py"], ["-m", "ml_core.prewarm", "x.py"]):
+        process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)", *argv])
+        try:
+            time.sleep(0.1)
+            assert supervisor._is_streamlit_process(process.pid)
+        finally:
+            process.kill()
+            process.wait()
+
+
+def test_is_streamlit_process_rejects_other_and_unknown_processes(monkeypatch):
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    try:
+        time.sleep(0.1)
+        assert not supervisor._is_streamlit_process(process.pid)
+    finally:
+        process.kill()
+        process.wait()
+
+    # コマンドラインを確認できなければ、PIDが生きていても対象にしない
+    monkeypatch.setattr(supervisor, "_read_cmdline", lambda pid: None)
+    assert not supervisor._is_streamlit_process(1)
+
+
+def test_prewarm_workers_reserve_consecutive_ports(sup):
+    sup.prewarm = True
+    sup.prewarm_workers = 3
+    sup.start("a")
+    app = sup.apps["a"]
+    app.port, app.n_ports = 8502, 3
+
+    port = sup._allocate_port(2)
+    assert not {port, port + 1} & {8502, 8503, 8504}
+    assert sup.command(app)[sup.command(app).index("--workers") + 1] == "3"
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+pytest.importorskip("joblib")
+
+from ml_core import iris, loading, schema, training
+
+
+@pytest.fixture(scope="module")
+def trained():
+    return training.train(n_jobs=1)
+
+
+def test_export_writes_model_files_and_sidecar(tmp_path, trained):
+    model, info = trained
+    sidecar = training.export(model, info, tmp_path)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "model_iris.joblib", "model_iris.pkl", "model_iris.schema.json"
+    ]
+    assert set(sidecar["benchmark"]) == {"pkl", "joblib"}
+    assert json.loads((tmp_path / "model_iris.schema.json").read_text(encoding="utf-8")) == sidecar
+
+    X = [[5.1, 3.5, 1.4, 0.2], [6.7, 3.0, 5.2, 2.3]]
+    for name in ("model_iris.pkl", "model_iris.joblib"):
+        loaded = loading.load_model_file(tmp_path / name)
+        np.testing.assert_array_equal(loaded.predict(X), model.predict(X))
+
+    model_schema = schema.load_schema(tmp_path / "model_iris.pkl", model)
+    assert model_schema.class_names == training.IRIS_CLASS_NAMES
+    np.testing.assert_array_equal(model_schema.lows, iris.IRIS_LOWS)
+    np.testing.assert_array_equal(model_schema.highs, iris.IRIS_HIGHS)
+
+
+def test_export_overwrites_previous_files(tmp_path, trained):
+    model, info = trained
+    training.export(model, info, tmp_path)
+    sidecar = training.export(model, {**info, "note": "second"}, tmp_path)
+
+    assert sidecar["training"]["note"] == "second"
+    assert not any(p.name.startswith(".") for p in tmp_path.iterdir())